@@ -0,0 +1,349 @@
+import argparse
+import functools
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+import AlmacenLog
+import Bloque
+import RegistroCandidatos
+import VotosColumnares
+
+logger = logging.getLogger(__name__)
+
+MAGIA_DATOS = b"VOTODAT1"
+MAGIA_INDICE = b"VOTOIDX1"
+CABECERA_ARCHIVO = struct.Struct("<8sQ")  # (magia, generación) al principio de ambos archivos
+# Entrada de tamaño fijo de cada registro: tipo, reservado, versión del bloque, CRC32 del payload,
+# offset y longitud del payload, índice del bloque, timestamp, número de votos, ID del tema
+# (offset de su registro) y hashes anterior/actual en binario
+ENTRADA = struct.Struct("<BBHIQQQdQQ32s32s")
+ALINEACION = 8  # Los payloads empiezan en múltiplos de 8 para poder ver sus columnas sin copiarlas
+TAM_VOTO = 8 + VotosColumnares.TAM_HASH_VOTANTE + 4  # timestamp + hash del votante + ID de candidato
+
+TIPO_BLOQUE_COLUMNAR = 1  # Votos por columnas, se decodifican al acceder a ellos
+TIPO_BLOQUE_JSON = 2  # Bloques con otro formato (génesis, votos no estándar): JSON completo
+TIPO_TEMA = 3  # Texto de un tema; su offset es el ID de tema de los bloques
+TIPO_CANDIDATOS = 4  # JSON {"candidatos": {id: nombre}, "ultimo_id": n}
+
+_ES_LITTLE_ENDIAN = sys.byteorder == "little"
+
+
+def _relleno(longitud):
+    return -longitud % ALINEACION
+
+
+def _hash_binario(hash_hex):
+    """Digest de 32 bytes de un hash SHA-256 en hexadecimal, o None si no tiene ese formato."""
+    if not isinstance(hash_hex, str) or len(hash_hex) != 64:
+        return None
+    try:
+        digest = bytes.fromhex(hash_hex)
+    except ValueError:
+        return None
+    return digest if digest.hex() == hash_hex else None
+
+
+def _vista_votos(mapa, offset, numero_votos, tema):
+    """
+    Votos de un bloque columnar como vistas sobre el archivo mapeado, sin copiarlos: solo se
+    leen del disco las páginas que se recorren y no ocupan memoria del proceso.
+    """
+    vista = memoryview(mapa)[offset:offset + numero_votos * TAM_VOTO]
+    fin_timestamps = numero_votos * 8
+    fin_votantes = fin_timestamps + numero_votos * VotosColumnares.TAM_HASH_VOTANTE
+    timestamps = vista[:fin_timestamps].cast("d")
+    candidatos = vista[fin_votantes:].cast("I")
+    if not _ES_LITTLE_ENDIAN:
+        timestamps, candidatos = array("d", timestamps), array("I", candidatos)
+        timestamps.byteswap()
+        candidatos.byteswap()
+    return VotosColumnares.VotosColumnares(tema, timestamps, vista[fin_timestamps:fin_votantes], candidatos)
+
+
+class AlmacenBinario:
+    """
+    Cadena en formato binario para cargarla sin decodificar el historial completo.
+
+    - <base>.dat: registros (entrada de tamaño fijo + payload) de bloques, temas y candidatos.
+      Los votos de los bloques se guardan por columnas (timestamps, hashes de votantes e IDs de
+      candidato) y se abren con mmap: al arrancar solo se leen las cabeceras y los votos de cada
+      bloque se decodifican cuando se accede a ellos.
+    - <base>.idx: copia contigua de las entradas de todos los registros. Es un índice derivado:
+      si falta, está incompleto o pertenece a otra generación se reconstruye desde el .dat.
+
+    Se anexa primero al .dat (con fsync) y después al índice, por lo que un corte a mitad de
+    escritura deja como mucho una cola incompleta en el .dat, que se descarta al cargar.
+    """
+    def __init__(self, ruta_base):
+        self.ruta_datos = ruta_base + ".dat"
+        self.ruta = ruta_base + ".idx"  # El índice se escribe el último en cada guardado
+        self._generacion = None
+        self._fin_datos = None  # Offset donde se anexa el siguiente registro
+        self._temas = {}  # {tema: offset de su registro}
+
+    def existe(self):
+        return os.path.exists(self.ruta_datos)
+
+    # --- Lectura ---
+
+    def cargar(self):
+        """
+        Devuelve un diccionario como el de AlmacenLog.cargar() pero con los bloques ya creados
+        ("bloques" es una lista de objetos Bloque, perezosos salvo los de formato JSON).
+        """
+        if os.path.getsize(self.ruta_datos) == 0:
+            # Archivo creado sin llegar a escribir la cabecera (mmap no admite archivos vacíos): cadena vacía
+            logger.warning("%s está vacío; se reescribirá.", self.ruta_datos)
+            self._generacion = None
+            self._fin_datos = None
+            self._temas = {}
+            return {"candidatos_globales": {}, "bloques": [], "ultimo_id_candidato_global": -1, "requiere_compactar": True}
+        with open(self.ruta_datos, "rb") as archivo:
+            mapa = mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ)
+        magia, generacion = CABECERA_ARCHIVO.unpack_from(mapa, 0)
+        if magia != MAGIA_DATOS:
+            raise ValueError(f"{self.ruta_datos} no es un archivo de cadena binaria")
+
+        entradas = self._leer_indice(generacion, len(mapa))
+        fin = self._fin_registro(entradas[-1]) if entradas else CABECERA_ARCHIVO.size
+        indice_incompleto = False  # Registros del .dat que no figuran en el índice
+        while fin + ENTRADA.size <= len(mapa):
+            # Registros anexados al .dat cuyo índice no llegó a escribirse: se validan con su CRC
+            entrada = ENTRADA.unpack_from(mapa, fin)
+            offset, longitud = entrada[4], entrada[5]
+            if offset != fin + ENTRADA.size or offset + longitud > len(mapa) or zlib.crc32(mapa[offset:offset + longitud]) != entrada[3]:
+                break
+            entradas.append(entrada)
+            fin = self._fin_registro(entrada)
+            indice_incompleto = True
+        cola_corrupta = fin < len(mapa)
+        if cola_corrupta:
+            logger.warning("Se descartaron %s bytes incompletos o corruptos al final de %s.", len(mapa) - fin, self.ruta_datos)
+        self._generacion = generacion
+        self._fin_datos = fin
+        tam_indice = os.path.getsize(self.ruta) if os.path.exists(self.ruta) else None
+        if not cola_corrupta and (indice_incompleto or tam_indice != CABECERA_ARCHIVO.size + len(entradas) * ENTRADA.size):
+            # Índice ausente, de otra generación, incompleto o con una entrada a medio escribir
+            self._escribir_indice(entradas)
+
+        datos = {"candidatos_globales": {}, "bloques": [], "ultimo_id_candidato_global": -1}
+        temas = {}  # {offset: tema}
+        self._temas = {}
+        for tipo, _, version, _, offset, longitud, index, timestamp, numero_votos, id_tema, hash_anterior, hash_actual in entradas:
+            if tipo == TIPO_BLOQUE_COLUMNAR:
+                tema = temas[id_tema]
+                datos["bloques"].append(Bloque.Bloque.perezoso(
+                    index, timestamp, functools.partial(_vista_votos, mapa, offset, numero_votos, tema),
+                    hash_anterior.hex(), hash_actual.hex(), tema, version))
+            elif tipo == TIPO_BLOQUE_JSON:
+                datos["bloques"].append(Bloque.Bloque.desde_diccionario(json.loads(mapa[offset:offset + longitud])))
+            elif tipo == TIPO_TEMA:
+                tema = sys.intern(mapa[offset:offset + longitud].decode("utf-8"))
+                temas[offset] = tema
+                self._temas[tema] = offset
+            elif tipo == TIPO_CANDIDATOS:
+                registro = json.loads(mapa[offset:offset + longitud])
+                datos["candidatos_globales"].update(registro["candidatos"])
+                datos["ultimo_id_candidato_global"] = max(datos["ultimo_id_candidato_global"], registro["ultimo_id"])
+        datos["requiere_compactar"] = cola_corrupta
+        return datos
+
+    def _leer_indice(self, generacion, tam_datos):
+        """Entradas del índice si corresponde a esta generación del .dat (si no, [] para reconstruirlo)."""
+        try:
+            with open(self.ruta, "rb") as archivo:
+                contenido = archivo.read()
+        except FileNotFoundError:
+            return []
+        if len(contenido) < CABECERA_ARCHIVO.size or CABECERA_ARCHIVO.unpack_from(contenido, 0) != (MAGIA_INDICE, generacion):
+            logger.warning("El índice %s no corresponde a %s. Se reconstruirá.", self.ruta, self.ruta_datos)
+            return []
+        cuerpo = memoryview(contenido)[CABECERA_ARCHIVO.size:]
+        cuerpo = cuerpo[:len(cuerpo) - len(cuerpo) % ENTRADA.size]  # Descartar una entrada a medio escribir
+        entradas = list(ENTRADA.iter_unpack(cuerpo))
+        # Una entrada que apunte fuera del .dat no es válida (no debería ocurrir: el .dat se escribe antes)
+        while entradas and self._fin_registro(entradas[-1]) > tam_datos:
+            entradas.pop()
+        return entradas
+
+    @staticmethod
+    def _fin_registro(entrada):
+        return entrada[4] + entrada[5] + _relleno(entrada[5])
+
+    # --- Escritura ---
+
+    def _codificar_registro(self, offset_registro, tipo, payload, **campos):
+        """Devuelve (entrada, bytes del registro) para un registro que empieza en offset_registro."""
+        offset = offset_registro + ENTRADA.size
+        entrada = (
+            tipo, 0, campos.get("version", 0), zlib.crc32(payload), offset, len(payload),
+            campos.get("index", 0), campos.get("timestamp", 0.0), campos.get("numero_votos", 0),
+            campos.get("id_tema", 0), campos.get("hash_anterior", bytes(32)), campos.get("hash_actual", bytes(32)),
+        )
+        return entrada, ENTRADA.pack(*entrada) + payload + bytes(_relleno(len(payload)))
+
+    def _codificar_bloque(self, bloque, offset_registro, temas):
+        """
+        Devuelve la lista [(entrada, bytes)] de los registros de un bloque (precedido del
+        registro de su tema si es la primera vez que aparece).
+        """
+        registros = []
+        votos = bloque.votos
+        hash_anterior = _hash_binario(bloque.hash_anterior)
+        hash_actual = _hash_binario(bloque.hash_actual)
+        if (not isinstance(votos, VotosColumnares.VotosColumnares) or hash_anterior is None or hash_actual is None
+                or type(bloque.timestamp) is not float or type(bloque.index) is not int):
+            # El formato columnar reconstruiría otros tipos (p.ej. un timestamp entero), lo que cambiaría el hash v1
+            payload = json.dumps(bloque.a_diccionario(), separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+            return [self._codificar_registro(offset_registro, TIPO_BLOQUE_JSON, payload, index=bloque.index)]
+
+        id_tema = temas.get(bloque.tema_votacion)
+        if id_tema is None:
+            entrada, datos = self._codificar_registro(offset_registro, TIPO_TEMA, bloque.tema_votacion.encode("utf-8"))
+            id_tema = temas[bloque.tema_votacion] = entrada[4]
+            registros.append((entrada, datos))
+            offset_registro += len(datos)
+
+        timestamps = array("d", votos.timestamps)
+        candidatos = array("I", votos.candidatos)
+        if not _ES_LITTLE_ENDIAN:
+            timestamps.byteswap()
+            candidatos.byteswap()
+        payload = b"".join((timestamps.tobytes(), bytes(votos.votantes), candidatos.tobytes()))
+        registros.append(self._codificar_registro(
+            offset_registro, TIPO_BLOQUE_COLUMNAR, payload,
+            version=bloque.version, index=bloque.index, timestamp=bloque.timestamp,
+            numero_votos=len(votos), id_tema=id_tema, hash_anterior=hash_anterior, hash_actual=hash_actual))
+        return registros
+
+    def _codificar(self, bloques, candidatos_globales, ultimo_id, offset_registro, temas):
+        """Codifica candidatos y bloques a partir de offset_registro. Devuelve (entradas, bytes)."""
+        registros = []
+        if candidatos_globales:
+            payload = json.dumps({"candidatos": candidatos_globales, "ultimo_id": ultimo_id},
+                                 separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+            registros.append(self._codificar_registro(offset_registro, TIPO_CANDIDATOS, payload))
+            offset_registro += len(registros[-1][1])
+        for bloque in bloques:
+            for registro in self._codificar_bloque(bloque, offset_registro, temas):
+                registros.append(registro)
+                offset_registro += len(registro[1])
+        return [entrada for entrada, _ in registros], b"".join(datos for _, datos in registros)
+
+    def anexar(self, bloques, candidatos):
+        """Anexa varios bloques y candidatos [(id, nombre, ultimo_id)] con una escritura por archivo."""
+        if not bloques and not candidatos:
+            return
+        if not self.existe():
+            self.compactar([], {}, -1)
+        elif self._fin_datos is None:
+            self.cargar()
+        candidatos_globales = {id_c: nombre for id_c, nombre, _ in candidatos}
+        ultimo_id = max((ultimo for _, _, ultimo in candidatos), default=-1)
+        temas = dict(self._temas)
+        entradas, datos = self._codificar(bloques, candidatos_globales, ultimo_id, self._fin_datos, temas)
+        with open(self.ruta_datos, "r+b") as archivo:
+            archivo.seek(self._fin_datos)
+            archivo.write(datos)
+            archivo.truncate()  # Por si quedaba una cola corrupta tras el último registro válido
+            archivo.flush()
+            os.fsync(archivo.fileno())
+        with open(self.ruta, "ab") as archivo:
+            archivo.write(b"".join(ENTRADA.pack(*entrada) for entrada in entradas))
+            archivo.flush()
+            os.fsync(archivo.fileno())
+        self._fin_datos += len(datos)
+        self._temas = temas
+
+    def compactar(self, bloques, candidatos_globales, ultimo_id_candidato_global):
+        """
+        Reescribe la cadena completa con el estado indicado: el .dat se escribe en un temporal,
+        se sincroniza y se sustituye con os.replace; después se reescribe el índice. Cada
+        reescritura usa una generación nueva para detectar un índice que no llegó a actualizarse.
+        """
+        generacion = int.from_bytes(os.urandom(8), "little")
+        temas = {}
+        entradas, datos = self._codificar(bloques, candidatos_globales, ultimo_id_candidato_global, CABECERA_ARCHIVO.size, temas)
+        ruta_tmp = self.ruta_datos + ".tmp"
+        with open(ruta_tmp, "wb") as archivo:
+            archivo.write(CABECERA_ARCHIVO.pack(MAGIA_DATOS, generacion))
+            archivo.write(datos)
+            archivo.flush()
+            os.fsync(archivo.fileno())
+        os.replace(ruta_tmp, self.ruta_datos)
+        self._generacion = generacion
+        self._fin_datos = CABECERA_ARCHIVO.size + len(datos)
+        self._temas = temas
+        self._escribir_indice(entradas)
+        AlmacenLog.sincronizar_directorio(self.ruta)
+
+    def _escribir_indice(self, entradas):
+        """Reescribe el índice completo (temporal + os.replace) para la generación actual."""
+        ruta_tmp = self.ruta + ".tmp"
+        with open(ruta_tmp, "wb") as archivo:
+            archivo.write(CABECERA_ARCHIVO.pack(MAGIA_INDICE, self._generacion))
+            archivo.write(b"".join(ENTRADA.pack(*entrada) for entrada in entradas))
+            archivo.flush()
+            os.fsync(archivo.fileno())
+        os.replace(ruta_tmp, self.ruta)
+
+    # --- Conversión desde/hacia el JSON antiguo ---
+
+    def exportar_json(self, ruta_json, registro_candidatos=None):
+        """
+        Escribe la cadena con el formato de blockchain_votacion.json, bloque a bloque. Los
+        candidatos del registro indicado se añaden a los guardados junto a los bloques.
+        """
+        datos = self.cargar()
+        if registro_candidatos is not None:
+            registro_candidatos.incorporar(datos["candidatos_globales"], datos["ultimo_id_candidato_global"])
+            datos["candidatos_globales"] = registro_candidatos.candidatos
+            datos["ultimo_id_candidato_global"] = registro_candidatos.ultimo_id
+        with open(ruta_json, "w", encoding="utf-8") as archivo:
+            archivo.write('{"candidatos_globales": ')
+            json.dump(datos["candidatos_globales"], archivo, ensure_ascii=False)
+            archivo.write(', "bloques": [')
+            for i, bloque in enumerate(datos["bloques"]):
+                archivo.write(",\n" if i else "\n")
+                json.dump(bloque.a_diccionario(), archivo, ensure_ascii=False)
+            archivo.write(f'\n], "ultimo_id_candidato_global": {datos["ultimo_id_candidato_global"]}}}\n')
+        return len(datos["bloques"])
+
+    def importar_json(self, ruta_json, registro_candidatos=None):
+        """
+        Sustituye la cadena binaria por el contenido de un blockchain_votacion.json. Con un
+        registro de candidatos, los candidatos se escriben en él en lugar de junto a los bloques.
+        """
+        with open(ruta_json, "r", encoding="utf-8") as archivo:
+            datos = json.load(archivo)
+        bloques = [Bloque.Bloque.desde_diccionario(bloque_dict) for bloque_dict in datos.get("bloques", [])]
+        candidatos = datos.get("candidatos_globales", {})
+        ultimo_id = datos.get("ultimo_id_candidato_global", -1)
+        if registro_candidatos is not None:
+            registro_candidatos.vaciar()
+            registro_candidatos.incorporar(candidatos, ultimo_id)
+            registro_candidatos.compactar()
+            candidatos, ultimo_id = {}, -1
+        self.compactar(bloques, candidatos, ultimo_id)
+        return len(bloques)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convierte la cadena binaria desde/hacia el formato JSON.")
+    parser.add_argument("operacion", choices=["exportar", "importar"])
+    parser.add_argument("json", help="Archivo JSON de destino (exportar) u origen (importar)")
+    parser.add_argument("--base", default="blockchain_votacion", help="Ruta base de los archivos .dat/.idx")
+    parser.add_argument("--candidatos", default="candidatos_votacion.log", help="Registro global de candidatos")
+    args = parser.parse_args()
+    almacen = AlmacenBinario(args.base)
+    registro = RegistroCandidatos.RegistroCandidatos(args.candidatos)
+    if args.operacion == "exportar":
+        registro.cargar()
+        print(f"{almacen.exportar_json(args.json, registro)} bloques exportados a {args.json}.")
+    else:
+        print(f"{almacen.importar_json(args.json, registro)} bloques importados desde {args.json}.")
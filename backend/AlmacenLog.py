@@ -0,0 +1,95 @@
+import json
+import logging
+import os
+import struct
+import zlib
+
+logger = logging.getLogger(__name__)
+
+CABECERA = struct.Struct(">II")  # (longitud, crc32) en big-endian
+
+
+def codificar_registro(registro):
+    """Codifica un registro como longitud + CRC32 + JSON compacto."""
+    payload = json.dumps(registro, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return CABECERA.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def leer_registros(ruta):
+    """
+    Devuelve (registros, bytes_validos, tamaño_total) leyendo el archivo secuencialmente.
+    La lectura se detiene en el primer registro truncado o con CRC incorrecto.
+    """
+    registros = []
+    with open(ruta, "rb") as archivo:
+        contenido = archivo.read()
+    posicion = 0
+    while posicion + CABECERA.size <= len(contenido):
+        longitud, crc = CABECERA.unpack_from(contenido, posicion)
+        inicio = posicion + CABECERA.size
+        fin = inicio + longitud
+        if fin > len(contenido):
+            break
+        payload = contenido[inicio:fin]
+        if zlib.crc32(payload) != crc:
+            break
+        try:
+            registros.append(json.loads(payload.decode("utf-8")))
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            break
+        posicion = fin
+    return registros, posicion, len(contenido)
+
+
+def sincronizar_directorio(ruta):
+    """Persiste la entrada de directorio de 'ruta' tras un os.replace (no disponible en todos los SO)."""
+    directorio = os.path.dirname(os.path.abspath(ruta))
+    try:
+        fd = os.open(directorio, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class AlmacenLog:
+    """
+    Log de solo-anexado de la cadena y los candidatos globales de versiones anteriores; ahora
+    solo se lee para migrarlo a la cadena binaria (ver AlmacenBinario).
+
+    Cada registro se guarda como: longitud (4 bytes) + CRC32 (4 bytes) + JSON compacto.
+    Un registro incompleto o corrupto al final del archivo (p.ej. por un corte durante
+    la escritura) se descarta al reproducir el log, por lo que cada anexado es atómico.
+    """
+    def __init__(self, ruta):
+        self.ruta = ruta
+
+    def existe(self):
+        return os.path.exists(self.ruta)
+
+    def cargar(self):
+        """
+        Reproduce el log y devuelve un diccionario con el mismo formato que el antiguo JSON
+        ("candidatos_globales", "bloques", "ultimo_id_candidato_global") más la clave
+        "requiere_compactar" si se descartó una cola corrupta.
+        """
+        registros, bytes_validos, tamano = leer_registros(self.ruta)
+        datos = {"candidatos_globales": {}, "bloques": [], "ultimo_id_candidato_global": -1}
+        for registro in registros:
+            tipo = registro.get("tipo")
+            if tipo == "bloque":
+                datos["bloques"].append(registro["bloque"])
+            elif tipo == "candidato":
+                datos["candidatos_globales"][registro["id"]] = registro["nombre"]
+                datos["ultimo_id_candidato_global"] = max(datos["ultimo_id_candidato_global"], registro["ultimo_id"])
+            elif tipo == "candidatos":
+                datos["candidatos_globales"].update(registro["candidatos_globales"])
+                datos["ultimo_id_candidato_global"] = max(datos["ultimo_id_candidato_global"], registro["ultimo_id_candidato_global"])
+        datos["requiere_compactar"] = bytes_validos != tamano
+        if datos["requiere_compactar"]:
+            logger.warning("Se descartaron %s bytes incompletos o corruptos al final de %s.", tamano - bytes_validos, self.ruta)
+        return datos
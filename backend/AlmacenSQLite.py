@@ -0,0 +1,456 @@
+import argparse
+import contextlib
+import itertools
+import json
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+import Bloque
+import VotosColumnares
+from RegistroCandidatos import normalizar_nombre
+
+logger = logging.getLogger(__name__)
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS metadatos (clave TEXT PRIMARY KEY, valor);
+CREATE TABLE IF NOT EXISTS bloques (
+    indice INTEGER PRIMARY KEY,
+    timestamp REAL NOT NULL,
+    hash_anterior TEXT NOT NULL,
+    hash_actual TEXT NOT NULL,
+    tema TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    sesion INTEGER,            -- Sesión cuyos votos se sellaron en el bloque (NULL si se importó o replicó)
+    numero_votos INTEGER NOT NULL,
+    json TEXT                  -- Bloque completo si sus votos no tienen el formato habitual
+);
+CREATE TABLE IF NOT EXISTS votos (
+    id INTEGER PRIMARY KEY,    -- Orden de aceptación
+    sesion INTEGER,
+    tema TEXT NOT NULL,
+    id_votante_hash TEXT NOT NULL,
+    id_candidato TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    bloque INTEGER,            -- NULL mientras el voto está pendiente de sellar
+    posicion INTEGER
+);
+CREATE UNIQUE INDEX IF NOT EXISTS votos_tema_votante ON votos (tema, id_votante_hash);
+CREATE INDEX IF NOT EXISTS votos_bloque ON votos (bloque, posicion);
+CREATE INDEX IF NOT EXISTS votos_sesion ON votos (sesion, bloque, id);
+CREATE TABLE IF NOT EXISTS candidatos (id INTEGER PRIMARY KEY, nombre TEXT NOT NULL, nombre_normalizado TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS candidatos_nombre ON candidatos (nombre_normalizado);
+CREATE TABLE IF NOT EXISTS sesiones (
+    id INTEGER PRIMARY KEY,
+    tema TEXT NOT NULL,
+    timestamp_inicio REAL NOT NULL,
+    activa INTEGER NOT NULL DEFAULT 1
+);
+CREATE UNIQUE INDEX IF NOT EXISTS sesiones_activas ON sesiones (tema) WHERE activa;
+CREATE TABLE IF NOT EXISTS candidatos_sesion (
+    sesion INTEGER NOT NULL,
+    id_candidato TEXT NOT NULL,
+    nombre TEXT NOT NULL,
+    PRIMARY KEY (sesion, id_candidato)
+);
+INSERT OR IGNORE INTO metadatos VALUES ('version', 0);
+INSERT OR IGNORE INTO metadatos VALUES ('ultimo_id_candidato', -1);
+"""
+PARAMETROS_POR_CONSULTA = 500  # Valores de cada IN (...) al consultar muchos votantes
+
+
+def _voto(timestamp, id_votante_hash, id_candidato, tema):
+    return {"timestamp": timestamp, "id_votante_hash": id_votante_hash, "id_candidato": id_candidato, "tema_votacion": tema}
+
+
+class AlmacenSQLite:
+    """
+    Estado completo de la votación en una base de datos SQLite en modo WAL: bloques, votos
+    (pendientes y sellados), candidatos globales y sesiones con sus candidatos. Varios
+    procesos pueden compartirla; cada operación de escritura es una transacción
+    (BEGIN IMMEDIATE), de modo que la aceptación de un voto, el sellado de un bloque sobre
+    la punta o el alta de un candidato se serializan entre todos ellos.
+
+    El índice único (tema, id_votante_hash) garantiza que un votante solo vota una vez por
+    tema aunque los votos lleguen a procesos distintos. Los votos de los bloques con el
+    formato habitual se guardan en la tabla de votos (una fila por voto, como las columnas de
+    VotosColumnares); el resto de bloques (génesis, votos de otro formato) como JSON completo.
+
+    Cada escritura incrementa la versión guardada en 'metadatos': con ella cada proceso sabe,
+    con una sola consulta, si tiene que incorporar cambios de los demás (ver cambios()).
+    """
+
+    TIEMPO_ESPERA = 60  # Segundos de espera si otro proceso tiene la base de datos bloqueada
+
+    def __init__(self, ruta, sincronizacion="FULL"):
+        self.ruta = ruta
+        self.sincronizacion = sincronizacion  # PRAGMA synchronous: FULL sincroniza el WAL en cada transacción
+        self._local = threading.local()  # Una conexión por hilo
+
+    def existe(self):
+        return os.path.exists(self.ruta)
+
+    def _conexion(self):
+        conexion = getattr(self._local, "conexion", None)
+        if conexion is None or self._local.pid != os.getpid():  # Las conexiones no se heredan tras un fork
+            conexion = sqlite3.connect(self.ruta, timeout=self.TIEMPO_ESPERA, isolation_level=None, check_same_thread=False)
+            conexion.execute("PRAGMA journal_mode=WAL")
+            conexion.execute(f"PRAGMA synchronous={self.sincronizacion}")
+            conexion.executescript(ESQUEMA)
+            conexion.execute("INSERT OR IGNORE INTO metadatos VALUES ('id', ?)", (uuid.uuid4().hex,))
+            self._local.conexion = conexion
+            self._local.pid = os.getpid()
+        return conexion
+
+    @contextlib.contextmanager
+    def _transaccion(self):
+        """Transacción de escritura; si ha modificado algo, incrementa la versión de la base de datos."""
+        conexion = self._conexion()
+        conexion.execute("BEGIN IMMEDIATE")
+        try:
+            cambios_antes = conexion.total_changes
+            yield conexion
+            if conexion.total_changes != cambios_antes:
+                conexion.execute("UPDATE metadatos SET valor = valor + 1 WHERE clave = 'version'")
+            conexion.execute("COMMIT")
+        except BaseException:
+            conexion.execute("ROLLBACK")
+            raise
+
+    @contextlib.contextmanager
+    def _lectura(self):
+        """Transacción de lectura: todas las consultas ven la misma instantánea de la base de datos."""
+        conexion = self._conexion()
+        conexion.execute("BEGIN")
+        try:
+            yield conexion
+        finally:
+            conexion.execute("COMMIT")
+
+    @staticmethod
+    def _metadato(conexion, clave):
+        return conexion.execute("SELECT valor FROM metadatos WHERE clave = ?", (clave,)).fetchone()[0]
+
+    def version(self):
+        """Contador de versión de la base de datos: aumenta con cada transacción que modifica algo."""
+        return self._metadato(self._conexion(), "version")
+
+    def identificador(self):
+        """Identificador de la base de datos, el mismo para todos los procesos que la comparten."""
+        return self._metadato(self._conexion(), "id")
+
+    def inicializar(self, datos_iniciales):
+        """
+        Si la base de datos aún no tiene bloques, la llena con datos_iniciales(), que devuelve
+        (bloques, candidatos_globales, ultimo_id_candidato). Solo lo hace un proceso aunque
+        arranquen varios a la vez. Devuelve True si la ha llenado.
+        """
+        with self._transaccion() as conexion:
+            if conexion.execute("SELECT 1 FROM bloques LIMIT 1").fetchone() is not None:
+                return False
+            bloques, candidatos, ultimo_id = datos_iniciales()
+            self._incorporar_candidatos(conexion, candidatos, ultimo_id)
+            for bloque in bloques:
+                self._insertar_bloque(conexion, bloque)
+            return True
+
+    # --- Bloques ---
+
+    def _insertar_bloque(self, conexion, bloque, id_sesion=None, ids_votos=None):
+        """
+        Guarda un bloque. Con ids_votos sus votos ya están en la tabla (votos pendientes de una
+        sesión recién sellados) y solo se asignan al bloque; si no, se insertan. Los bloques cuyos
+        votos no tienen el formato habitual o repiten un votante se guardan como JSON completo.
+        """
+        fila = (bloque.index, bloque.timestamp, bloque.hash_anterior, bloque.hash_actual,
+                bloque.tema_votacion, bloque.version, id_sesion, len(bloque.votos))
+        if ids_votos is not None:
+            conexion.execute("INSERT INTO bloques VALUES (?, ?, ?, ?, ?, ?, ?, ?, NULL)", fila)
+            conexion.executemany("UPDATE votos SET bloque = ?, posicion = ? WHERE id = ?",
+                                 ((bloque.index, posicion, id_voto) for posicion, id_voto in enumerate(ids_votos)))
+            return
+        votos = bloque.votos
+        if isinstance(votos, VotosColumnares.VotosColumnares) and type(bloque.timestamp) is float and type(bloque.index) is int:
+            conexion.execute("SAVEPOINT bloque")
+            try:
+                conexion.execute("INSERT INTO bloques VALUES (?, ?, ?, ?, ?, ?, ?, ?, NULL)", fila)
+                conexion.executemany(
+                    "INSERT INTO votos (tema, id_votante_hash, id_candidato, timestamp, bloque, posicion) VALUES (?, ?, ?, ?, ?, ?)",
+                    ((votos.tema, id_votante_hash, str(id_candidato), timestamp, bloque.index, posicion)
+                     for posicion, (timestamp, id_votante_hash, id_candidato)
+                     in enumerate(zip(votos.timestamps, votos.hashes_votantes(), votos.candidatos))))
+                conexion.execute("RELEASE bloque")
+                return
+            except sqlite3.IntegrityError:
+                conexion.execute("ROLLBACK TO bloque")
+                conexion.execute("RELEASE bloque")
+        conexion.execute("INSERT INTO bloques VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                         fila + (json.dumps(bloque.a_diccionario(), ensure_ascii=False),))
+
+    def _leer_bloques(self, conexion, desde=0):
+        """Bloques desde el índice 'desde', con sus votos (en formato columnar si es posible)."""
+        votos = conexion.execute("SELECT timestamp, id_votante_hash, id_candidato, tema FROM votos "
+                                 "WHERE bloque >= ? ORDER BY bloque, posicion", (desde,))
+        bloques = []
+        for indice, timestamp, hash_anterior, hash_actual, tema, version, numero_votos, datos_json in conexion.execute(
+                "SELECT indice, timestamp, hash_anterior, hash_actual, tema, version, numero_votos, json FROM bloques "
+                "WHERE indice >= ? ORDER BY indice", (desde,)):
+            if datos_json is not None:
+                bloques.append(Bloque.Bloque.desde_diccionario(json.loads(datos_json)))
+                continue
+            # Los votos de cada bloque son las siguientes 'numero_votos' filas de la consulta de votos
+            votos_bloque = [_voto(*fila) for fila in itertools.islice(votos, numero_votos)]
+            bloques.append(Bloque.Bloque(indice, timestamp, votos_bloque, hash_anterior, hash_actual, tema, version))
+        return bloques
+
+    @staticmethod
+    def _punta(conexion):
+        """Cabecera del último bloque (sin votos): suficiente para encadenar el siguiente."""
+        indice, timestamp, hash_anterior, hash_actual, tema, version = conexion.execute(
+            "SELECT indice, timestamp, hash_anterior, hash_actual, tema, version FROM bloques ORDER BY indice DESC LIMIT 1").fetchone()
+        return Bloque.Bloque(indice, timestamp, [], hash_anterior, hash_actual, tema, version)
+
+    def anexar(self, bloques):
+        """
+        Anexa bloques ya sellados (p.ej. recibidos de otro nodo) que encadenan con la punta.
+        Se detiene en el primero que no encadena (otro proceso ha añadido bloques entre medias).
+        Devuelve el número de bloques guardados.
+        """
+        with self._transaccion() as conexion:
+            punta = self._punta(conexion)
+            for guardados, bloque in enumerate(bloques):
+                if bloque.index != punta.index + 1 or bloque.hash_anterior != punta.hash_actual:
+                    return guardados
+                self._insertar_bloque(conexion, bloque)
+                punta = bloque
+            return len(bloques)
+
+    def compactar(self, bloques, candidatos_globales=None, ultimo_id_candidato_global=-1):
+        """
+        Sustituye todos los bloques por los indicados (p.ej. al importar una cadena) y añade los
+        candidatos que no estuvieran. Los votos pendientes de las votaciones activas se conservan.
+        """
+        with self._transaccion() as conexion:
+            conexion.execute("DELETE FROM votos WHERE bloque IS NOT NULL")
+            conexion.execute("DELETE FROM bloques")
+            self._incorporar_candidatos(conexion, candidatos_globales or {}, ultimo_id_candidato_global)
+            for bloque in bloques:
+                self._insertar_bloque(conexion, bloque)
+
+    # --- Candidatos ---
+
+    def _registrar_candidato(self, conexion, nombre):
+        """(id, nombre registrado) del candidato con ese nombre normalizado, dándolo de alta si no existe."""
+        fila = conexion.execute("SELECT id, nombre FROM candidatos WHERE nombre_normalizado = ? ORDER BY id LIMIT 1",
+                                (normalizar_nombre(nombre),)).fetchone()
+        if fila is not None:
+            return str(fila[0]), fila[1]
+        id_candidato = self._metadato(conexion, "ultimo_id_candidato") + 1
+        conexion.execute("INSERT INTO candidatos VALUES (?, ?, ?)", (id_candidato, nombre, normalizar_nombre(nombre)))
+        conexion.execute("UPDATE metadatos SET valor = ? WHERE clave = 'ultimo_id_candidato'", (id_candidato,))
+        return str(id_candidato), nombre
+
+    def registrar_candidato(self, nombre):
+        """Alta de un candidato global (o búsqueda si ya existe). Devuelve (id, nombre registrado)."""
+        with self._transaccion() as conexion:
+            return self._registrar_candidato(conexion, nombre)
+
+    def _incorporar_candidatos(self, conexion, candidatos, ultimo_id=-1):
+        nuevos = [id_candidato for id_candidato, nombre in candidatos.items()
+                  if conexion.execute("INSERT OR IGNORE INTO candidatos VALUES (?, ?, ?)",
+                                      (int(id_candidato), nombre, normalizar_nombre(nombre))).rowcount]
+        ultimo_guardado = self._metadato(conexion, "ultimo_id_candidato")
+        ultimo_id = max([ultimo_id, ultimo_guardado] + [int(id_candidato) for id_candidato in nuevos])
+        if ultimo_id != ultimo_guardado:
+            conexion.execute("UPDATE metadatos SET valor = ? WHERE clave = 'ultimo_id_candidato'", (ultimo_id,))
+        return nuevos
+
+    def incorporar_candidatos(self, candidatos, ultimo_id=-1):
+        """Añade candidatos ya existentes {id: nombre} (p.ej. de otro nodo). Devuelve los IDs que no estaban."""
+        with self._transaccion() as conexion:
+            return self._incorporar_candidatos(conexion, candidatos, ultimo_id)
+
+    # --- Sesiones y votos ---
+
+    def iniciar_sesion(self, tema, timestamp_inicio):
+        """Crea la sesión de votación de un tema. Devuelve su ID, o None si ya hay una activa para ese tema."""
+        try:
+            with self._transaccion() as conexion:
+                return conexion.execute("INSERT INTO sesiones (tema, timestamp_inicio) VALUES (?, ?)", (tema, timestamp_inicio)).lastrowid
+        except sqlite3.IntegrityError:
+            return None
+
+    def agregar_candidato_sesion(self, id_sesion, nombre):
+        """
+        Añade un candidato (dándolo de alta globalmente si no existe) a una sesión activa.
+        Devuelve (id, nombre registrado, True si no estaba en la sesión), o None si la sesión ya no está activa.
+        """
+        with self._transaccion() as conexion:
+            if conexion.execute("SELECT 1 FROM sesiones WHERE id = ? AND activa", (id_sesion,)).fetchone() is None:
+                return None
+            id_candidato, nombre = self._registrar_candidato(conexion, nombre)
+            nuevo = conexion.execute("INSERT OR IGNORE INTO candidatos_sesion VALUES (?, ?, ?)", (id_sesion, id_candidato, nombre)).rowcount
+            return id_candidato, nombre, bool(nuevo)
+
+    def emitir_votos(self, id_sesion, votos):
+        """
+        Acepta en una transacción los votos [(id_votante_hash, id_candidato, timestamp)] de una
+        sesión activa. Devuelve el motivo de rechazo de cada voto (None si se aceptó), o None si
+        la sesión ya no está activa. Un votante que ya votó en el tema (en la cadena o pendiente)
+        se rechaza aunque su voto lo aceptara otro proceso.
+        """
+        with self._transaccion() as conexion:
+            fila = conexion.execute("SELECT tema FROM sesiones WHERE id = ? AND activa", (id_sesion,)).fetchone()
+            if fila is None:
+                return None
+            tema = fila[0]
+            candidatos = {id_candidato for (id_candidato,) in conexion.execute(
+                "SELECT id_candidato FROM candidatos_sesion WHERE sesion = ?", (id_sesion,))}
+            hashes = list({id_votante_hash for id_votante_hash, _, _ in votos})
+            sellado = {}  # {id_votante_hash: True si su voto ya está en un bloque}
+            for inicio in range(0, len(hashes), PARAMETROS_POR_CONSULTA):
+                parte = hashes[inicio:inicio + PARAMETROS_POR_CONSULTA]
+                sellado.update(conexion.execute(
+                    f"SELECT id_votante_hash, bloque IS NOT NULL FROM votos WHERE tema = ? AND id_votante_hash IN ({','.join('?' * len(parte))})",
+                    (tema, *parte)))
+            motivos = []
+            filas = []
+            for id_votante_hash, id_candidato, timestamp in votos:
+                if id_candidato not in candidatos:
+                    motivos.append("candidato_invalido")
+                elif id_votante_hash in sellado:
+                    motivos.append("ya_voto_cadena" if sellado[id_votante_hash] else "ya_voto_sesion")
+                else:
+                    sellado[id_votante_hash] = False
+                    filas.append((id_sesion, tema, id_votante_hash, id_candidato, timestamp))
+                    motivos.append(None)
+            conexion.executemany("INSERT INTO votos (sesion, tema, id_votante_hash, id_candidato, timestamp) VALUES (?, ?, ?, ?, ?)", filas)
+            return motivos
+
+    def sellar(self, id_sesion, numero=None, finalizar=False):
+        """
+        Sella en un bloque sobre la punta los 'numero' primeros votos pendientes de una sesión
+        activa (todos por defecto) y, con finalizar=True, la cierra. Al ser una transacción,
+        ningún otro proceso puede sellar a la vez sobre la misma punta.
+        Devuelve (bloque creado o None si no había votos pendientes, True si la sesión tiene
+        algún voto), o None si la sesión ya no está activa.
+        """
+        with self._transaccion() as conexion:
+            fila = conexion.execute("SELECT tema FROM sesiones WHERE id = ? AND activa", (id_sesion,)).fetchone()
+            if fila is None:
+                return None
+            tema = fila[0]
+            consulta = "SELECT id, timestamp, id_votante_hash, id_candidato FROM votos WHERE sesion = ? AND bloque IS NULL ORDER BY id"
+            if numero is None:
+                pendientes = conexion.execute(consulta, (id_sesion,)).fetchall()
+            else:
+                pendientes = conexion.execute(consulta + " LIMIT ?", (id_sesion, numero)).fetchall()
+            bloque = None
+            if pendientes:
+                votos = [_voto(timestamp, id_votante_hash, id_candidato, tema) for _, timestamp, id_votante_hash, id_candidato in pendientes]
+                bloque = Bloque.Bloque.crear_nuevo_bloque(self._punta(conexion), votos, tema)
+                self._insertar_bloque(conexion, bloque, id_sesion, [id_voto for id_voto, _, _, _ in pendientes])
+            con_votos = bloque is not None or conexion.execute("SELECT 1 FROM votos WHERE sesion = ? LIMIT 1", (id_sesion,)).fetchone() is not None
+            if finalizar:
+                conexion.execute("UPDATE sesiones SET activa = 0 WHERE id = ?", (id_sesion,))
+            return bloque, con_votos
+
+    # --- Sincronización de los procesos ---
+
+    def cambios(self, version, punta, ultimo_voto, ultimo_id_candidato, ids_sesiones):
+        """
+        Cambios respecto al estado en memoria de un proceso, leídos en una única transacción de
+        lectura (todos de la misma versión). Devuelve None si la versión no ha cambiado.
+
+        'punta' es (index, hash_actual) del último bloque en memoria, o None si aún no hay nada
+        cargado; si ese bloque ya no está en la base de datos (p.ej. tras importar otra cadena)
+        se devuelve el estado completo con 'completo' = True. 'ids_sesiones' son las sesiones
+        activas en memoria: de ellas solo se devuelven los votos posteriores a 'ultimo_voto'; de
+        las demás sesiones activas, sus votos pendientes y el número de votos ya sellados.
+        """
+        with self._lectura() as conexion:
+            version_actual = self._metadato(conexion, "version")
+            if version_actual == version:
+                return None
+            completo = punta is None or conexion.execute(
+                "SELECT hash_actual FROM bloques WHERE indice = ?", (punta[0],)).fetchone() != (punta[1],)
+            if completo:
+                punta, ultimo_id_candidato, ids_sesiones = (-1, None), -1, ()
+
+            sesiones = conexion.execute("SELECT id, tema, timestamp_inicio FROM sesiones WHERE activa ORDER BY timestamp_inicio, id").fetchall()
+            candidatos_sesion = {id_sesion: {} for id_sesion, _, _ in sesiones}
+            for id_sesion, id_candidato, nombre in conexion.execute(
+                    "SELECT sesion, id_candidato, nombre FROM candidatos_sesion WHERE sesion IN (SELECT id FROM sesiones WHERE activa)"):
+                candidatos_sesion[id_sesion][id_candidato] = nombre
+
+            conocidas = [id_sesion for id_sesion, _, _ in sesiones if id_sesion in ids_sesiones]
+            votos = {id_sesion: [] for id_sesion in conocidas}
+            if conocidas:
+                for id_sesion, tema, timestamp, id_votante_hash, id_candidato in conexion.execute(
+                        f"SELECT sesion, tema, timestamp, id_votante_hash, id_candidato FROM votos "
+                        f"WHERE id > ? AND sesion IN ({','.join('?' * len(conocidas))}) ORDER BY id", (ultimo_voto, *conocidas)):
+                    votos[id_sesion].append(_voto(timestamp, id_votante_hash, id_candidato, tema))
+            nuevas = {}
+            for id_sesion, tema, timestamp_inicio in sesiones:
+                if id_sesion in ids_sesiones:
+                    continue
+                pendientes = [_voto(timestamp, id_votante_hash, id_candidato, tema) for timestamp, id_votante_hash, id_candidato in conexion.execute(
+                    "SELECT timestamp, id_votante_hash, id_candidato FROM votos WHERE sesion = ? AND bloque IS NULL ORDER BY id", (id_sesion,))]
+                sellados = conexion.execute("SELECT COUNT(*) FROM votos WHERE sesion = ? AND bloque IS NOT NULL", (id_sesion,)).fetchone()[0]
+                nuevas[id_sesion] = (pendientes, sellados)
+
+            bloques = self._leer_bloques(conexion, punta[0] + 1)
+            sesiones_bloques = dict(conexion.execute("SELECT indice, sesion FROM bloques WHERE indice > ? AND sesion IS NOT NULL", (punta[0],)))
+            return {
+                "version": version_actual,
+                "completo": completo,
+                "candidatos": {str(id_candidato): nombre for id_candidato, nombre in conexion.execute(
+                    "SELECT id, nombre FROM candidatos WHERE id > ? ORDER BY id", (ultimo_id_candidato,))},
+                "ultimo_id_candidato": self._metadato(conexion, "ultimo_id_candidato"),
+                "sesiones": {id_sesion: (tema, timestamp_inicio) for id_sesion, tema, timestamp_inicio in sesiones},
+                "candidatos_sesion": candidatos_sesion,
+                "votos": votos,
+                "nuevas": nuevas,
+                "bloques": [(bloque, sesiones_bloques.get(bloque.index)) for bloque in bloques],
+                "ultimo_voto": conexion.execute("SELECT COALESCE(MAX(id), 0) FROM votos").fetchone()[0],
+            }
+
+    # --- Conversión desde/hacia el JSON antiguo ---
+
+    def exportar_json(self, ruta_json):
+        """Escribe la cadena y los candidatos con el formato de blockchain_votacion.json."""
+        with self._lectura() as conexion:
+            bloques = self._leer_bloques(conexion)
+            candidatos = {str(id_candidato): nombre for id_candidato, nombre in conexion.execute("SELECT id, nombre FROM candidatos ORDER BY id")}
+            ultimo_id = self._metadato(conexion, "ultimo_id_candidato")
+        with open(ruta_json, "w", encoding="utf-8") as archivo:
+            archivo.write('{"candidatos_globales": ')
+            json.dump(candidatos, archivo, ensure_ascii=False)
+            archivo.write(', "bloques": [')
+            for i, bloque in enumerate(bloques):
+                archivo.write(",\n" if i else "\n")
+                json.dump(bloque.a_diccionario(), archivo, ensure_ascii=False)
+            archivo.write(f'\n], "ultimo_id_candidato_global": {ultimo_id}}}\n')
+        return len(bloques)
+
+    def importar_json(self, ruta_json):
+        """Sustituye la cadena por la de un blockchain_votacion.json y añade sus candidatos."""
+        with open(ruta_json, "r", encoding="utf-8") as archivo:
+            datos = json.load(archivo)
+        bloques = [Bloque.Bloque.desde_diccionario(bloque_dict) for bloque_dict in datos.get("bloques", [])]
+        self.compactar(bloques, datos.get("candidatos_globales", {}), datos.get("ultimo_id_candidato_global", -1))
+        return len(bloques)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convierte la base de datos SQLite de la votación desde/hacia el formato JSON.")
+    parser.add_argument("operacion", choices=["exportar", "importar"])
+    parser.add_argument("json", help="Archivo JSON de destino (exportar) u origen (importar)")
+    parser.add_argument("--base-datos", default="blockchain_votacion.sqlite", help="Ruta de la base de datos SQLite")
+    args = parser.parse_args()
+    almacen = AlmacenSQLite(args.base_datos)
+    if args.operacion == "exportar":
+        print(f"{almacen.exportar_json(args.json)} bloques exportados a {args.json}.")
+    else:
+        print(f"{almacen.importar_json(args.json)} bloques importados desde {args.json}.")
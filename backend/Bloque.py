@@ -1,20 +1,153 @@
 import hashlib
+import json
+import struct
+import sys
 import time
+import Merkle
+import Metricas
+import VotosColumnares
 
 class Bloque:
-    
-    def __init__(self, index, timestamp, votos, hash_anterior, hash_actual, tema_votacion="No especificado"):
+    VERSION_LEGADO = 1  # Hash sobre str() de los campos (bloques antiguos)
+    VERSION_ACTUAL = 2  # Hash sobre la cabecera canónica + raíz de Merkle de los votos
+
+    __slots__ = ("index", "timestamp", "_votos", "_cargar_votos", "hash_anterior", "hash_actual", "tema_votacion", "version", "_arbol_merkle")
+
+    def __init__(self, index, timestamp, votos, hash_anterior, hash_actual, tema_votacion="No especificado", version=VERSION_LEGADO):
         self.index = index
         self.timestamp = timestamp
-        self.votos = votos
         self.hash_anterior = hash_anterior
         self.hash_actual = hash_actual
-        self.tema_votacion = tema_votacion  # Nuevo atributo para el tema
-    
+        self.tema_votacion = sys.intern(tema_votacion) if isinstance(tema_votacion, str) else tema_votacion  # Nuevo atributo para el tema
+        self.version = version  # Esquema de hash con el que se selló el bloque
+        self.votos = votos
+        self._arbol_merkle = None  # Niveles del árbol de Merkle, construidos bajo demanda
+
+    @classmethod
+    def perezoso(cls, index, timestamp, cargar_votos, hash_anterior, hash_actual, tema_votacion, version):
+        """
+        Crea un bloque cuyos votos no están en memoria: cargar_votos() los devuelve al acceder
+        a ellos (p.ej. una vista sobre el archivo de la cadena mapeado en memoria).
+        """
+        bloque = cls(index, timestamp, [], hash_anterior, hash_actual, tema_votacion, version)
+        bloque._votos = None
+        bloque._cargar_votos = cargar_votos
+        return bloque
+
+    @property
+    def votos(self):
+        if self._votos is None:
+            return self._cargar_votos()
+        return self._votos
+
+    @votos.setter
+    def votos(self, votos):
+        self._votos = VotosColumnares.compactar(votos, self.tema_votacion)  # Columnar si los votos tienen el formato habitual
+        self._cargar_votos = None
+
+    def __reduce__(self):
+        # Al copiar el bloque a otro proceso se envían los votos, no la función que los carga
+        return (Bloque, (self.index, self.timestamp, self.votos, self.hash_anterior, self.hash_actual, self.tema_votacion, self.version))
+
+    def a_diccionario(self, incluir_votos=True):
+        """Representación JSON del bloque; sin votos se incluye solo su número."""
+        datos = {"index": self.index, "timestamp": self.timestamp}
+        if incluir_votos:
+            datos["votos"] = list(self.votos)  # Los votos columnares se reconstruyen como diccionarios
+        else:
+            datos["numero_votos"] = len(self.votos)
+        datos.update({
+            "hash_anterior": self.hash_anterior,
+            "hash_actual": self.hash_actual,
+            "tema_votacion": self.tema_votacion,
+            "version": self.version
+        })
+        return datos
+
+    def a_json(self, incluir_votos=True):
+        """
+        a_diccionario() en JSON compacto y UTF-8. Los votos columnares se codifican directamente
+        desde sus columnas; el resultado es el mismo que con json.dumps.
+        """
+        votos = self.votos
+        if not incluir_votos or not isinstance(votos, VotosColumnares.VotosColumnares):
+            return json.dumps(self.a_diccionario(incluir_votos), separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        cabecera = self.a_diccionario(incluir_votos=False)
+        del cabecera["numero_votos"]
+        cabecera = json.dumps(cabecera, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        # {"index":..,"timestamp":..,"votos":[..],"hash_anterior":..}: los votos van tras los dos primeros campos
+        inicio = json.dumps({"index": self.index, "timestamp": self.timestamp}, separators=(",", ":")).encode("utf-8")
+        return b"".join((inicio[:-1], b',"votos":', votos.a_json(), cabecera[len(inicio) - 1:]))
+
+    @staticmethod
+    def desde_diccionario(datos):
+        return Bloque(
+            index=datos["index"],
+            timestamp=datos["timestamp"],
+            votos=datos["votos"],
+            hash_anterior=datos["hash_anterior"],
+            hash_actual=datos["hash_actual"],
+            tema_votacion=datos.get("tema_votacion", "No especificado"),
+            version=datos.get("version", Bloque.VERSION_LEGADO)
+        )
+
     def calcular_hash(self):
+        with Metricas.medir("votacion_hash_bloque_segundos", version=self.version):
+            if self.version == self.VERSION_LEGADO:
+                return self._calcular_hash_legado()
+            return self.hash_desde_raiz(self.calcular_raiz_merkle())
+
+    def _calcular_hash_legado(self):
         # Incluir el tema de votación en el cálculo del hash para garantizar la integridad
         bloque_string = str(self.index) + str(self.timestamp) + str(self.votos) + str(self.hash_anterior) + str(self.tema_votacion)
         return hashlib.sha256(bloque_string.encode()).hexdigest()
+
+    def calcular_raiz_merkle(self):
+        return Merkle.raiz_merkle(self.votos)
+
+    def arbol_merkle(self):
+        """Devuelve (y guarda) los niveles del árbol de Merkle de los votos del bloque."""
+        if self._arbol_merkle is None:
+            self._arbol_merkle = Merkle.construir_niveles(self.votos)
+        return self._arbol_merkle
+
+    def prueba_inclusion(self, posicion):
+        """
+        Devuelve el comprobante de inclusión del voto en 'posicion': el voto, la cabecera del
+        bloque, la raíz de Merkle y la prueba necesaria para recalcular hash_actual.
+        """
+        niveles = self.arbol_merkle()
+        return {
+            "voto": self.votos[posicion],
+            "posicion": posicion,
+            "bloque": {
+                "index": self.index,
+                "timestamp": self.timestamp,
+                "hash_anterior": self.hash_anterior,
+                "hash_actual": self.hash_actual,
+                "tema_votacion": self.tema_votacion,
+                "version": self.version,
+                "numero_votos": len(self.votos)
+            },
+            "hash_hoja": niveles[0][posicion].hex(),
+            "raiz_merkle": niveles[-1][0].hex(),
+            "prueba": Merkle.prueba_inclusion(niveles, posicion)
+        }
+
+    def hash_desde_raiz(self, raiz_merkle):
+        """
+        Hash v2: SHA-256 en streaming sobre una serialización determinista de la cabecera
+        (campos de tamaño fijo o con prefijo de longitud) seguida de la raíz de Merkle de los votos.
+        """
+        h = hashlib.sha256(b"bloque-v2")
+        h.update(struct.pack(">Qd", self.index, float(self.timestamp)))
+        for campo in (self.hash_anterior, self.tema_votacion):
+            datos = campo.encode("utf-8")
+            h.update(struct.pack(">I", len(datos)))
+            h.update(datos)
+        h.update(struct.pack(">Q", len(self.votos)))
+        h.update(raiz_merkle)
+        return h.hexdigest()
     
     @staticmethod
     def crear_bloque_genesis(tema_votacion="Bloque Génesis"):
@@ -30,6 +163,6 @@ class Bloque:
         if tema_votacion is None:
             tema_votacion = bloque_anterior.tema_votacion
         
-        nuevo_bloque = Bloque(index, timestamp, votos_pendientes, hash_anterior, "", tema_votacion)
+        nuevo_bloque = Bloque(index, timestamp, votos_pendientes, hash_anterior, "", tema_votacion, Bloque.VERSION_ACTUAL)
         nuevo_bloque.hash_actual = nuevo_bloque.calcular_hash()
         return nuevo_bloque
\ No newline at end of file
@@ -0,0 +1,43 @@
+import collections
+import threading
+
+
+class CacheRespuestas:
+    """
+    Caché LRU de respuestas ya serializadas, por ruta y consulta.
+
+    Cada entrada guarda el ETag de la versión del estado con la que se generó y solo se
+    reutiliza mientras la versión actual tenga ese mismo ETag; una entrada obsoleta se
+    sustituye al volver a generar la respuesta. Está acotada en número de entradas y en bytes
+    (se expulsan las menos usadas recientemente); las respuestas mayores que una cuarta parte
+    del límite de bytes no se guardan.
+    """
+
+    def __init__(self, maximo_entradas=256, maximo_bytes=64 * 1024 * 1024):
+        self.maximo_entradas = maximo_entradas
+        self.maximo_bytes = maximo_bytes
+        self._entradas = collections.OrderedDict()  # {(ruta, consulta): (etag, cuerpo, código, tipo)}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def obtener(self, clave, etag):
+        """Devuelve (etag, cuerpo, código, tipo) si hay una respuesta guardada para ese ETag, o None."""
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None or entrada[0] != etag:
+                return None
+            self._entradas.move_to_end(clave)
+            return entrada
+
+    def guardar(self, clave, etag, cuerpo, codigo, tipo):
+        if len(cuerpo) > self.maximo_bytes // 4:
+            return
+        with self._lock:
+            anterior = self._entradas.pop(clave, None)
+            if anterior is not None:
+                self._bytes -= len(anterior[1])
+            self._entradas[clave] = (etag, cuerpo, codigo, tipo)
+            self._bytes += len(cuerpo)
+            while len(self._entradas) > self.maximo_entradas or self._bytes > self.maximo_bytes:
+                _, (_, expulsado, _, _) = self._entradas.popitem(last=False)
+                self._bytes -= len(expulsado)
@@ -1,53 +1,107 @@
+import logging
 import Bloque
+import Metricas
+import VotosColumnares
+
+logger = logging.getLogger(__name__)
 
 class Cadena:
     def __init__(self, tema_votacion="Bloque Genesis"):
         self.cadena = []
         self.tema_votacion = tema_votacion
         self.cadena.append(Bloque.Bloque.crear_bloque_genesis(self.tema_votacion))
+        # Índice secundario {tema: resumen} con las posiciones de sus bloques, el número de votos,
+        # el rango de tiempo de los votos y los candidatos votados (ver indexar_bloque)
+        self.indice_temas = {}
 
+    @Metricas.medir("votacion_bloque_agregado_segundos")
     def agregar_bloque(self, votos_nuevos, tema_votacion):
         """
         Agrega un nuevo bloque directamente con los votos proporcionados y un tema específico.
         Ya no usa votos_pendientes internos.
         """
         if not votos_nuevos:
-            print("No se proporcionaron votos para crear el bloque.")
+            logger.warning("No se proporcionaron votos para crear el bloque.")
             return False
 
         bloque_anterior = self.peek()
         if not bloque_anterior:
-            print("Error: No se puede agregar bloque, la cadena parece vacía o corrupta después del génesis.")
+            logger.error("No se puede agregar bloque, la cadena parece vacía o corrupta después del génesis.")
             return False
 
         if tema_votacion is None:
-            print("Error: Se requiere un tema de votación para crear un nuevo bloque.")
+            logger.error("Se requiere un tema de votación para crear un nuevo bloque.")
             return False
 
         nuevo_bloque = Bloque.Bloque.crear_nuevo_bloque(bloque_anterior, votos_nuevos, tema_votacion)
 
         if self.validar_bloque(nuevo_bloque):
             self.cadena.append(nuevo_bloque)
-            print(f"Bloque para el tema '{tema_votacion}' agregado correctamente.")
+            self.indexar_bloque(nuevo_bloque)
+            logger.info("Bloque para el tema '%s' agregado correctamente.", tema_votacion)
             return True
         else:
-            print(f"Error de validación al intentar agregar bloque para '{tema_votacion}'.")
+            logger.error("Error de validación al intentar agregar bloque para '%s'.", tema_votacion)
+            return False
+
+    def indexar_bloque(self, bloque):
+        """Incorpora un bloque al índice de temas (el bloque génesis no pertenece a ningún tema)."""
+        if bloque.index == 0:
+            return
+        resumen = self.indice_temas.get(bloque.tema_votacion)
+        if resumen is None:
+            resumen = self.indice_temas[bloque.tema_votacion] = {
+                "bloques": [],
+                "numero_votos": 0,
+                "primer_voto": None,
+                "ultimo_voto": None,
+                "candidatos": set(),
+            }
+        resumen["bloques"].append(bloque.index)
+        resumen["numero_votos"] += len(bloque.votos)
+        primer_voto, ultimo_voto = VotosColumnares.rango_timestamps(bloque.votos, bloque.timestamp)
+        if resumen["primer_voto"] is None or primer_voto < resumen["primer_voto"]:
+            resumen["primer_voto"] = primer_voto
+        if resumen["ultimo_voto"] is None or ultimo_voto > resumen["ultimo_voto"]:
+            resumen["ultimo_voto"] = ultimo_voto
+        resumen["candidatos"].update(VotosColumnares.recuento_candidatos(bloque.votos))
+
+    def reconstruir_indice_temas(self):
+        """Reconstruye el índice de temas desde cero (p.ej. tras cargar la cadena desde disco)."""
+        self.indice_temas = {}
+        for bloque in self.cadena:
+            self.indexar_bloque(bloque)
+
+    def bloques_de_tema(self, tema):
+        """Devuelve los bloques de un tema, en orden, sin recorrer el resto de la cadena."""
+        resumen = self.indice_temas.get(tema)
+        if resumen is None:
+            return []
+        return [self.cadena[indice] for indice in resumen["bloques"]]
+
+    def incorporar_bloque(self, bloque):
+        """
+        Añade un bloque ya sellado en otro nodo (replicación) tras validarlo con las mismas
+        reglas que los bloques propios. Devuelve False si no encadena con la punta o su hash no coincide.
+        """
+        if not self.validar_bloque(bloque):
             return False
+        self.cadena.append(bloque)
+        self.indexar_bloque(bloque)
+        return True
 
     def validar_bloque(self, bloque):
-        if self.cadena_vacia():
-            print("Advertencia: Validando bloque en una cadena supuestamente vacía.")
-            return True
+        # También se comprueba el enlace con el génesis: un bloque recibido de otro nodo no tiene por qué encadenar
         bloque_anterior = self.peek()
         if not bloque_anterior:
-            print("Error crítico: No se encontró el bloque anterior para validar.")
+            logger.error("No se encontró el bloque anterior para validar.")
             return False
         if bloque.hash_anterior != bloque_anterior.hash_actual or bloque_anterior.index + 1 != bloque.index:
-            print(f"Error en el bloque {bloque.index}. Hash anterior no coincide ({bloque.hash_anterior} vs {bloque_anterior.hash_actual}) o índice incorrecto.")
+            logger.error("Error en el bloque %s. Hash anterior no coincide (%s vs %s) o índice incorrecto.", bloque.index, bloque.hash_anterior, bloque_anterior.hash_actual)
             return False
         hash_calculado = bloque.calcular_hash()
         if hash_calculado != bloque.hash_actual:
-            print(f"Error en el bloque {bloque.index}. Hash calculado ({hash_calculado}) no coincide con el almacenado ({bloque.hash_actual}).")
+            logger.error("Error en el bloque %s. Hash calculado (%s) no coincide con el almacenado (%s).", bloque.index, hash_calculado, bloque.hash_actual)
             return False
         return True
 
@@ -0,0 +1,155 @@
+import logging
+import os
+import threading
+import time
+import AlmacenLog
+
+logger = logging.getLogger(__name__)
+
+class DiarioVotos:
+    """
+    Diario de escritura anticipada (WAL) de la sesión de votación activa: inicio de la sesión,
+    candidatos añadidos y votos aceptados (uno por registro, o un registro por cada lote de
+    /votacion/votar/lote). Se reproduce al arrancar para reconstruir la sesión.
+
+    Los registros se anotan en memoria en el orden en que se aceptan (anotar) y después se
+    espera a que sean duraderos (esperar). La escritura se hace en grupo: el hilo que escribe
+    vuelca con un único fsync todos los registros acumulados hasta ese momento.
+
+    El coste de la durabilidad es configurable:
+    - votos_por_sincronizacion=1 e intervalo_sincronizacion=0 (por defecto): cada voto se
+      confirma solo cuando está en disco (compartiendo fsync con los votos concurrentes).
+    - votos_por_sincronizacion=N: los votos se confirman sin esperar y se sincronizan en
+      lotes de N registros.
+    - intervalo_sincronizacion=T: además, un hilo en segundo plano sincroniza cada T segundos
+      lo que haya pendiente. Con lotes o intervalo, un corte puede perder los votos aún no sincronizados.
+    """
+
+    def __init__(self, ruta, votos_por_sincronizacion=1, intervalo_sincronizacion=0):
+        self.ruta = ruta
+        self.votos_por_sincronizacion = max(1, votos_por_sincronizacion)
+        self.intervalo_sincronizacion = intervalo_sincronizacion
+        self._condicion = threading.Condition()
+        self._pendientes = []  # Registros ya codificados, aún no escritos
+        self._ultimo_ticket = 0  # Ticket del último registro anotado
+        self._ticket_persistido = 0  # Todos los tickets <= éste ya se han procesado
+        self._tickets_fallidos = []  # [(desde, hasta)] de lotes cuya escritura falló
+        self._escribiendo = False
+        self._cerrado = False
+        if self.intervalo_sincronizacion > 0:
+            hilo = threading.Thread(target=self._sincronizar_periodicamente, name="sincronizacion-diario", daemon=True)
+            hilo.start()
+
+    def anotar(self, registro):
+        """
+        Añade un registro al lote en curso y devuelve su ticket. Debe llamarse mientras se
+        mantiene el bloqueo que decide la aceptación, para que el orden del diario sea el de aceptación.
+        """
+        datos = AlmacenLog.codificar_registro(registro)
+        with self._condicion:
+            self._pendientes.append(datos)
+            self._ultimo_ticket += 1
+            return self._ultimo_ticket
+
+    def esperar(self, ticket, forzar=False):
+        """
+        Espera a que el registro con ese ticket sea duradero según la política configurada
+        (forzar=True siempre espera al fsync). Devuelve False si falló su escritura.
+        """
+        with self._condicion:
+            umbral = self._umbral_volcado()
+            if not forzar and umbral != 1 and (umbral is None or len(self._pendientes) < umbral):
+                # Se hará duradero en un lote posterior o en la sincronización periódica
+                return True
+            while self._ticket_persistido < ticket:
+                if self._escribiendo:
+                    self._condicion.wait()
+                    continue
+                self._volcar_pendientes()
+            return not any(desde <= ticket <= hasta for desde, hasta in self._tickets_fallidos)
+
+    def _umbral_volcado(self):
+        """Registros pendientes a partir de los cuales quien espera vuelca el lote (None: solo el hilo periódico)."""
+        if self.votos_por_sincronizacion > 1:
+            return self.votos_por_sincronizacion
+        return None if self.intervalo_sincronizacion > 0 else 1
+
+    def _volcar_pendientes(self):
+        """Escribe y sincroniza todo lo acumulado. Se llama con la condición adquirida."""
+        lote = self._pendientes
+        desde = self._ticket_persistido + 1
+        hasta = self._ultimo_ticket
+        self._pendientes = []
+        self._escribiendo = True
+        self._condicion.release()
+        try:
+            if lote:
+                self._escribir(lote)
+        except Exception as e:
+            logger.error("Error al escribir %s registros en el diario %s: %s", len(lote), self.ruta, e)
+            self._tickets_fallidos.append((desde, hasta))
+        finally:
+            self._condicion.acquire()
+            self._escribiendo = False
+            self._ticket_persistido = hasta
+            self._condicion.notify_all()
+
+    def _escribir(self, lote):
+        with open(self.ruta, "ab") as archivo:
+            archivo.write(b"".join(lote))
+            archivo.flush()
+            os.fsync(archivo.fileno())
+
+    def sincronizar(self):
+        """Fuerza la escritura de todos los registros pendientes (p.ej. al cerrar la aplicación)."""
+        with self._condicion:
+            while self._escribiendo:
+                self._condicion.wait()
+            if self._pendientes:
+                self._volcar_pendientes()
+
+    def _sincronizar_periodicamente(self):
+        while not self._cerrado:
+            time.sleep(self.intervalo_sincronizacion)
+            self.sincronizar()
+
+    def reproducir(self):
+        """
+        Devuelve los registros válidos del diario. Si el final está truncado o corrupto (corte
+        durante una escritura) se recorta el archivo para que los nuevos registros queden legibles.
+        """
+        if not os.path.exists(self.ruta):
+            return []
+        registros, bytes_validos, tamano = AlmacenLog.leer_registros(self.ruta)
+        if bytes_validos != tamano:
+            logger.warning("Se descartaron %s bytes incompletos al final del diario %s.", tamano - bytes_validos, self.ruta)
+            with open(self.ruta, "r+b") as archivo:
+                archivo.truncate(bytes_validos)
+                archivo.flush()
+                os.fsync(archivo.fileno())
+        return registros
+
+    def vaciar(self):
+        """Descarta el contenido del diario (p.ej. cuando sus votos ya están en un bloque guardado)."""
+        with self._condicion:
+            while self._escribiendo:
+                self._condicion.wait()
+            self._pendientes = []
+            self._ticket_persistido = self._ultimo_ticket
+            self._tickets_fallidos = []
+            with open(self.ruta, "wb") as archivo:
+                archivo.flush()
+                os.fsync(archivo.fileno())
+
+    def eliminar(self):
+        """Cierra el diario y borra su archivo (cuando la sesión ya está sellada en la cadena)."""
+        with self._condicion:
+            while self._escribiendo:
+                self._condicion.wait()
+            self._cerrado = True
+            self._pendientes = []
+            self._ticket_persistido = self._ultimo_ticket
+            try:
+                os.remove(self.ruta)
+            except FileNotFoundError:
+                pass
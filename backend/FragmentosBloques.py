@@ -0,0 +1,44 @@
+import collections
+import threading
+
+
+class FragmentosBloques:
+    """
+    Caché LRU del JSON ya codificado (Bloque.a_json) de los bloques confirmados.
+
+    Un bloque de la cadena no cambia una vez sellado, así que su JSON se genera una sola vez y
+    las respuestas de /cadena se construyen concatenando estos fragmentos, sin volver a
+    serializar los votos en cada petición. La clave incluye index y hash_actual, de modo que un
+    bloque distinto en la misma posición nunca reutiliza el fragmento de otro. Está acotada en
+    bytes: se expulsan los fragmentos menos usados recientemente.
+    """
+
+    def __init__(self, maximo_bytes=128 * 1024 * 1024):
+        self.maximo_bytes = maximo_bytes
+        self._fragmentos = collections.OrderedDict()  # {(index, hash_actual, incluir_votos): bytes}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def obtener(self, bloque, incluir_votos=True):
+        """JSON del bloque en UTF-8 (con o sin votos), generado en la primera petición."""
+        clave = (bloque.index, bloque.hash_actual, incluir_votos)
+        with self._lock:
+            fragmento = self._fragmentos.get(clave)
+            if fragmento is not None:
+                self._fragmentos.move_to_end(clave)
+                return fragmento
+        fragmento = bloque.a_json(incluir_votos)  # Fuera del bloqueo: otras peticiones siguen sirviéndose
+        if len(fragmento) <= self.maximo_bytes // 4:
+            with self._lock:
+                if clave not in self._fragmentos:
+                    self._fragmentos[clave] = fragmento
+                    self._bytes += len(fragmento)
+                    while self._bytes > self.maximo_bytes:
+                        _, expulsado = self._fragmentos.popitem(last=False)
+                        self._bytes -= len(expulsado)
+        return fragmento
+
+    def vaciar(self):
+        with self._lock:
+            self._fragmentos.clear()
+            self._bytes = 0
@@ -0,0 +1,52 @@
+import logging
+import os
+import AlmacenLog
+
+logger = logging.getLogger(__name__)
+
+
+class Instantanea:
+    """
+    Instantánea del estado derivado de la cadena (índice de temas, recuentos y punto de control
+    de la verificación de integridad) asociada al bloque en que se tomó (index y hash_actual).
+
+    Al arrancar, si ese bloque sigue en la cadena cargada, el estado se restaura desde aquí y
+    solo se indexan los bloques posteriores, sin recorrer los votos del historial. Si no
+    corresponde (otra cadena, otra versión del formato o archivo dañado) se ignora y los índices
+    se reconstruyen desde cero. Es un archivo derivado: se puede borrar en cualquier momento.
+
+    Se guarda como un único registro con el formato de AlmacenLog (longitud + CRC32 + JSON).
+    """
+    VERSION = 1
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+
+    def existe(self):
+        return os.path.exists(self.ruta)
+
+    def cargar(self):
+        """Devuelve el contenido de la instantánea, o None si no existe, está dañada o es de otra versión."""
+        if not self.existe():
+            return None
+        try:
+            registros, bytes_validos, tamano = AlmacenLog.leer_registros(self.ruta)
+        except OSError as e:
+            logger.warning("No se pudo leer la instantánea %s: %s", self.ruta, e)
+            return None
+        if len(registros) != 1 or bytes_validos != tamano:
+            logger.warning("La instantánea %s está dañada. Se ignora.", self.ruta)
+            return None
+        if registros[0].get("version") != self.VERSION:
+            logger.info("La instantánea %s es de otra versión del formato. Se ignora.", self.ruta)
+            return None
+        return registros[0]
+
+    def guardar(self, estado):
+        """Escribe la instantánea de forma atómica (archivo temporal + os.replace)."""
+        ruta_tmp = self.ruta + ".tmp"
+        with open(ruta_tmp, "wb") as archivo:
+            archivo.write(AlmacenLog.codificar_registro(dict(estado, version=self.VERSION)))
+            archivo.flush()
+            os.fsync(archivo.fileno())
+        os.replace(ruta_tmp, self.ruta)
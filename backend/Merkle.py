@@ -0,0 +1,137 @@
+import hashlib
+import json
+import struct
+
+# Prefijos de separación de dominio (RFC 6962): una hoja nunca puede confundirse con un nodo interno
+PREFIJO_HOJA = b"\x00"
+PREFIJO_NODO = b"\x01"
+CAMPOS_VOTO = ("timestamp", "id_votante_hash", "id_candidato", "tema_votacion")
+TAM_TRAMO = 1024  # Hojas que se reducen juntas antes de pasar a la pila (debe ser potencia de 2)
+
+_empaquetar_timestamp = struct.Struct(">d").pack
+_empaquetar_longitud = struct.Struct(">I").pack
+
+
+def con_longitud(texto):
+    datos = texto.encode("utf-8")
+    return _empaquetar_longitud(len(datos)) + datos
+
+
+def codificar_voto(voto):
+    """
+    Codificación canónica en bytes de un voto. Los votos con el formato habitual se codifican
+    en binario (timestamp como double IEEE-754 y cadenas con prefijo de longitud); cualquier
+    otro diccionario se codifica como JSON con claves ordenadas. El resultado no depende
+    del orden de las claves ni de la representación textual de los floats.
+    """
+    if (len(voto) == len(CAMPOS_VOTO) and isinstance(voto.get("timestamp"), float)
+            and all(isinstance(voto.get(campo), str) for campo in CAMPOS_VOTO[1:])):
+        return b"".join((
+            b"V",
+            _empaquetar_timestamp(voto["timestamp"]),
+            con_longitud(voto["id_votante_hash"]),
+            con_longitud(voto["id_candidato"]),
+            con_longitud(voto["tema_votacion"]),
+        ))
+    return b"J" + json.dumps(voto, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def hash_hoja(voto):
+    return hashlib.sha256(PREFIJO_HOJA + codificar_voto(voto)).digest()
+
+
+def hashes_hojas(votos):
+    """
+    Itera los hashes de hoja de los votos. Si la colección sabe generar directamente sus
+    codificaciones canónicas (VotosColumnares) se usan éstas sin construir cada voto.
+    """
+    codificaciones = getattr(votos, "codificaciones", None)
+    if codificaciones is None:
+        return map(hash_hoja, votos)
+    return (hashlib.sha256(PREFIJO_HOJA + datos).digest() for datos in codificaciones())
+
+
+def hash_nodo(izquierdo, derecho):
+    return hashlib.sha256(PREFIJO_NODO + izquierdo + derecho).digest()
+
+
+def _reducir_nivel(nivel):
+    """Combina un nivel del árbol por parejas; un nodo impar final sube sin cambios."""
+    siguiente = [hash_nodo(izq, der) for izq, der in zip(nivel[0::2], nivel[1::2])]
+    if len(nivel) % 2:
+        siguiente.append(nivel[-1])
+    return siguiente
+
+
+def _reducir_tramo(hojas):
+    """Devuelve (altura, raíz) del subárbol formado por una lista no vacía de hojas."""
+    altura = 0
+    while len(hojas) > 1:
+        hojas = _reducir_nivel(hojas)
+        altura += 1
+    return altura, hojas[0]
+
+
+def raiz_merkle(votos):
+    """
+    Calcula la raíz del árbol de Merkle de los votos (equivalente al árbol de RFC 6962)
+    sin materializar el árbol: las hojas se procesan en tramos de TAM_TRAMO y solo se
+    guarda una pila de subárboles completos, por lo que la memoria es O(TAM_TRAMO + log n).
+    """
+    pila = []  # [(altura, hash)] de subárboles completos, de mayor a menor altura
+    tramo = []
+    for hoja in hashes_hojas(votos):
+        tramo.append(hoja)
+        if len(tramo) == TAM_TRAMO:
+            altura, raiz = _reducir_tramo(tramo)
+            while pila and pila[-1][0] == altura:
+                raiz = hash_nodo(pila.pop()[1], raiz)
+                altura += 1
+            pila.append((altura, raiz))
+            tramo = []
+    if tramo:
+        pila.append(_reducir_tramo(tramo))
+    if not pila:
+        return hashlib.sha256(b"").digest()
+    raiz = pila.pop()[1]
+    while pila:
+        raiz = hash_nodo(pila.pop()[1], raiz)
+    return raiz
+
+
+def construir_niveles(votos):
+    """Construye el árbol completo como lista de niveles (hojas primero, raíz al final)."""
+    niveles = [list(hashes_hojas(votos))]
+    if not niveles[0]:
+        return [[hashlib.sha256(b"").digest()]]
+    while len(niveles[-1]) > 1:
+        niveles.append(_reducir_nivel(niveles[-1]))
+    return niveles
+
+
+def prueba_inclusion(niveles, posicion):
+    """
+    Devuelve la prueba de inclusión O(log n) de la hoja en 'posicion': la lista de hermanos
+    desde la hoja hasta la raíz, indicando a qué lado hay que concatenar cada uno.
+    """
+    prueba = []
+    for nivel in niveles[:-1]:
+        hermano = posicion ^ 1
+        if hermano < len(nivel):
+            lado = "izquierda" if hermano < posicion else "derecha"
+            prueba.append({"lado": lado, "hash": nivel[hermano].hex()})
+        # Si no hay hermano, el nodo sube sin cambios al siguiente nivel
+        posicion //= 2
+    return prueba
+
+
+def raiz_desde_prueba(hash_hoja_actual, prueba):
+    """Recalcula la raíz a partir del hash de una hoja y su prueba de inclusión."""
+    actual = hash_hoja_actual
+    for paso in prueba:
+        hermano = bytes.fromhex(paso["hash"])
+        if paso["lado"] == "izquierda":
+            actual = hash_nodo(hermano, actual)
+        else:
+            actual = hash_nodo(actual, hermano)
+    return actual
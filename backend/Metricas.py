@@ -0,0 +1,143 @@
+import bisect
+import contextlib
+import threading
+import time
+
+# Límites (en segundos) de los histogramas de latencia
+LIMITES_LATENCIA = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _formatear_etiquetas(etiquetas):
+    if not etiquetas:
+        return ""
+    pares = ",".join('%s="%s"' % (clave, str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+                     for clave, valor in etiquetas)
+    return "{" + pares + "}"
+
+
+def _formatear_numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Metricas:
+    """
+    Registro en memoria de contadores, histogramas e indicadores, exportable en el formato
+    de texto de Prometheus. Las operaciones son O(1) (O(log n) límites en los histogramas)
+    y seguras entre hilos, por lo que se pueden usar en el camino de cada voto.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ayudas = {}  # {nombre: (tipo, ayuda)}
+        self._contadores = {}  # {(nombre, etiquetas): valor}
+        self._histogramas = {}  # {(nombre, etiquetas): [cuentas por límite..., suma, total]}
+        self._limites = {}  # {nombre: límites del histograma}
+        self._indicadores = {}  # {nombre: función que devuelve el valor actual}
+
+    def describir(self, nombre, tipo, ayuda, limites=LIMITES_LATENCIA):
+        """Declara una métrica (tipo 'counter', 'histogram' o 'gauge') con su texto de ayuda."""
+        self._ayudas[nombre] = (tipo, ayuda)
+        if tipo == "histogram":
+            self._limites[nombre] = tuple(limites)
+
+    def incrementar(self, nombre, valor=1, **etiquetas):
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        with self._lock:
+            self._contadores[clave] = self._contadores.get(clave, 0) + valor
+
+    def observar(self, nombre, valor, **etiquetas):
+        """Añade una observación (p.ej. una duración en segundos) a un histograma."""
+        limites = self._limites.get(nombre, LIMITES_LATENCIA)
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        posicion = bisect.bisect_left(limites, valor)
+        with self._lock:
+            cubetas = self._histogramas.get(clave)
+            if cubetas is None:
+                cubetas = self._histogramas[clave] = [0] * (len(limites) + 1) + [0.0]
+            cubetas[posicion] += 1
+            cubetas[-1] += valor
+
+    @contextlib.contextmanager
+    def medir(self, nombre, **etiquetas):
+        """Mide la duración del bloque 'with' y la observa en el histograma 'nombre'."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(nombre, time.perf_counter() - inicio, **etiquetas)
+
+    def registrar_indicador(self, nombre, funcion, ayuda):
+        """Registra un indicador (gauge) cuyo valor se obtiene llamando a 'funcion' al exportar."""
+        self.describir(nombre, "gauge", ayuda)
+        self._indicadores[nombre] = funcion
+
+    def valor(self, nombre, **etiquetas):
+        """Valor actual de un contador (0 si no se ha incrementado nunca)."""
+        return self._contadores.get((nombre, tuple(sorted(etiquetas.items()))), 0)
+
+    def exportar_prometheus(self):
+        """Devuelve todas las métricas en el formato de texto de exposición de Prometheus."""
+        with self._lock:
+            contadores = dict(self._contadores)
+            histogramas = {clave: list(cubetas) for clave, cubetas in self._histogramas.items()}
+        lineas = []
+        descritas = set()
+
+        def cabecera(nombre, tipo_por_defecto):
+            if nombre in descritas:
+                return
+            descritas.add(nombre)
+            tipo, ayuda = self._ayudas.get(nombre, (tipo_por_defecto, ""))
+            if ayuda:
+                lineas.append(f"# HELP {nombre} {ayuda}")
+            lineas.append(f"# TYPE {nombre} {tipo}")
+
+        for (nombre, etiquetas), valor in sorted(contadores.items()):
+            cabecera(nombre, "counter")
+            lineas.append(f"{nombre}{_formatear_etiquetas(etiquetas)} {_formatear_numero(valor)}")
+        for (nombre, etiquetas), cubetas in sorted(histogramas.items()):
+            cabecera(nombre, "histogram")
+            limites = self._limites.get(nombre, LIMITES_LATENCIA)
+            acumulado = 0
+            for limite, cuenta in zip(limites, cubetas):
+                acumulado += cuenta
+                lineas.append(f"{nombre}_bucket{_formatear_etiquetas(etiquetas + (('le', repr(float(limite))),))} {acumulado}")
+            total = acumulado + cubetas[len(limites)]
+            lineas.append(f"{nombre}_bucket{_formatear_etiquetas(etiquetas + (('le', '+Inf'),))} {total}")
+            lineas.append(f"{nombre}_sum{_formatear_etiquetas(etiquetas)} {_formatear_numero(cubetas[-1])}")
+            lineas.append(f"{nombre}_count{_formatear_etiquetas(etiquetas)} {total}")
+        for nombre, funcion in sorted(self._indicadores.items()):
+            try:
+                valor = funcion()
+            except Exception:
+                continue  # Un indicador que falla no debe impedir exportar el resto
+            cabecera(nombre, "gauge")
+            lineas.append(f"{nombre} {_formatear_numero(valor)}")
+        return "\n".join(lineas) + "\n"
+
+
+# Registro del proceso, compartido por todos los módulos
+registro = Metricas()
+describir = registro.describir
+incrementar = registro.incrementar
+observar = registro.observar
+medir = registro.medir
+registrar_indicador = registro.registrar_indicador
+exportar_prometheus = registro.exportar_prometheus
+
+describir("votacion_votos_aceptados_total", "counter", "Votos aceptados en votaciones activas.")
+describir("votacion_votos_rechazados_total", "counter", "Votos rechazados, por motivo.")
+describir("votacion_voto_segundos", "histogram", "Duración de emitir_voto_sesion (incluida la espera del diario), por resultado.")
+describir("votacion_lote_segundos", "histogram", "Duración de emitir_votos_lote (incluida la espera del diario).")
+describir("votacion_sellados_total", "counter", "Bloques sellados antes de finalizar la votación, por motivo (tamano, tiempo, recuperacion).")
+describir("votacion_bloque_agregado_segundos", "histogram", "Duración de crear, calcular el hash y validar un bloque nuevo.")
+describir("votacion_hash_bloque_segundos", "histogram", "Duración del cálculo del hash de un bloque, por versión.")
+describir("votacion_guardar_segundos", "histogram", "Duración de guardar_datos.")
+describir("votacion_cargar_segundos", "histogram", "Duración de cargar_datos.")
+describir("votacion_verificacion_segundos", "histogram", "Duración de la verificación de integridad, por modo.")
+describir("votacion_verificaciones_total", "counter", "Verificaciones de integridad, por modo y resultado.")
+describir("votacion_bloques_guardados_total", "counter", "Bloques anexados al almacenamiento.")
+describir("votacion_replicacion_bloques_total", "counter", "Bloques recibidos de otro nodo, validados y añadidos a la cadena.")
+describir("votacion_replicacion_segundos", "histogram", "Duración de cada ronda de sincronización con el primario que añade bloques.")
+describir("http_cache_total", "counter", "Consultas cacheables por ruta y resultado (acierto, fallo o no_modificado con 304).")
+describir("http_peticion_segundos", "histogram", "Duración de las peticiones HTTP, por ruta, método y estado.")
@@ -0,0 +1,131 @@
+import collections
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def diferencia(anterior, nuevo):
+    """
+    Cambios de 'nuevo' respecto a 'anterior' (diccionarios): las claves nuevas o modificadas,
+    con los diccionarios anidados comparados a su vez un nivel; las claves eliminadas valen None.
+    """
+    cambios = {}
+    for clave, valor in nuevo.items():
+        previo = anterior.get(clave)
+        if valor == previo:
+            continue
+        if isinstance(valor, dict) and isinstance(previo, dict):
+            cambios[clave] = {subclave: subvalor for subclave, subvalor in valor.items() if previo.get(subclave) != subvalor}
+            cambios[clave].update((subclave, None) for subclave in previo if subclave not in valor)
+        else:
+            cambios[clave] = valor
+    cambios.update((clave, None) for clave in anterior if clave not in nuevo)
+    return cambios
+
+
+def formatear_evento(tipo, datos):
+    """Codifica un evento en el formato de Server-Sent Events."""
+    return f"event: {tipo}\ndata: {json.dumps(datos, ensure_ascii=False)}\n\n"
+
+
+class PublicadorEventos:
+    """
+    Publicador en proceso de los cambios de estado de las votaciones para los clientes SSE.
+
+    El sistema de votación solo avisa de qué tema ha cambiado (notificar, O(1) y sin bloquear).
+    Un único hilo agrupa los avisos y, como mucho una vez cada 'intervalo' segundos, recalcula
+    una sola vez cada vista (canal, tema) con suscriptores. Todos los suscriptores de una vista
+    reciben el mismo resultado: el estado completo al conectarse y después solo los cambios.
+    """
+
+    def __init__(self, intervalo=0.5, intervalo_latido=15):
+        self.intervalo = intervalo
+        self.intervalo_latido = intervalo_latido  # Segundos sin cambios tras los que se envía un comentario
+        self._canales = {}  # {canal: función(tema) que devuelve el estado de la vista (None: no existe)}
+        self._condicion = threading.Condition()
+        self._vistas = {}  # {(canal, tema): (versión, estado, cambios respecto a la versión anterior)}
+        self._suscriptores = collections.Counter()  # {(canal, tema): número de suscriptores}
+        self._sucios = set()  # Temas con cambios aún no publicados (None: cualquiera)
+        self._hay_cambios = threading.Event()
+        self._hilo = None
+
+    def registrar_canal(self, canal, calcular):
+        self._canales[canal] = calcular
+
+    def notificar(self, tema=None):
+        """Indica que el estado de un tema ha cambiado (None si afecta a todos)."""
+        with self._condicion:
+            self._sucios.add(tema)
+        self._hay_cambios.set()
+
+    def _calcular(self, canal, tema):
+        try:
+            return self._canales[canal](tema)
+        except Exception as e:
+            logger.error("Error al calcular la vista '%s' del tema %r: %s", canal, tema, e)
+            return None
+
+    def _publicar_periodicamente(self):
+        ultima_publicacion = 0
+        while True:
+            self._hay_cambios.wait()
+            # Límite de frecuencia: los avisos que lleguen mientras tanto se agrupan en una publicación
+            espera = ultima_publicacion + self.intervalo - time.monotonic()
+            if espera > 0:
+                time.sleep(espera)
+            self._hay_cambios.clear()
+            with self._condicion:
+                sucios, self._sucios = self._sucios, set()
+                vistas = [vista for vista in self._suscriptores
+                          if vista[1] is None or vista[1] in sucios or None in sucios]
+            # Cada vista se calcula una sola vez para todos sus suscriptores, fuera del bloqueo
+            nuevos = {vista: self._calcular(*vista) for vista in vistas}
+            with self._condicion:
+                for vista, estado in nuevos.items():
+                    version, anterior, _ = self._vistas.get(vista, (0, None, None))
+                    if estado == anterior:
+                        continue
+                    cambios = diferencia(anterior, estado) if isinstance(anterior, dict) and isinstance(estado, dict) else None
+                    self._vistas[vista] = (version + 1, estado, cambios)
+                self._condicion.notify_all()
+            ultima_publicacion = time.monotonic()
+
+    def suscribir(self, canal, tema=None):
+        """
+        Generador de eventos SSE de una vista: 'estado' con el estado completo al conectarse
+        (o si el suscriptor se ha saltado versiones) y 'cambios' con lo que cambió después.
+        """
+        vista = (canal, tema)
+        with self._condicion:
+            self._suscriptores[vista] += 1
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._publicar_periodicamente, name="publicador-eventos", daemon=True)
+                self._hilo.start()
+            conocida = vista in self._vistas
+        if not conocida:
+            estado = self._calcular(canal, tema)
+            with self._condicion:
+                if vista not in self._vistas:
+                    self._vistas[vista] = (1, estado, None)
+        try:
+            version_enviada = 0
+            while True:
+                with self._condicion:
+                    self._condicion.wait_for(lambda: self._vistas[vista][0] > version_enviada, timeout=self.intervalo_latido)
+                    version, estado, cambios = self._vistas[vista]
+                if version == version_enviada:
+                    yield ": latido\n\n"  # Mantiene la conexión abierta a través de proxies
+                elif version == version_enviada + 1 and cambios is not None:
+                    yield formatear_evento("cambios", cambios)
+                else:
+                    yield formatear_evento("estado", estado)
+                version_enviada = version
+        finally:
+            with self._condicion:
+                self._suscriptores[vista] -= 1
+                if not self._suscriptores[vista]:
+                    del self._suscriptores[vista]
+                    self._vistas.pop(vista, None)
@@ -0,0 +1,117 @@
+import logging
+import os
+import AlmacenLog
+
+logger = logging.getLogger(__name__)
+
+
+def normalizar_nombre(nombre):
+    """Clave de búsqueda de un nombre: sin distinguir mayúsculas ni espacios repetidos o en los extremos."""
+    return " ".join(str(nombre).split()).casefold()
+
+
+class RegistroCandidatos:
+    """
+    Registro global de candidatos {id: nombre} con un índice inverso por nombre normalizado.
+
+    Se persiste en su propio log de solo-anexado (mismo formato de registros que AlmacenLog),
+    separado de la cadena: dar de alta un candidato es una búsqueda O(1) en el índice y una
+    escritura de un único registro, sin tocar los bloques.
+    """
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.candidatos = {}  # {id_candidato: nombre}
+        self.ultimo_id = -1
+        self._por_nombre = {}  # {nombre normalizado: id_candidato}
+        self.version = 0  # Cambia con cada alta o recarga (p.ej. para invalidar respuestas en caché)
+
+    def existe(self):
+        return os.path.exists(self.ruta)
+
+    def vaciar(self):
+        """Vacía el registro en memoria (el archivo no se modifica)."""
+        self.candidatos.clear()
+        self.ultimo_id = -1
+        self._por_nombre = {}
+        self.version += 1
+
+    def cargar(self):
+        """
+        Reproduce el log del registro. Si el final está truncado o corrupto (corte durante una
+        escritura) se recorta el archivo para que los nuevos registros queden legibles.
+        """
+        self.vaciar()
+        if not self.existe():
+            return
+        registros, bytes_validos, tamano = AlmacenLog.leer_registros(self.ruta)
+        for registro in registros:
+            tipo = registro.get("tipo")
+            if tipo == "candidato":
+                self.incorporar({registro["id"]: registro["nombre"]}, registro["ultimo_id"])
+            elif tipo == "candidatos":
+                self.incorporar(registro["candidatos_globales"], registro["ultimo_id_candidato_global"])
+        if bytes_validos != tamano:
+            logger.warning("Se descartaron %s bytes incompletos o corruptos al final de %s.", tamano - bytes_validos, self.ruta)
+            with open(self.ruta, "r+b") as archivo:
+                archivo.truncate(bytes_validos)
+                archivo.flush()
+                os.fsync(archivo.fileno())
+
+    def buscar(self, nombre):
+        """ID del candidato con ese nombre (sin distinguir mayúsculas ni espacios), o None."""
+        return self._por_nombre.get(normalizar_nombre(nombre))
+
+    def incorporar(self, candidatos, ultimo_id=-1):
+        """
+        Añade en memoria candidatos ya existentes (del log, de formatos antiguos o de un diario)
+        y devuelve la lista de IDs que no estaban. Si dos nombres coinciden una vez normalizados,
+        la búsqueda devuelve el primero.
+        """
+        nuevos = []
+        for id_candidato, nombre in candidatos.items():
+            if id_candidato in self.candidatos:
+                continue
+            self.candidatos[id_candidato] = nombre
+            self._por_nombre.setdefault(normalizar_nombre(nombre), id_candidato)
+            self.ultimo_id = max(self.ultimo_id, int(id_candidato))
+            nuevos.append(id_candidato)
+        self.ultimo_id = max(self.ultimo_id, ultimo_id)
+        if nuevos:
+            self.version += 1
+        return nuevos
+
+    def nuevo(self, nombre):
+        """Da de alta un candidato en memoria con el siguiente ID libre y lo devuelve (hay que persistirlo con anexar)."""
+        self.ultimo_id += 1
+        id_candidato = str(self.ultimo_id)
+        self.candidatos[id_candidato] = nombre
+        self._por_nombre.setdefault(normalizar_nombre(nombre), id_candidato)
+        self.version += 1
+        return id_candidato
+
+    def anexar(self, ids_candidatos):
+        """Persiste los candidatos indicados con una única escritura al final del log."""
+        if not ids_candidatos:
+            return
+        datos = b"".join(AlmacenLog.codificar_registro({
+            "tipo": "candidato", "id": id_candidato, "nombre": self.candidatos[id_candidato], "ultimo_id": self.ultimo_id
+        }) for id_candidato in ids_candidatos)
+        with open(self.ruta, "ab") as archivo:
+            archivo.write(datos)
+            archivo.flush()
+            os.fsync(archivo.fileno())
+
+    def compactar(self):
+        """Reescribe el log con un único registro del estado actual, de forma atómica."""
+        ruta_tmp = self.ruta + ".tmp"
+        with open(ruta_tmp, "wb") as archivo:
+            archivo.write(AlmacenLog.codificar_registro({
+                "tipo": "candidatos",
+                "candidatos_globales": self.candidatos,
+                "ultimo_id_candidato_global": self.ultimo_id
+            }))
+            archivo.flush()
+            os.fsync(archivo.fileno())
+        os.replace(ruta_tmp, self.ruta)
+        AlmacenLog.sincronizar_directorio(self.ruta)
@@ -0,0 +1,145 @@
+import json
+import logging
+import threading
+import time
+import urllib.parse
+import urllib.request
+import Bloque
+import Metricas
+
+logger = logging.getLogger(__name__)
+
+
+class Replicador:
+    """
+    Mantiene la cadena de este nodo como réplica de solo lectura de la de un nodo primario.
+
+    En cada ronda se intercambia con el primario la punta de la cadena (index y hash_actual).
+    Si la punta local forma parte de la cadena del primario, solo se descargan los bloques
+    que faltan (por páginas de /cadena en NDJSON); cada uno se valida con las reglas de
+    Cadena.validar_bloque antes de añadirlo y guardarlo. Los candidatos globales nuevos se
+    copian también, para que la réplica muestre sus nombres en los resultados.
+
+    Si las cadenas han divergido la réplica deja de sincronizar: hay que volver a crearla
+    desde un directorio vacío.
+    """
+
+    BLOQUES_POR_PETICION = 500
+    BLOQUES_POR_TANDA = 50  # Bloques validados y guardados de una vez
+    TIEMPO_ESPERA = 30  # Segundos de espera de cada petición al primario
+
+    def __init__(self, sistema, url_primario, intervalo=1.0):
+        self.sistema = sistema
+        self.url_primario = url_primario.rstrip("/")
+        self.intervalo = intervalo
+        self.estado_primario = None  # Última respuesta de /replicacion/estado del primario
+        self.divergente = False
+        self.ultima_sincronizacion = None  # Última ronda que añadió bloques (bloques, segundos, bloques/s)
+        self.ultimo_error = None
+        self._hilo = None
+
+    def _pedir(self, ruta, **parametros):
+        url = self.url_primario + ruta
+        if parametros:
+            url += "?" + urllib.parse.urlencode(parametros)
+        return urllib.request.urlopen(url, timeout=self.TIEMPO_ESPERA)
+
+    def _pedir_json(self, ruta, **parametros):
+        with self._pedir(ruta, **parametros) as respuesta:
+            return json.load(respuesta)
+
+    def sincronizar(self):
+        """
+        Ejecuta una ronda de sincronización y devuelve el número de bloques añadidos.
+        Lanza OSError o ValueError si el primario no responde o su respuesta no es válida.
+        """
+        punta = self.sistema.cadena.peek()
+        estado = self._pedir_json("/replicacion/estado", index=punta.index, hash_actual=punta.hash_actual)
+        self.estado_primario = estado
+        if estado["ultimo_id_candidato"] > self.sistema.ultimo_id_candidato_global:
+            self.sistema.incorporar_candidatos(self._pedir_json("/candidatos"), estado["ultimo_id_candidato"])
+
+        if estado["punta_comun"]:
+            desde = punta.index + 1
+        elif punta.index == 0:
+            desde = 0  # Sin bloques propios: se adopta también el génesis del primario
+        else:
+            self.divergente = True
+            logger.error("La cadena local (bloque %s, %s) no forma parte de la del primario %s. "
+                         "Se detiene la replicación; vuelva a crear la réplica desde un directorio vacío.",
+                         punta.index, punta.hash_actual, self.url_primario)
+            return 0
+
+        inicio = time.perf_counter()
+        anadidos = 0
+        while desde <= estado["index"] and not self.divergente:
+            recibidos = 0
+            with self._pedir("/cadena", desde=desde, limite=self.BLOQUES_POR_PETICION, formato="ndjson") as respuesta:
+                # Los bloques se validan por tandas mientras el primario sigue enviando el resto de la página
+                tanda = []
+                for linea in respuesta:
+                    if linea.strip():
+                        tanda.append(Bloque.Bloque.desde_diccionario(json.loads(linea)))
+                    if len(tanda) == self.BLOQUES_POR_TANDA:
+                        recibidos += self._incorporar(tanda)
+                        tanda = []
+                        if self.divergente:
+                            break
+                if tanda and not self.divergente:
+                    recibidos += self._incorporar(tanda)
+            if not recibidos:
+                break
+            anadidos += recibidos
+            desde += recibidos
+
+        if anadidos:
+            segundos = time.perf_counter() - inicio
+            Metricas.observar("votacion_replicacion_segundos", segundos)
+            self.ultima_sincronizacion = {
+                "timestamp": time.time(),
+                "bloques": anadidos,
+                "segundos": segundos,
+                "bloques_por_segundo": anadidos / segundos if segundos else None,
+            }
+            logger.info("Replicados %s bloques del primario en %.3f s (%.0f bloques/s).",
+                        anadidos, segundos, anadidos / segundos if segundos else 0)
+        return anadidos
+
+    def _incorporar(self, bloques):
+        """Añade una tanda de bloques recibidos; si alguno no es válido se detiene la replicación."""
+        aceptados = self.sistema.incorporar_bloques(bloques)
+        if aceptados < len(bloques):
+            self.divergente = True
+            logger.error("El primario %s envió el bloque %s, que no es válido. Se detiene la replicación.",
+                         self.url_primario, bloques[aceptados].index)
+        return aceptados
+
+    def iniciar(self):
+        """Arranca el hilo que sincroniza con el primario cada 'intervalo' segundos."""
+        if self._hilo is None:
+            self._hilo = threading.Thread(target=self._sincronizar_periodicamente, name="replicacion", daemon=True)
+            self._hilo.start()
+
+    def _sincronizar_periodicamente(self):
+        while not self.divergente:
+            try:
+                self.sincronizar()
+                self.ultimo_error = None
+            except (OSError, ValueError, KeyError) as e:
+                if str(e) != self.ultimo_error:  # No repetir el mismo aviso en cada ronda
+                    logger.warning("No se pudo sincronizar con el primario %s: %s", self.url_primario, e)
+                self.ultimo_error = str(e)
+            time.sleep(self.intervalo)
+
+    def estado(self):
+        """Estado de la réplica: primario, retraso en bloques y última sincronización."""
+        index_local = self.sistema.cadena.peek().index
+        index_primario = self.estado_primario["index"] if self.estado_primario else None
+        return {
+            "primario": self.url_primario,
+            "index_primario": index_primario,
+            "retraso_bloques": max(0, index_primario - index_local) if index_primario is not None else None,
+            "divergente": self.divergente,
+            "ultima_sincronizacion": self.ultima_sincronizacion,
+            "ultimo_error": self.ultimo_error,
+        }
@@ -0,0 +1,89 @@
+import collections
+import hashlib
+import threading
+import time
+
+class SesionVotacion:
+    """
+    Estado de una votación abierta para un tema: candidatos, votos pendientes de sellar,
+    votantes y recuento pendiente, con su propio bloqueo y su propio diario. Las votaciones
+    de temas distintos no comparten estado, por lo que pueden recibir votos en paralelo.
+    """
+
+    def __init__(self, tema, diario, timestamp_inicio=None, id_sesion=None):
+        self.tema = tema
+        self.diario = diario
+        self.id_sesion = id_sesion  # ID en la base de datos compartida (ver SistemaVotacionSQLite); None con diarios
+        self.timestamp_inicio = timestamp_inicio if timestamp_inicio is not None else time.time()
+        self.candidatos = {}  # {id_candidato: nombre}
+        self.votos = []  # Votos aceptados pendientes de sellar en un bloque
+        self.votantes = set()  # Hashes de los votantes que ya votaron en esta sesión
+        self.recuento = {}  # {id_candidato: votos} pendientes
+        self.votos_sellados = 0  # Votos de esta sesión ya sellados en bloques antes de finalizar
+        self.ultimo_sellado = self.timestamp_inicio  # Momento del último sellado (o del inicio)
+        self.lock = threading.RLock()
+
+    @staticmethod
+    def nombre_diario(tema):
+        """Nombre de archivo del diario de un tema (el tema puede contener cualquier carácter)."""
+        return hashlib.sha256(tema.encode("utf-8")).hexdigest()[:32] + ".diario"
+
+    def registrar_voto(self, voto):
+        self.votos.append(voto)
+        self.votantes.add(voto["id_votante_hash"])
+        self.recuento[voto["id_candidato"]] = self.recuento.get(voto["id_candidato"], 0) + 1
+
+    def registrar_votos(self, votos):
+        """Registra de una vez los votos aceptados de un lote."""
+        self.votos.extend(votos)
+        self.votantes.update(voto["id_votante_hash"] for voto in votos)
+        for id_candidato, numero in collections.Counter(voto["id_candidato"] for voto in votos).items():
+            self.recuento[id_candidato] = self.recuento.get(id_candidato, 0) + numero
+
+    def descartar_voto(self, voto):
+        """Retira un voto pendiente concreto. Devuelve False si ya no estaba pendiente."""
+        for posicion in range(len(self.votos) - 1, -1, -1):
+            if self.votos[posicion] is voto:
+                del self.votos[posicion]
+                self.votantes.discard(voto["id_votante_hash"])
+                self.recuento[voto["id_candidato"]] -= 1
+                return True
+        return False
+
+    def descartar_votos(self, votos):
+        """
+        Retira los votos de un lote que siguen pendientes y los devuelve. Los que ya se sellaron
+        (retirar_sellados los quitó de la sesión y de su recuento) no se vuelven a descontar.
+        """
+        identificadores = {id(voto) for voto in votos}
+        descartados = [voto for voto in self.votos if id(voto) in identificadores]
+        if not descartados:
+            return []
+        self.votos = [voto for voto in self.votos if id(voto) not in identificadores]
+        for voto in descartados:
+            self.votantes.discard(voto["id_votante_hash"])
+            self.recuento[voto["id_candidato"]] -= 1
+        return descartados
+
+    def retirar_sellados(self, numero):
+        """
+        Retira los 'numero' primeros votos pendientes, ya sellados en un bloque de la cadena.
+        Sus votantes pasan a comprobarse contra el índice de la cadena, por lo que la memoria
+        de la sesión solo crece con los votos aún sin sellar.
+        """
+        sellados = self.votos[:numero]
+        self.votos = self.votos[numero:]
+        for voto in sellados:
+            self.votantes.discard(voto["id_votante_hash"])
+            self.recuento[voto["id_candidato"]] -= 1
+        self.votos_sellados += len(sellados)
+        self.ultimo_sellado = time.time()
+
+    def estado(self):
+        return {
+            "tema_activo": self.tema,
+            "candidatos": dict(self.candidatos),
+            "numero_votos_recibidos": len(self.votos) + self.votos_sellados,
+            "numero_votantes_participantes": len(self.votantes) + self.votos_sellados,
+            "numero_votos_sellados": self.votos_sellados
+        }
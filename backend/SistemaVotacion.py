@@ -1,409 +1,1194 @@
 import Cadena
 import Bloque
+import AlmacenLog
+import AlmacenBinario
+import DiarioVotos
+import FragmentosBloques
+import Instantanea
+import RegistroCandidatos
+import SesionVotacion
+import VotosColumnares
+import Metricas
 import time
 import hashlib
 import json
 import os
+import atexit
+import collections
+import functools
+import itertools
+import threading
+import logging
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+def _sincronizado(metodo):
+    """Ejecuta el método con el bloqueo del sistema, serializando el acceso al estado compartido."""
+    @functools.wraps(metodo)
+    def envoltura(self, *args, **kwargs):
+        with self._lock:
+            return metodo(self, *args, **kwargs)
+    return envoltura
+
+
+def _primer_hash_invalido(bloques):
+    """
+    Recalcula el hash de un lote de bloques consecutivos y devuelve la posición (dentro del lote)
+    del primero cuyo hash almacenado no coincide, o None. Se ejecuta en los procesos de la auditoría paralela.
+    """
+    for posicion, bloque in enumerate(bloques):
+        if bloque.hash_actual != bloque.calcular_hash():
+            return posicion
+    return None
+
 
 class SistemaVotacion:
-    ARCHIVO_DATOS = "blockchain_votacion.json"  # Nombre del archivo de datos
-
-    def __init__(self):
-        # Estado de la votación activa
-        self.tema_activo = None
-        self.candidatos_votacion_activa = {}  # {id_candidato: nombre} para la votación actual
-        self.votos_sesion_actual = []  # Votos acumulados para el tema activo
-        self.votantes_sesion_actual = set()  # Hashes de IDs de votantes que ya votaron en esta sesión
+    ARCHIVO_DATOS = "blockchain_votacion.json"  # Formato JSON antiguo (solo para migración)
+    ARCHIVO_LOG = "blockchain_votacion.log"  # Log de solo-anexado de versiones anteriores (solo para migración)
+    ARCHIVO_CADENA = "blockchain_votacion"  # Cadena binaria: blockchain_votacion.dat + blockchain_votacion.idx
+    ARCHIVO_CANDIDATOS = "candidatos_votacion.log"  # Registro global de candidatos, separado de los bloques
+    ARCHIVO_INSTANTANEA = "blockchain_votacion.instantanea"  # Estado derivado de la cadena para arrancar sin recorrerla
+    ARCHIVO_DIARIO = "blockchain_votacion.diario"  # Diario único de versiones anteriores (solo para migración)
+    DIRECTORIO_DIARIOS = "diarios_votacion"  # Un diario (WAL) por cada votación activa
+    # Política de durabilidad del diario (ver DiarioVotos): por defecto, fsync antes de confirmar cada voto
+    DIARIO_VOTOS_POR_SINCRONIZACION = 1
+    DIARIO_INTERVALO_SINCRONIZACION = 0  # Segundos; 0 desactiva la sincronización periódica
+    # Sellado automático de bloques durante la votación (0 lo desactiva): cada N votos y/o cada T segundos
+    SELLADO_VOTOS_POR_BLOQUE = 0
+    SELLADO_INTERVALO = 0  # Segundos
+    # Bloques nuevos tras los que se vuelve a tomar la instantánea: al arrancar se indexan como mucho éstos
+    INSTANTANEA_CADA_BLOQUES = 100
+    # Memoria máxima del JSON ya codificado de los bloques confirmados que se reutiliza en /cadena
+    MAXIMO_BYTES_FRAGMENTOS = 128 * 1024 * 1024
+
+    def __init__(self, votos_por_sincronizacion=None, intervalo_sincronizacion=None, votos_por_bloque=None, intervalo_sellado=None):
+        # Bloqueo del estado global (registro de sesiones, candidatos, cadena e índices).
+        # Cada sesión tiene además su propio bloqueo; orden de adquisición: sesión -> global.
+        self._lock = threading.RLock()
+        self.votos_por_sincronizacion = votos_por_sincronizacion if votos_por_sincronizacion is not None else self.DIARIO_VOTOS_POR_SINCRONIZACION
+        self.intervalo_sincronizacion = intervalo_sincronizacion if intervalo_sincronizacion is not None else self.DIARIO_INTERVALO_SINCRONIZACION
+        self.votos_por_bloque = votos_por_bloque if votos_por_bloque is not None else self.SELLADO_VOTOS_POR_BLOQUE
+        self.intervalo_sellado = intervalo_sellado if intervalo_sellado is not None else self.SELLADO_INTERVALO
+        atexit.register(self._sincronizar_diarios)
+        # Votaciones activas
+        self.sesiones = {}  # {tema: SesionVotacion}, en orden de inicio
+        self.votantes_por_tema = {}  # {tema: set(hashes)} de votantes ya registrados en la cadena (se construye por tema al necesitarlo)
+        self.recuento_por_tema = {}  # {tema: {id_candidato: votos}} confirmados en la cadena
+        self.recuento_global = {}  # {id_candidato: votos} confirmados en la cadena (todos los temas)
+        self.comprobantes = None  # {id_votante_hash: [(índice de bloque, posición del voto)]}, construido en la primera consulta
         self.ultimo_timestamp_archivo = 0 # Timestamp de la última carga/guardado conocido
+        self.indice_verificado = None  # Último índice de bloque cuya integridad ya se comprobó
+        self.hash_verificado = None  # hash_actual de ese bloque en el momento de verificarlo
+        self.primer_bloque_invalido = None  # Índice del primer bloque inválido en la última verificación
+        # Pool de procesos de la auditoría paralela: se crea en la primera que lo necesita y se reutiliza
+        self._pool_verificacion = None
+        self._workers_pool_verificacion = 0
+        self._lock_pool_verificacion = threading.Lock()
+        atexit.register(self._cerrar_pool_verificacion)
+        self.almacen = AlmacenBinario.AlmacenBinario(self.ARCHIVO_CADENA)
+        self.almacen_log = AlmacenLog.AlmacenLog(self.ARCHIVO_LOG)
+        self.registro_candidatos = RegistroCandidatos.RegistroCandidatos(self.ARCHIVO_CANDIDATOS)
+        self.instantanea = Instantanea.Instantanea(self.ARCHIVO_INSTANTANEA)
+        self._index_instantanea = 0  # Índice del bloque en que se tomó la última instantánea
+        self.fragmentos = FragmentosBloques.FragmentosBloques(self.MAXIMO_BYTES_FRAGMENTOS)
+        self._bloques_guardados = 0  # Número de bloques de la cadena ya persistidos en el log
+        self._carga_fallida = False  # La cadena guardada no se pudo cargar: no se escribe sobre ella
+        self._candidatos_sin_guardar = []  # IDs de candidatos globales pendientes de persistir
+        self.observadores = []  # Funciones observador(tema) a las que se avisa cuando cambian los votos o las sesiones
+        # Versión de las votaciones activas (votos pendientes, candidatos, inicio y fin): cambia en cada
+        # aviso a los observadores. Junto con id_instancia, distinto en cada arranque, identifica su estado
+        self._versiones = itertools.count(1)
+        self.version_pendientes = 0
+        self.id_instancia = uuid.uuid4().hex
+
+        self._cargar_estado()
+
+        if self.intervalo_sellado > 0:
+            hilo = threading.Thread(target=self._sellar_periodicamente, name="sellado-votaciones", daemon=True)
+            hilo.start()
 
-        if os.path.exists(self.ARCHIVO_DATOS):
+    def _cargar_estado(self):
+        """Carga la cadena guardada (o crea una nueva) y recupera las votaciones activas de sus diarios."""
+        if self.almacen.existe() or self.almacen_log.existe() or os.path.exists(self.ARCHIVO_DATOS):
             if not self.cargar_datos():
-                 # Si la carga inicial falla, inicializar vacío pero mantener timestamp 0
+                 # Si la carga inicial falla, inicializar vacío pero mantener timestamp 0. Los archivos
+                 # no se tocan: anexar o reescribir sobre ellos perdería la cadena que no se pudo leer
                  self._inicializar_vacio()
+                 self._carga_fallida = True
         else:
             self._inicializar_vacio()
             self.guardar_datos() # Guardar estado inicial y actualizar timestamp
 
+        # Recuperar las votaciones que estuvieran activas antes de un reinicio o caída
+        self._reproducir_diarios()
+
+    @property
+    def candidatos_globales(self):
+        """{id_candidato: nombre} de todos los candidatos registrados (ver RegistroCandidatos)."""
+        return self.registro_candidatos.candidatos
+
+    @property
+    def ultimo_id_candidato_global(self):
+        return self.registro_candidatos.ultimo_id
+
+    def _notificar_cambio(self, tema):
+        """Avisa a los observadores (p.ej. el publicador de eventos SSE) de un cambio en un tema."""
+        self.version_pendientes = next(self._versiones)
+        for observador in self.observadores:
+            observador(tema)
+
     def _inicializar_vacio(self):
         """Método auxiliar para inicializar un estado vacío."""
-        print("Inicializando sistema con estado vacío.")
+        logger.info("Inicializando sistema con estado vacío.")
         self.cadena = Cadena.Cadena()
-        self.candidatos_globales = {}
-        self.ultimo_id_candidato_global = -1
-        self.tema_activo = None
-        self.candidatos_votacion_activa = {}
-        self.votos_sesion_actual = []
-        self.votantes_sesion_actual = set()
+        self.registro_candidatos.cargar()  # El registro de candidatos puede existir aunque no haya cadena
+        self.sesiones = {}
+        self.votantes_por_tema = {}
+        self.recuento_por_tema = {}
+        self.recuento_global = {}
+        self.comprobantes = None
+        self._invalidar_punto_control()
+        self.fragmentos.vaciar()
+        self._bloques_guardados = 0
+        self._candidatos_sin_guardar = []
+        self._index_instantanea = 0
         # No actualizamos timestamp aquí, se hará al guardar si es necesario
 
+    @_sincronizado
+    @Metricas.medir("votacion_guardar_segundos")
     def guardar_datos(self):
-        """Guarda la cadena de bloques y los candidatos globales."""
-        datos = {
-            "candidatos_globales": self.candidatos_globales,
-            "bloques": [self._serializar_bloque(bloque) for bloque in self.cadena.cadena],
-            "ultimo_id_candidato_global": self.ultimo_id_candidato_global
-        }
+        """
+        Persiste los bloques y candidatos globales nuevos desde el último guardado.
+        Solo se anexan los registros nuevos al log, por lo que el coste es O(datos nuevos).
+        """
+        if self._carga_fallida:
+            logger.error("No se guardan los datos: la cadena de %s no se pudo cargar y se sobrescribiría.", self.almacen.ruta_datos)
+            return False
         try:
-            with open(self.ARCHIVO_DATOS, 'w') as archivo:
-                json.dump(datos, archivo, indent=2)
+            bloques_nuevos = self.cadena.cadena[self._bloques_guardados:]
+            candidatos_nuevos = len(self._candidatos_sin_guardar)
+            if not self._guardar_candidatos():
+                return False
+            self.almacen.anexar(bloques_nuevos, [])
+            self._bloques_guardados += len(bloques_nuevos)
+            Metricas.incrementar("votacion_bloques_guardados_total", len(bloques_nuevos))
             # Actualizar el timestamp conocido después de guardar con éxito
-            self.ultimo_timestamp_archivo = os.path.getmtime(self.ARCHIVO_DATOS)
-            print(f"Datos guardados. Timestamp actualizado a: {self.ultimo_timestamp_archivo}")
+            self.ultimo_timestamp_archivo = self.marca_archivo()
+            logger.info("Datos guardados (%s bloques, %s candidatos nuevos). Timestamp actualizado a: %s", len(bloques_nuevos), candidatos_nuevos, self.ultimo_timestamp_archivo)
+            self._guardar_instantanea_si_procede()
             return True
         except Exception as e:
-            print(f"Error al guardar datos: {str(e)}")
+            logger.error("Error al guardar datos: %s", e)
+            return False
+
+    def _guardar_candidatos(self):
+        """Persiste en el registro de candidatos los dados de alta desde el último guardado."""
+        try:
+            self.registro_candidatos.anexar(self._candidatos_sin_guardar)
+            self._candidatos_sin_guardar = []
+            return True
+        except OSError as e:
+            logger.error("Error al guardar candidatos en %s: %s", self.registro_candidatos.ruta, e)
             return False
 
+    def _leer_datos(self):
+        """
+        Lee los datos persistidos. Si solo existe el log o el JSON de versiones anteriores se
+        lee éste y se indica que hay que migrarlo a la cadena binaria.
+        """
+        if self.almacen.existe():
+            return self.almacen.cargar()
+        if self.almacen_log.existe():
+            logger.info("No se encontró %s. Migrando datos desde %s.", self.almacen.ruta_datos, self.almacen_log.ruta)
+            datos = self.almacen_log.cargar()
+            datos["requiere_compactar"] = True
+            return datos
+        logger.info("No se encontró %s. Migrando datos desde %s.", self.almacen.ruta_datos, self.ARCHIVO_DATOS)
+        with open(self.ARCHIVO_DATOS, 'r') as archivo:
+            datos = json.load(archivo)
+        datos["requiere_compactar"] = True
+        return datos
+
+    @Metricas.medir("votacion_cargar_segundos")
     def cargar_datos(self):
         """Carga la cadena, candidatos globales."""
         try:
-            # Obtener timestamp ANTES de abrir, por si acaso
-            timestamp_antes_carga = os.path.getmtime(self.ARCHIVO_DATOS)
-            with open(self.ARCHIVO_DATOS, 'r') as archivo:
-                datos = json.load(archivo)
+            datos = self._leer_datos()
 
-            self.candidatos_globales = datos.get("candidatos_globales", {})
-            self.ultimo_id_candidato_global = datos.get("ultimo_id_candidato_global", -1)
+            self.registro_candidatos.cargar()
+            self._candidatos_sin_guardar = []
+            # Candidatos guardados junto a los bloques por versiones anteriores: se pasan al registro
+            migrados = self.registro_candidatos.incorporar(datos.get("candidatos_globales", {}),
+                                                           datos.get("ultimo_id_candidato_global", -1))
+            if migrados:
+                self.registro_candidatos.compactar()
+                logger.info("%s candidatos migrados a %s.", len(migrados), self.registro_candidatos.ruta)
 
             self.cadena = Cadena.Cadena()
             self.cadena.cadena = []
+            self.fragmentos.vaciar()  # Los fragmentos eran de la cadena anterior
 
             bloques_data = datos.get("bloques", [])
             if not bloques_data:
-                print("No se encontraron bloques en el archivo, creando bloque génesis.")
+                logger.info("No se encontraron bloques en el archivo, creando bloque génesis.")
                 self.cadena.cadena.append(Bloque.Bloque.crear_bloque_genesis())
             else:
-                for bloque_dict in bloques_data:
-                    bloque = self._deserializar_bloque(bloque_dict)
+                for bloque in bloques_data:
+                    # La cadena binaria devuelve bloques (con los votos sin cargar); los formatos antiguos, diccionarios
+                    if not isinstance(bloque, Bloque.Bloque):
+                        bloque = self._deserializar_bloque(bloque)
                     self.cadena.cadena.append(bloque)
 
             if not self.cadena.cadena:
-                print("Advertencia: La cadena está vacía después de cargar datos. Recreando bloque génesis.")
+                logger.warning("La cadena está vacía después de cargar datos. Recreando bloque génesis.")
                 self.cadena.cadena.append(Bloque.Bloque.crear_bloque_genesis())
 
+            self._restaurar_indices()
+
+            if datos.get("requiere_compactar") or len(bloques_data) != len(self.cadena.cadena):
+                # Migración desde el log o el JSON, cola corrupta descartada o génesis recreado: reescribir la cadena
+                self.almacen.compactar(self.cadena.cadena, {}, -1)  # Los candidatos están en su propio registro
+                logger.info("Cadena %s compactada con %s bloques.", self.almacen.ruta_datos, len(self.cadena.cadena))
+            self._bloques_guardados = len(self.cadena.cadena)
+            self._carga_fallida = False
+
             # Actualizar el timestamp conocido después de cargar con éxito
-            self.ultimo_timestamp_archivo = timestamp_antes_carga
-            print(f"Datos cargados. Timestamp actualizado a: {self.ultimo_timestamp_archivo}")
+            self.ultimo_timestamp_archivo = self.marca_archivo()
+            logger.info("Datos cargados. Timestamp actualizado a: %s", self.ultimo_timestamp_archivo)
+            # Si se han tenido que indexar muchos bloques, la próxima vez se partirá de aquí
+            self._guardar_instantanea_si_procede()
 
-            # Reiniciar estado de sesión activa al cargar (si se mantiene esa lógica)
-            print("Limpiando estado de votación activa debido a la carga de datos.")
-            self.tema_activo = None
-            self.candidatos_votacion_activa = {}
-            self.votos_sesion_actual = []
-            self.votantes_sesion_actual = set()
+            # Las votaciones activas no están en la cadena: se recuperan después desde sus diarios
+            self.sesiones = {}
 
             return True
-        # ... (resto del bloque except) ...
         except FileNotFoundError:
-             print(f"Error: El archivo {self.ARCHIVO_DATOS} no fue encontrado durante la carga.")
+             logger.error("El archivo %s no fue encontrado durante la carga.", self.almacen.ruta)
              return False # Indicar fallo en la carga
         except json.JSONDecodeError as e:
-             print(f"Error al decodificar JSON en {self.ARCHIVO_DATOS}: {str(e)}")
+             logger.error("Error al decodificar JSON en %s: %s", self.ARCHIVO_DATOS, e)
              return False # Indicar fallo en la carga
         except Exception as e:
-            print(f"Error crítico al cargar datos: {str(e)}.")
+            logger.error("Error crítico al cargar datos: %s.", e)
             # No llamar a _inicializar_vacio aquí para evitar recursión si falla __init__
             return False # Indicar fallo en la carga
 
 
+    def _crear_diario(self, tema):
+        os.makedirs(self.DIRECTORIO_DIARIOS, exist_ok=True)
+        ruta = os.path.join(self.DIRECTORIO_DIARIOS, SesionVotacion.SesionVotacion.nombre_diario(tema))
+        return DiarioVotos.DiarioVotos(ruta, self.votos_por_sincronizacion, self.intervalo_sincronizacion)
+
+    def _sincronizar_diarios(self):
+        for sesion in list(self.sesiones.values()):
+            sesion.diario.sincronizar()
+
+    def _reproducir_diarios(self):
+        """Reconstruye las votaciones activas a partir de sus diarios, en el orden en que se iniciaron."""
+        rutas = []
+        if os.path.isdir(self.DIRECTORIO_DIARIOS):
+            rutas = [os.path.join(self.DIRECTORIO_DIARIOS, nombre)
+                     for nombre in os.listdir(self.DIRECTORIO_DIARIOS) if nombre.endswith(".diario")]
+        if os.path.exists(self.ARCHIVO_DIARIO):
+            rutas.append(self.ARCHIVO_DIARIO)  # Diario único de versiones anteriores
+
+        sesiones = []
+        for ruta in rutas:
+            diario = DiarioVotos.DiarioVotos(ruta, self.votos_por_sincronizacion, self.intervalo_sincronizacion)
+            sesion = self._reproducir_diario(diario)
+            if sesion is None:
+                diario.eliminar()
+                continue
+            if ruta == self.ARCHIVO_DIARIO:
+                # Migrar al directorio de diarios con el nombre correspondiente a su tema
+                sesion.diario = self._crear_diario(sesion.tema)
+                self._reescribir_diario(sesion)
+                diario.eliminar()
+            sesiones.append(sesion)
+
+        for sesion in sorted(sesiones, key=lambda s: s.timestamp_inicio):
+            self.sesiones[sesion.tema] = sesion
+            logger.info("Votación activa '%s' recuperada del diario: %s candidatos y %s votos pendientes.", sesion.tema, len(sesion.candidatos), len(sesion.votos))
+        if self._candidatos_sin_guardar:
+            self.guardar_datos()
+
+    def _reescribir_diario(self, sesion):
+        """Escribe en el diario de la sesión su estado completo (inicio, candidatos y votos)."""
+        sesion.diario.vaciar()
+        sesion.diario.anotar({"tipo": "inicio", "tema": sesion.tema, "timestamp": sesion.timestamp_inicio})
+        if sesion.votos_sellados:
+            sesion.diario.anotar({"tipo": "sellado"})
+        for id_candidato, nombre in sesion.candidatos.items():
+            sesion.diario.anotar({"tipo": "candidato", "id": id_candidato, "nombre": nombre})
+        for voto in sesion.votos:
+            sesion.diario.anotar({"tipo": "voto", "voto": voto})
+        sesion.diario.sincronizar()
+
+    def _reproducir_diario(self, diario):
+        """
+        Reconstruye una sesión (tema, candidatos, votos y votantes) a partir de su diario.
+        Devuelve None si el diario está vacío, es inválido o la sesión ya se había finalizado.
+
+        Los votos ya sellados en la cadena (sellado automático, o un corte justo después de
+        guardar un bloque) se omiten. Si el corte ocurrió al finalizar (registro "fin"), los
+        votos que no llegaron a la cadena se sellan ahora.
+        """
+        registros = diario.reproducir()
+        if not registros:
+            return None
+        inicio = registros[0]
+        if inicio.get("tipo") != "inicio":
+            logger.warning("El diario %s no empieza con el inicio de una sesión. Se descarta.", diario.ruta)
+            return None
+
+        # Diarios sin registros de sellado ni de fin (versiones anteriores): si tras el inicio de la
+        # sesión ya hay un bloque de ese tema, la sesión se finalizó pero el corte ocurrió antes de borrar el diario
+        tipos = {registro.get("tipo") for registro in registros}
+        bloques_tema = self.cadena.bloques_de_tema(inicio["tema"])
+        bloques_sesion = [bloque for bloque in bloques_tema if bloque.timestamp >= inicio["timestamp"]]
+        if bloques_sesion and not tipos & {"sellado", "fin"}:
+            logger.info("La votación '%s' del diario ya está sellada en el bloque %s. Se descarta el diario.", inicio['tema'], bloques_tema[-1].index)
+            return None
+
+        sesion = SesionVotacion.SesionVotacion(inicio["tema"], diario, inicio["timestamp"])
+        votantes_confirmados = self._votantes_confirmados(sesion.tema)
+        for registro in registros[1:]:
+            tipo = registro.get("tipo")
+            if tipo == "candidato":
+                id_candidato = registro["id"]
+                # Un candidato dado de alta justo antes del corte puede no estar en el registro
+                self._candidatos_sin_guardar.extend(self.registro_candidatos.incorporar({id_candidato: registro["nombre"]}))
+                sesion.candidatos[id_candidato] = registro["nombre"]
+            elif tipo in ("voto", "lote"):
+                for voto in (registro["votos"] if tipo == "lote" else [registro["voto"]]):
+                    if voto["id_votante_hash"] in votantes_confirmados or voto["id_votante_hash"] in sesion.votantes:
+                        continue
+                    sesion.registrar_voto(voto)
+        if "sellado" in tipos:
+            sesion.votos_sellados = sum(len(bloque.votos) for bloque in bloques_sesion)
+        if "fin" in tipos:
+            if sesion.votos:
+                self._sellar_votos_pendientes(sesion, motivo="recuperacion")
+            logger.info("La votación '%s' del diario se estaba finalizando; se completa y se descarta el diario.", sesion.tema)
+            return None
+        return sesion
+
+    def _reconstruir_indices(self):
+        """
+        Reconstruye desde cero los índices derivados de la cadena cargada. Los recuentos se
+        calculan sobre las columnas de IDs de candidato; los índices de votantes y comprobantes,
+        que guardan una entrada por voto, se construyen solo cuando se necesitan.
+        """
+        self._invalidar_punto_control()
+        self.votantes_por_tema = {}
+        self.recuento_por_tema = {}
+        self.recuento_global = {}
+        self.comprobantes = None
+        self.cadena.reconstruir_indice_temas()
+        for bloque in self.cadena.cadena[1:]: # Omitir bloque génesis
+            self._indexar_bloque(bloque)
+
+    def _restaurar_indices(self):
+        """
+        Restaura los índices derivados desde la instantánea si su bloque forma parte de la cadena
+        cargada, indexando solo los bloques posteriores; si no, los reconstruye desde cero.
+        El punto de control de la verificación solo se conserva si el archivo de la cadena no
+        ha cambiado desde que se tomó (de lo contrario la próxima verificación lo recorre entero).
+        """
+        estado = self.instantanea.cargar()
+        if estado is None or not self.contiene_bloque(estado["index"], estado["hash_actual"]):
+            if estado is not None:
+                logger.info("La instantánea del bloque %s no corresponde con la cadena cargada. Se reconstruyen los índices.", estado["index"])
+            self._reconstruir_indices()
+            self._index_instantanea = 0
+            return
+
+        self._invalidar_punto_control()
+        self.votantes_por_tema = {}
+        self.comprobantes = None
+        self.cadena.indice_temas = {
+            tema: {"bloques": bloques, "numero_votos": numero_votos, "primer_voto": primer_voto,
+                   "ultimo_voto": ultimo_voto, "candidatos": set(candidatos)}
+            for tema, bloques, numero_votos, primer_voto, ultimo_voto, candidatos in estado["indice_temas"]
+        }
+        self.recuento_por_tema = {tema: dict(recuento) for tema, recuento in estado["recuento_por_tema"]}
+        self.recuento_global = dict(estado["recuento_global"])
+        verificado = estado.get("verificado")
+        if verificado and self._firma_archivo() == verificado["archivo"]:
+            self.indice_verificado = verificado["index"]
+            self.hash_verificado = verificado["hash_actual"]
+        self._index_instantanea = estado["index"]
+
+        posteriores = self.cadena.cadena[estado["index"] + 1:]
+        for bloque in posteriores:
+            self.cadena.indexar_bloque(bloque)
+            self._indexar_bloque(bloque)
+        logger.info("Índices restaurados desde la instantánea del bloque %s (%s bloques posteriores indexados).", estado["index"], len(posteriores))
+
+    def marca_archivo(self):
+        """Marca de la última modificación de la cadena persistida (tamaño y fecha de modificación de su .dat)."""
+        return tuple(self._firma_archivo())
+
+    def _firma_archivo(self):
+        """Tamaño y fecha de modificación (ns) del archivo de la cadena, para detectar si ha cambiado."""
+        estado_archivo = os.stat(self.almacen.ruta_datos)
+        return [estado_archivo.st_size, estado_archivo.st_mtime_ns]
+
+    @_sincronizado
+    def guardar_instantanea(self):
+        """
+        Toma una instantánea del estado derivado de la cadena (ver Instantanea). Solo se toma
+        si todos los bloques en memoria están guardados. Devuelve False si no se ha guardado.
+        """
+        if self._bloques_guardados != len(self.cadena.cadena):
+            return False
+        punta = self.cadena.peek()
+        try:
+            verificado = None
+            if self._punto_control_valido():
+                verificado = {"index": self.indice_verificado, "hash_actual": self.hash_verificado, "archivo": self._firma_archivo()}
+            self.instantanea.guardar({
+                "index": punta.index,
+                "hash_actual": punta.hash_actual,
+                # Listas de pares en lugar de objetos JSON para conservar el tipo de los IDs de candidato
+                "indice_temas": [[tema, resumen["bloques"], resumen["numero_votos"], resumen["primer_voto"],
+                                  resumen["ultimo_voto"], list(resumen["candidatos"])]
+                                 for tema, resumen in self.cadena.indice_temas.items()],
+                "recuento_por_tema": [[tema, list(recuento.items())] for tema, recuento in self.recuento_por_tema.items()],
+                "recuento_global": list(self.recuento_global.items()),
+                "verificado": verificado,
+            })
+        except (OSError, TypeError, ValueError) as e:
+            logger.error("Error al guardar la instantánea %s: %s", self.instantanea.ruta, e)
+            return False
+        self._index_instantanea = punta.index
+        logger.info("Instantánea del estado derivado guardada en el bloque %s.", punta.index)
+        return True
+
+    def _guardar_instantanea_si_procede(self):
+        if self.INSTANTANEA_CADA_BLOQUES and self.cadena.peek().index - self._index_instantanea >= self.INSTANTANEA_CADA_BLOQUES:
+            self.guardar_instantanea()
+
+    def _indexar_bloque(self, bloque):
+        """Incorpora un bloque confirmado a los índices en memoria (a los perezosos solo si ya existen)."""
+        votantes_tema = self.votantes_por_tema.get(bloque.tema_votacion)
+        if votantes_tema is not None:
+            votantes_tema.update(VotosColumnares.hashes_votantes(bloque.votos))
+            votantes_tema.discard(None)
+        if self.comprobantes is not None:
+            self._indexar_comprobantes(bloque)
+        recuento_tema = self.recuento_por_tema.setdefault(bloque.tema_votacion, {})
+        for id_candidato, votos in VotosColumnares.recuento_candidatos(bloque.votos).items():
+            recuento_tema[id_candidato] = recuento_tema.get(id_candidato, 0) + votos
+            self.recuento_global[id_candidato] = self.recuento_global.get(id_candidato, 0) + votos
+
+    def _indexar_comprobantes(self, bloque):
+        for posicion, id_votante_hash in enumerate(VotosColumnares.hashes_votantes(bloque.votos)):
+            if id_votante_hash:
+                self.comprobantes.setdefault(id_votante_hash, []).append((bloque.index, posicion))
+
+    def _votantes_confirmados(self, tema):
+        """Hashes de los votantes de un tema ya registrados en la cadena (el índice se crea al primer uso)."""
+        votantes = self.votantes_por_tema.get(tema)
+        if votantes is not None:
+            return votantes
+        with self._lock:
+            votantes = self.votantes_por_tema.get(tema)
+            if votantes is None:
+                votantes = set()
+                for bloque in self.cadena.bloques_de_tema(tema):
+                    votantes.update(VotosColumnares.hashes_votantes(bloque.votos))
+                votantes.discard(None)
+                self.votantes_por_tema[tema] = votantes
+            return votantes
+
+    @_sincronizado
+    def _indice_comprobantes(self):
+        """Índice {id_votante_hash: [(índice de bloque, posición)]}, creado en la primera consulta."""
+        if self.comprobantes is None:
+            self.comprobantes = {}
+            for bloque in self.cadena.cadena[1:]:
+                self._indexar_comprobantes(bloque)
+        return self.comprobantes
+
     def _serializar_bloque(self, bloque):
         """Convierte un objeto Bloque en un diccionario para JSON"""
-        return {
-            "index": bloque.index,
-            "timestamp": bloque.timestamp,
-            "votos": bloque.votos,
-            "hash_anterior": bloque.hash_anterior,
-            "hash_actual": bloque.hash_actual,
-            "tema_votacion": bloque.tema_votacion
-        }
+        return bloque.a_diccionario()
+
+    def iterar_bloques_json(self, desde=0, limite=None, incluir_votos=True, tema=None):
+        """
+        Generador del JSON de los bloques (bytes UTF-8) a partir de la posición 'desde' (como
+        máximo 'limite'), sin materializar una copia de la cadena. Con 'tema' solo se recorren
+        los bloques de ese tema (las posiciones son relativas a ellos). Cada bloque se toma de la
+        caché de fragmentos, por lo que se serializa una sola vez.
+        """
+        indices = self.indices_bloques(tema)
+        fin = len(indices)
+        if limite is not None:
+            fin = min(fin, desde + limite)
+        for i in range(desde, fin):
+            yield self.fragmentos.obtener(self.cadena.cadena[indices[i]], incluir_votos)
+
+    def indices_bloques(self, tema=None):
+        """Posiciones en la cadena de los bloques de un tema (o de todos los bloques si tema es None)."""
+        if tema is None:
+            return range(len(self.cadena.cadena))
+        resumen = self.cadena.indice_temas.get(tema)
+        return resumen["bloques"] if resumen else []
 
     def _deserializar_bloque(self, bloque_dict):
         """Convierte un diccionario en un objeto Bloque"""
-        return Bloque.Bloque(
-            index=bloque_dict["index"],
-            timestamp=bloque_dict["timestamp"],
-            votos=bloque_dict["votos"],
-            hash_anterior=bloque_dict["hash_anterior"],
-            hash_actual=bloque_dict["hash_actual"],
-            tema_votacion=bloque_dict.get("tema_votacion", "No especificado")
-        )
+        return Bloque.Bloque.desde_diccionario(bloque_dict)
+
+    @property
+    def tema_activo(self):
+        """Tema de la votación activa iniciada más recientemente (None si no hay ninguna)."""
+        temas = list(self.sesiones)
+        return temas[-1] if temas else None
+
+    def _obtener_sesion(self, tema=None):
+        """
+        Devuelve la sesión del tema indicado. Sin tema, devuelve la única votación activa;
+        si hay varias es obligatorio indicar el tema.
+        """
+        if tema is not None:
+            sesion = self.sesiones.get(tema)
+            if sesion is None:
+                logger.error("No hay ninguna votación activa para el tema '%s'.", tema)
+            return sesion
+        sesiones = list(self.sesiones.values())
+        if not sesiones:
+            logger.error("No hay ninguna votación activa.")
+            return None
+        if len(sesiones) > 1:
+            logger.error("Hay %s votaciones activas; es necesario indicar el tema.", len(sesiones))
+            return None
+        return sesiones[0]
 
+    @_sincronizado
     def iniciar_votacion(self, tema):
         """Inicia una nueva sesión de votación para un tema específico."""
-        if self.tema_activo:
-            print(f"Error: Ya hay una votación activa para el tema '{self.tema_activo}'. Finalícela primero.")
-            return False
         if not tema:
-            print("Error: Se requiere un tema para iniciar la votación.")
+            logger.error("Se requiere un tema para iniciar la votación.")
+            return False
+        if tema in self.sesiones:
+            logger.error("Ya hay una votación activa para el tema '%s'. Finalícela primero.", tema)
             return False
 
-        self.tema_activo = tema
-        self.candidatos_votacion_activa = {}  # Reiniciar candidatos para la nueva votación
-        self.votos_sesion_actual = []
-        self.votantes_sesion_actual = set()
-        print(f"Votación iniciada para el tema: '{self.tema_activo}'")
+        sesion = SesionVotacion.SesionVotacion(tema, self._crear_diario(tema))
+        sesion.diario.vaciar()  # Cada diario solo contiene su sesión
+        sesion.diario.esperar(sesion.diario.anotar({"tipo": "inicio", "tema": tema, "timestamp": sesion.timestamp_inicio}), forzar=True)
+        self.sesiones[tema] = sesion
+        logger.info("Votación iniciada para el tema: '%s' (%s votaciones activas)", tema, len(self.sesiones))
+        self._notificar_cambio(None)  # Cambia la lista de votaciones activas
         return True
 
-    def agregar_candidato_a_votacion(self, nombre_candidato):
-        """Agrega un candidato a la votación activa."""
-        if not self.tema_activo:
-            print("Error: No hay ninguna votación activa para agregar candidatos.")
+    def agregar_candidato_a_votacion(self, nombre_candidato, tema=None):
+        """Agrega un candidato a la votación activa del tema indicado."""
+        sesion = self._obtener_sesion(tema)
+        if sesion is None:
+            logger.error("No hay ninguna votación activa para agregar candidatos.")
             return False
         if not nombre_candidato:
-            print("Error: Se requiere un nombre para el candidato.")
+            logger.error("Se requiere un nombre para el candidato.")
             return False
 
-        id_candidato_encontrado = None
-        for id_cand, nombre in self.candidatos_globales.items():
-            if nombre == nombre_candidato:
-                id_candidato_encontrado = id_cand
-                break
+        with sesion.lock:
+            if self.sesiones.get(sesion.tema) is not sesion:
+                logger.error("La votación '%s' ya ha finalizado.", sesion.tema)
+                return False
 
-        if id_candidato_encontrado:
-            id_candidato = id_candidato_encontrado
-            print(f"Candidato '{nombre_candidato}' (ID: {id_candidato}) ya existe globalmente.")
-        else:
-            self.ultimo_id_candidato_global += 1
-            id_candidato = str(self.ultimo_id_candidato_global)
-            self.candidatos_globales[id_candidato] = nombre_candidato
-            print(f"Candidato '{nombre_candidato}' registrado globalmente con ID {id_candidato}.")
-            if not self.guardar_datos():
-                print("ADVERTENCIA: No se pudo guardar el nuevo candidato global.")
+            id_candidato = self.registrar_candidato_global(nombre_candidato)
+            nombre_candidato = self.candidatos_globales[id_candidato]  # Nombre registrado (puede diferir en mayúsculas o espacios)
+
+            if id_candidato in sesion.candidatos:
+                logger.info("Candidato '%s' (ID: %s) ya está añadido a la votación activa '%s'.", nombre_candidato, id_candidato, sesion.tema)
+                return id_candidato
 
-        if id_candidato in self.candidatos_votacion_activa:
-            print(f"Candidato '{nombre_candidato}' (ID: {id_candidato}) ya está añadido a la votación activa '{self.tema_activo}'.")
+            sesion.candidatos[id_candidato] = nombre_candidato
+            sesion.diario.esperar(sesion.diario.anotar({"tipo": "candidato", "id": id_candidato, "nombre": nombre_candidato}), forzar=True)
+            logger.info("Candidato '%s' (ID: %s) añadido a la votación activa '%s'.", nombre_candidato, id_candidato, sesion.tema)
+            self._notificar_cambio(sesion.tema)
             return id_candidato
 
-        self.candidatos_votacion_activa[id_candidato] = nombre_candidato
-        print(f"Candidato '{nombre_candidato}' (ID: {id_candidato}) añadido a la votación activa '{self.tema_activo}'.")
-        return id_candidato
+    def emitir_voto_sesion(self, id_votante_externo, id_candidato, tema=None):
+        """
+        Emite un voto para la votación activa del tema indicado.
 
-    def emitir_voto_sesion(self, id_votante_externo, id_candidato):
-        """Emite un voto para la sesión de votación activa."""
-        if not self.tema_activo:
-            print("Error: No hay ninguna votación activa para emitir votos.")
-            return False
-        if not id_votante_externo:
-            print("Error: Se requiere la identificación del votante.")
-            return False
-        if id_candidato not in self.candidatos_votacion_activa:
-            print(f"Error: Candidato con ID '{id_candidato}' no es válido para la votación activa '{self.tema_activo}'.")
-            return False
+        La comprobación de duplicados y la aceptación se hacen de forma atómica bajo el bloqueo
+        de la sesión (los votos de temas distintos no compiten entre sí); la escritura en el
+        diario se espera fuera del bloqueo para que varios hilos compartan el mismo fsync.
+        """
+        inicio = time.perf_counter()
+        id_votante_hash = None
+        if id_votante_externo:
+            # El hash se calcula fuera del bloqueo
+            id_votante_hash = hashlib.sha256(str(id_votante_externo).encode()).hexdigest()
 
-        id_votante_hash = hashlib.sha256(str(id_votante_externo).encode()).hexdigest()
+        sesion = self._obtener_sesion(tema)
+        if sesion is None:
+            logger.info("No hay ninguna votación activa para emitir votos.")
+            return self._voto_rechazado(inicio, "sin_votacion")
 
-        
-        for bloque in self.cadena.cadena[1:]: # Omitir bloque génesis
-            if bloque.tema_votacion == self.tema_activo:
-                for voto_en_bloque in bloque.votos:
-                    if voto_en_bloque.get("id_votante_hash") == id_votante_hash:
-                        print(f"Error: El votante con ID (hash) {id_votante_hash[:8]}... ya ha votado anteriormente para el tema '{self.tema_activo}' (encontrado en bloque {bloque.index}).")
-                        return False
-        
-
-        # Verificar si el votante ya ha votado en la sesión actual
-        if id_votante_hash in self.votantes_sesion_actual:
-            print(f"Error: El votante con ID (hash) {id_votante_hash[:8]}... ya ha votado en esta sesión para '{self.tema_activo}'.")
-            return False
+        with sesion.lock:
+            if self.sesiones.get(sesion.tema) is not sesion:
+                logger.info("La votación '%s' ya ha finalizado.", sesion.tema)
+                return self._voto_rechazado(inicio, "votacion_finalizada")
+            if not id_votante_hash:
+                logger.info("Se requiere la identificación del votante.")
+                return self._voto_rechazado(inicio, "sin_votante")
+            if id_candidato not in sesion.candidatos:
+                logger.info("Candidato con ID '%s' no es válido para la votación activa '%s'.", id_candidato, sesion.tema)
+                return self._voto_rechazado(inicio, "candidato_invalido")
 
-        voto = {
-            "timestamp": time.time(),
-            "id_votante_hash": id_votante_hash,
-            "id_candidato": id_candidato,
-            "tema_votacion": self.tema_activo
-        }
-        self.votos_sesion_actual.append(voto)
-        self.votantes_sesion_actual.add(id_votante_hash)
+            # Comprobación O(1) contra el índice de votantes ya confirmados en la cadena
+            if id_votante_hash in self._votantes_confirmados(sesion.tema):
+                logger.info("El votante con ID (hash) %s... ya ha votado anteriormente para el tema '%s'.", id_votante_hash[:8], sesion.tema)
+                return self._voto_rechazado(inicio, "ya_voto_cadena")
 
-        print(f"Voto para '{self.tema_activo}' por votante {id_votante_hash[:8]}... registrado (pendiente de finalizar votación).")
+            # Verificar si el votante ya ha votado en la sesión actual
+            if id_votante_hash in sesion.votantes:
+                logger.info("El votante con ID (hash) %s... ya ha votado en esta sesión para '%s'.", id_votante_hash[:8], sesion.tema)
+                return self._voto_rechazado(inicio, "ya_voto_sesion")
+
+            voto = {
+                "timestamp": time.time(),
+                "id_votante_hash": id_votante_hash,
+                "id_candidato": id_candidato,
+                "tema_votacion": sesion.tema
+            }
+            sesion.registrar_voto(voto)
+            ticket = sesion.diario.anotar({"tipo": "voto", "voto": voto})
+            self._sellar_si_completo(sesion)
+
+        if not sesion.diario.esperar(ticket):
+            with sesion.lock:
+                descartado = sesion.descartar_voto(voto)
+            # Si ya no estaba pendiente es que se selló en un bloque guardado, y por tanto es duradero
+            if descartado:
+                logger.error("No se pudo guardar en el diario el voto del votante %s...; se ha descartado.", id_votante_hash[:8])
+                return self._voto_rechazado(inicio, "error_diario")
+
+        logger.debug("Voto para '%s' por votante %s... registrado (pendiente de finalizar votación).", sesion.tema, id_votante_hash[:8])
+        Metricas.incrementar("votacion_votos_aceptados_total")
+        Metricas.observar("votacion_voto_segundos", time.perf_counter() - inicio, resultado="aceptado")
+        self._notificar_cambio(sesion.tema)
         return True
 
-    def finalizar_votacion(self):
-        """Finaliza la votación activa, crea el bloque y lo añade a la cadena."""
-        if not self.tema_activo:
-            print("Error: No hay ninguna votación activa para finalizar.")
-            return False
-        if not self.votos_sesion_actual:
-            print(f"Advertencia: No hay votos registrados para la votación '{self.tema_activo}'. No se creará un bloque.")
-            self.tema_activo = None
-            self.candidatos_votacion_activa = {}
-            self.votos_sesion_actual = []
-            self.votantes_sesion_actual = set()
-            return False
+    def _voto_rechazado(self, inicio, motivo):
+        """Registra en las métricas un voto rechazado por 'motivo' y devuelve False."""
+        Metricas.incrementar("votacion_votos_rechazados_total", motivo=motivo)
+        Metricas.observar("votacion_voto_segundos", time.perf_counter() - inicio, resultado="rechazado")
+        return False
 
-        print(f"Finalizando votación para '{self.tema_activo}' con {len(self.votos_sesion_actual)} votos.")
+    def emitir_votos_lote(self, votos, tema=None):
+        """
+        Emite un lote de votos [(id_votante_externo, id_candidato), ...] en la votación activa del tema.
 
-        success = self.cadena.agregar_bloque(self.votos_sesion_actual, self.tema_activo)
+        Los hashes se calculan fuera del bloqueo; los duplicados dentro del lote y contra la cadena
+        y la sesión se detectan con operaciones de conjuntos bajo una sola adquisición del bloqueo
+        de la sesión, y todos los votos aceptados se anotan en el diario en un único registro.
+        Devuelve una lista con el motivo de rechazo de cada voto (None si se aceptó), o None si
+        no hay ninguna votación activa para el tema.
+        """
+        inicio = time.perf_counter()
+        pares = [(hashlib.sha256(str(id_votante_externo).encode()).hexdigest() if id_votante_externo else None,
+                  str(id_candidato) if id_candidato is not None else None)
+                 for id_votante_externo, id_candidato in votos]
+        resultados = [None] * len(pares)
 
-        if success:
-            print(f"Bloque para '{self.tema_activo}' añadido a la blockchain.")
-            if not self.guardar_datos():
-                print("ADVERTENCIA: No se pudieron guardar los datos después de añadir el bloque.")
-            self.tema_activo = None
-            self.candidatos_votacion_activa = {}
-            self.votos_sesion_actual = []
-            self.votantes_sesion_actual = set()
+        sesion = self._obtener_sesion(tema)
+        if sesion is None:
+            logger.info("No hay ninguna votación activa para emitir votos.")
+            return None
+
+        aceptados = []
+        posiciones_aceptadas = []
+        with sesion.lock:
+            if self.sesiones.get(sesion.tema) is not sesion:
+                logger.info("La votación '%s' ya ha finalizado.", sesion.tema)
+                return None
+            hashes_lote = {id_votante_hash for id_votante_hash, _ in pares if id_votante_hash}
+            ya_en_cadena = hashes_lote & self._votantes_confirmados(sesion.tema)
+            ya_en_sesion = hashes_lote & sesion.votantes
+            vistos = set()
+            ahora = time.time()
+            for posicion, (id_votante_hash, id_candidato) in enumerate(pares):
+                if not id_votante_hash:
+                    resultados[posicion] = "sin_votante"
+                elif id_candidato not in sesion.candidatos:
+                    resultados[posicion] = "candidato_invalido"
+                elif id_votante_hash in ya_en_cadena:
+                    resultados[posicion] = "ya_voto_cadena"
+                elif id_votante_hash in ya_en_sesion:
+                    resultados[posicion] = "ya_voto_sesion"
+                elif id_votante_hash in vistos:
+                    resultados[posicion] = "duplicado_lote"
+                else:
+                    vistos.add(id_votante_hash)
+                    posiciones_aceptadas.append(posicion)
+                    aceptados.append({
+                        "timestamp": ahora,
+                        "id_votante_hash": id_votante_hash,
+                        "id_candidato": id_candidato,
+                        "tema_votacion": sesion.tema
+                    })
+            if aceptados:
+                sesion.registrar_votos(aceptados)
+                ticket = sesion.diario.anotar({"tipo": "lote", "votos": aceptados})
+                self._sellar_si_completo(sesion)
+
+        if aceptados and not sesion.diario.esperar(ticket):
+            with sesion.lock:
+                descartados = {id(voto) for voto in sesion.descartar_votos(aceptados)}
+            # Los que ya no estaban pendientes se sellaron en un bloque guardado, y por tanto son duraderos
+            if descartados:
+                logger.error("No se pudo guardar en el diario un lote de %s votos; se han descartado %s sin sellar.",
+                             len(aceptados), len(descartados))
+                for posicion, voto in zip(posiciones_aceptadas, aceptados):
+                    if id(voto) in descartados:
+                        resultados[posicion] = "error_diario"
+                posiciones_aceptadas = [posicion for posicion in posiciones_aceptadas if resultados[posicion] is None]
+
+        rechazos = collections.Counter(motivo for motivo in resultados if motivo is not None)
+        for motivo, numero in rechazos.items():
+            Metricas.incrementar("votacion_votos_rechazados_total", numero, motivo=motivo)
+        Metricas.incrementar("votacion_votos_aceptados_total", len(posiciones_aceptadas))
+        Metricas.observar("votacion_lote_segundos", time.perf_counter() - inicio)
+        logger.info("Lote de %s votos para '%s': %s aceptados y %s rechazados.",
+                    len(pares), sesion.tema, len(posiciones_aceptadas), len(pares) - len(posiciones_aceptadas))
+        if posiciones_aceptadas:
+            self._notificar_cambio(sesion.tema)
+        return resultados
+
+    def _sellar_votos_pendientes(self, sesion, numero=None, motivo="tamano"):
+        """
+        Sella en un bloque los 'numero' primeros votos pendientes de la sesión (todos por defecto)
+        sin finalizarla. Se llama con el bloqueo de la sesión adquirido. Tras guardar el bloque,
+        el diario se reescribe solo con los votos aún sin sellar. Devuelve False si falla.
+        """
+        with self._lock:
+            votos = sesion.votos if numero is None else sesion.votos[:numero]
+            if not votos:
+                return True
+            # Marca en el diario que la sesión tiene bloques sellados antes de finalizar
+            sesion.diario.esperar(sesion.diario.anotar({"tipo": "sellado"}), forzar=True)
+            if not self.cadena.agregar_bloque(votos, sesion.tema):
+                logger.error("No se pudo sellar un bloque de la votación '%s'.", sesion.tema)
+                return False
+            self._indexar_bloque(self.cadena.peek())
+            sesion.retirar_sellados(len(votos))
+            Metricas.incrementar("votacion_sellados_total", motivo=motivo)
+            logger.info("Votación '%s': %s votos sellados en el bloque %s (%s sellados en total, %s pendientes).",
+                        sesion.tema, len(votos), self.cadena.peek().index, sesion.votos_sellados, len(sesion.votos))
+            self._notificar_cambio(sesion.tema)
+            if self.guardar_datos():
+                self._reescribir_diario(sesion)
+            else:
+                # Los votos siguen en el diario hasta que un guardado posterior persista el bloque
+                logger.warning("No se pudieron guardar los datos después de sellar el bloque.")
             return True
-        else:
-            print(f"Error: No se pudo añadir el bloque para '{self.tema_activo}' a la blockchain.")
-            print("Se reseteará el estado de la votación activa debido al error.")
-            self.tema_activo = None
-            self.candidatos_votacion_activa = {}
-            self.votos_sesion_actual = []
-            self.votantes_sesion_actual = set()
+
+    def _sellar_si_completo(self, sesion):
+        """Sella bloques de votos_por_bloque votos mientras la sesión tenga suficientes pendientes."""
+        while self.votos_por_bloque and len(sesion.votos) >= self.votos_por_bloque:
+            if not self._sellar_votos_pendientes(sesion, self.votos_por_bloque):
+                break
+
+    def _sellar_periodicamente(self):
+        """Sella los votos pendientes de las sesiones cuyo último sellado es anterior a intervalo_sellado."""
+        while True:
+            time.sleep(min(self.intervalo_sellado, 1))
+            ahora = time.time()
+            for sesion in list(self.sesiones.values()):
+                if not sesion.votos or ahora - sesion.ultimo_sellado < self.intervalo_sellado:
+                    continue
+                try:
+                    with sesion.lock:
+                        if self.sesiones.get(sesion.tema) is sesion:
+                            self._sellar_votos_pendientes(sesion, motivo="tiempo")
+                except Exception as e:
+                    logger.error("Error en el sellado periódico de '%s': %s", sesion.tema, e)
+
+    def finalizar_votacion(self, tema=None):
+        """Finaliza la votación activa del tema indicado, crea su bloque y lo añade a la cadena."""
+        sesion = self._obtener_sesion(tema)
+        if sesion is None:
+            logger.error("No hay ninguna votación activa para finalizar.")
             return False
 
+        with sesion.lock:
+            with self._lock:
+                if self.sesiones.get(sesion.tema) is not sesion:
+                    logger.error("La votación '%s' ya ha finalizado.", sesion.tema)
+                    return False
+                if not sesion.votos and not sesion.votos_sellados:
+                    logger.warning("No hay votos registrados para la votación '%s'. No se creará un bloque.", sesion.tema)
+                    del self.sesiones[sesion.tema]
+                    self._notificar_cambio(None)
+                    sesion.diario.eliminar()
+                    return False
+
+                logger.info("Finalizando votación para '%s' con %s votos.", sesion.tema, len(sesion.votos) + sesion.votos_sellados)
+                del self.sesiones[sesion.tema]
+                self._notificar_cambio(None)  # Cambia la lista de votaciones activas y, al sellar, los resultados
+                if not sesion.votos:
+                    # Todos los votos ya están sellados en bloques (se guardan por si falló algún guardado)
+                    if self.guardar_datos():
+                        sesion.diario.eliminar()
+                    return True
+
+                # Si hay un corte antes de guardar el bloque, el diario indica que se estaba finalizando
+                sesion.diario.esperar(sesion.diario.anotar({"tipo": "fin"}), forzar=True)
+                success = self.cadena.agregar_bloque(sesion.votos, sesion.tema)
+
+                if success:
+                    logger.info("Bloque para '%s' añadido a la blockchain.", sesion.tema)
+                    self._indexar_bloque(self.cadena.peek())
+                    if self.guardar_datos():
+                        sesion.diario.eliminar()  # Los votos ya están en un bloque persistido
+                    else:
+                        logger.warning("No se pudieron guardar los datos después de añadir el bloque.")
+                    return True
+                else:
+                    logger.error("No se pudo añadir el bloque para '%s' a la blockchain.", sesion.tema)
+                    logger.info("Se reseteará el estado de la votación activa debido al error.")
+                    sesion.diario.eliminar()
+                    return False
+
+    @_sincronizado
     def registrar_candidato_global(self, nombre):
         """Registra un candidato globalmente si no existe."""
         if not nombre:
             return None
-        for id_cand, nom in self.candidatos_globales.items():
-            if nom == nombre:
-                print(f"Candidato '{nombre}' ya existe globalmente con ID {id_cand}.")
-                return id_cand
-        self.ultimo_id_candidato_global += 1
-        id_candidato = str(self.ultimo_id_candidato_global)
-        self.candidatos_globales[id_candidato] = nombre
-        print(f"Candidato '{nombre}' registrado globalmente con ID {id_candidato}.")
-        if not self.guardar_datos():
-            print("ADVERTENCIA: No se pudo guardar el nuevo candidato global.")
+        # Búsqueda O(1) por nombre normalizado (sin distinguir mayúsculas ni espacios)
+        id_existente = self.registro_candidatos.buscar(nombre)
+        if id_existente is not None:
+            logger.info("Candidato '%s' ya existe globalmente con ID %s.", nombre, id_existente)
+            return id_existente
+        id_candidato = self.registro_candidatos.nuevo(nombre)
+        self._candidatos_sin_guardar.append(id_candidato)
+        logger.info("Candidato '%s' registrado globalmente con ID %s.", nombre, id_candidato)
+        # Solo se escribe el registro de candidatos; la cadena no se toca
+        if not self._guardar_candidatos():
+            logger.warning("No se pudo guardar el nuevo candidato global.")
         return id_candidato
 
+    # --- Replicación entre nodos (ver Replicador) ---
+
+    def contiene_bloque(self, index, hash_actual):
+        """Indica si el bloque 'index' de esta cadena tiene ese hash (la punta de otro nodo forma parte de ella)."""
+        cadena = self.cadena.cadena
+        return 0 <= index < len(cadena) and cadena[index].hash_actual == hash_actual
+
+    @_sincronizado
+    def incorporar_candidatos(self, candidatos, ultimo_id=-1):
+        """Añade al registro los candidatos globales de otro nodo que aún no estaban y los guarda."""
+        nuevos = self.registro_candidatos.incorporar(candidatos, ultimo_id)
+        if nuevos:
+            self._candidatos_sin_guardar.extend(nuevos)
+            self._guardar_candidatos()
+        return nuevos
+
+    @_sincronizado
+    def incorporar_bloques(self, bloques):
+        """
+        Añade a la cadena bloques sellados en otro nodo, validando cada uno con las reglas de
+        Cadena.validar_bloque, y guarda los añadidos. Se detiene en el primer bloque que no
+        encadena o cuyo hash no coincide. Devuelve el número de bloques aceptados.
+        """
+        if self._carga_fallida:
+            logger.error("No se incorporan bloques: la cadena de %s no se pudo cargar.", self.almacen.ruta_datos)
+            return 0
+        aceptados = []
+        for bloque in bloques:
+            if bloque.index == 0 and self.cadena.cadena_vacia() and bloque.hash_anterior == "0":
+                # Génesis distinto (p.ej. cadena migrada de un formato antiguo) y aún sin bloques propios: se adopta
+                self.cadena.cadena[0] = bloque
+                self._invalidar_punto_control()
+                self.fragmentos.vaciar()
+                self.almacen.compactar(self.cadena.cadena, {}, -1)
+                self._bloques_guardados = 1
+            elif self.cadena.incorporar_bloque(bloque):
+                self._indexar_bloque(bloque)
+            else:
+                logger.error("Bloque %s recibido rechazado: no encadena con la punta local o su hash no es válido.", bloque.index)
+                break
+            aceptados.append(bloque)
+        if aceptados:
+            Metricas.incrementar("votacion_replicacion_bloques_total", len(aceptados))
+            if not self.guardar_datos():
+                logger.warning("No se pudieron guardar los bloques recibidos.")
+            for tema in {bloque.tema_votacion for bloque in aceptados if bloque.index > 0}:
+                self._notificar_cambio(tema)
+        return len(aceptados)
+
     def contar_votos(self, tema_especifico=None):
-        """Cuenta votos globalmente o para un tema específico."""
+        """
+        Cuenta votos globalmente o para un tema específico, incluyendo los votos pendientes
+        de las votaciones activas correspondientes.
+        Usa los recuentos mantenidos de forma incremental, por lo que el coste es O(candidatos).
+        """
         try:
-            resultados = {id_candidato: 0 for id_candidato in self.candidatos_globales}
-            votos_a_contar = []
-
-            for bloque in self.cadena.cadena[1:]:
-                if tema_especifico is None or bloque.tema_votacion == tema_especifico:
-                    votos_a_contar.extend(bloque.votos)
+            while True:
+                # Primero los recuentos pendientes (bloqueo de cada sesión) y después los confirmados
+                # (bloqueo global), respetando el orden de adquisición sesión -> global
+                pendientes = []
+                for sesion in list(self.sesiones.values()):
+                    if tema_especifico is None or sesion.tema == tema_especifico:
+                        with sesion.lock:
+                            logger.debug("Incluyendo %s votos pendientes de la sesión activa '%s'.", len(sesion.votos), sesion.tema)
+                            pendientes.append((sesion, sesion.votos_sellados, dict(sesion.recuento)))
 
-            for voto in votos_a_contar:
-                id_candidato = voto.get("id_candidato")
-                if id_candidato in resultados:
-                    resultados[id_candidato] += 1
+                with self._lock:
+                    if tema_especifico is None:
+                        recuento_confirmado = self.recuento_global
+                    else:
+                        recuento_confirmado = self.recuento_por_tema.get(tema_especifico, {})
 
-            if self.tema_activo and (tema_especifico is None or self.tema_activo == tema_especifico):
-                print(f"Incluyendo {len(self.votos_sesion_actual)} votos pendientes de la sesión activa '{self.tema_activo}'.")
-                for voto_pendiente in self.votos_sesion_actual:
-                    id_candidato = voto_pendiente.get("id_candidato")
-                    if id_candidato in resultados:
-                        resultados[id_candidato] += 1
+                    resultados = {
+                        id_candidato: votos for id_candidato, votos in recuento_confirmado.items()
+                        if id_candidato in self.candidatos_globales
+                    }
+                    for _, _, recuento in pendientes:
+                        for id_candidato, votos in recuento.items():
+                            if id_candidato in self.candidatos_globales:
+                                resultados[id_candidato] = resultados.get(id_candidato, 0) + votos
+                    # Si entre medias se selló un bloque, sus votos se habrían contado dos veces
+                    if all(sesion.votos_sellados == sellados for sesion, sellados, _ in pendientes):
+                        break
 
             resultados_filtrados = {id_c: v for id_c, v in resultados.items() if v > 0}
             return resultados_filtrados
         except Exception as e:
-            print(f"Error al contar votos: {str(e)}")
+            logger.error("Error al contar votos: %s", e)
             return {}
 
     def mostrar_resultados(self, tema_especifico=None):
-        """Muestra los resultados globales o para un tema específico."""
+        """Muestra en el log los resultados globales o para un tema específico."""
         try:
             resultados = self.contar_votos(tema_especifico)
             titulo_tema = f"para el tema '{tema_especifico}'" if tema_especifico else "globales"
 
-            print(f"\n--- RESULTADOS DE LA VOTACIÓN ({titulo_tema}) ---")
+            logger.info("--- RESULTADOS DE LA VOTACIÓN (%s) ---", titulo_tema)
             if not resultados:
-                print("No hay votos registrados para mostrar.")
+                logger.info("No hay votos registrados para mostrar.")
             else:
                 resultados_ordenados = sorted(resultados.items(), key=lambda item: item[1], reverse=True)
                 for id_candidato, votos in resultados_ordenados:
                     nombre_candidato = self.candidatos_globales.get(id_candidato, f"ID Desconocido {id_candidato}")
-                    print(f"{nombre_candidato} (ID: {id_candidato}): {votos} votos")
-            print("-------------------------------------------\n")
+                    logger.info("%s (ID: %s): %s votos", nombre_candidato, id_candidato, votos)
             return True
         except Exception as e:
-            print(f"Error al mostrar resultados: {str(e)}")
+            logger.error("Error al mostrar resultados: %s", e)
             return False
 
-    def verificar_integridad_cadena(self):
-        """Verifica la integridad de la cadena en memoria, advirtiendo si el archivo externo ha cambiado."""
-        try:
-            # --- INICIO COMPROBACIÓN DE MODIFICACIÓN EXTERNA ---
-            try:
-                timestamp_actual_archivo = os.path.getmtime(self.ARCHIVO_DATOS)
-                if timestamp_actual_archivo != self.ultimo_timestamp_archivo:
-                    print("\n" + "="*60)
-                    print("¡ADVERTENCIA! El archivo blockchain_votacion.json ha sido modificado")
-                    print("externamente desde la última carga o guardado realizado por la aplicación.")
-                    print(f"  - Timestamp conocido: {self.ultimo_timestamp_archivo}")
-                    print(f"  - Timestamp actual:   {timestamp_actual_archivo}")
-                    print("La verificación de integridad se realizará sobre los datos en MEMORIA,")
-                    print("que podrían no reflejar el contenido actual del archivo.")
-                    print("Considere reiniciar la aplicación para recargar desde el archivo si es necesario.")
-                    print("="*60 + "\n")
-            except FileNotFoundError:
-                 print("\nADVERTENCIA: No se encontró el archivo blockchain_votacion.json para comprobar su modificación.\n")
-            except Exception as e:
-                 print(f"\nADVERTENCIA: No se pudo comprobar la fecha de modificación del archivo: {e}\n")
-            # --- FIN COMPROBACIÓN DE MODIFICACIÓN EXTERNA ---
+    def _invalidar_punto_control(self):
+        """Olvida el prefijo verificado; la siguiente verificación recorrerá toda la cadena."""
+        self.indice_verificado = None
+        self.hash_verificado = None
 
-            # Ahora procede la verificación sobre los datos en memoria (self.cadena.cadena)
-            # 1. Verificar si la cadena está vacía
-            if not self.cadena.cadena:
-                 print("Error de integridad (Memoria): La cadena está completamente vacía.")
-                 return False
+    def _punto_control_valido(self):
+        """Indica si el prefijo verificado sigue correspondiendo con la cadena en memoria."""
+        if self.indice_verificado is None or self.indice_verificado >= len(self.cadena.cadena):
+            return False
+        return self.cadena.cadena[self.indice_verificado].hash_actual == self.hash_verificado
 
-            # 2. Verificar el Bloque Génesis
-            primer_bloque = self.cadena.cadena[0]
-            if primer_bloque.index != 0:
-                print(f"Error de integridad (Memoria): El primer bloque no es el Génesis (índice {primer_bloque.index} en lugar de 0).")
-                return False
-            if primer_bloque.hash_anterior != "0":
-                 print(f"Error de integridad (Memoria): El hash anterior del bloque Génesis no es '0'.")
-                 # return False # Descomentar si se considera crítico
+    def _obtener_pool_verificacion(self, workers):
+        """
+        Pool de procesos compartido por todas las verificaciones en paralelo, de modo que las
+        auditorías repetidas no pagan el arranque de los procesos y las simultáneas no crean
+        más de os.cpu_count(). Si se piden más workers de los que tiene, se sustituye por uno mayor.
+        """
+        workers = min(workers, os.cpu_count() or 1)
+        with self._lock_pool_verificacion:
+            if self._pool_verificacion is None or self._workers_pool_verificacion < workers:
+                if self._pool_verificacion is not None:
+                    self._pool_verificacion.shutdown(wait=False)  # Termina los lotes ya enviados
+                self._pool_verificacion = ProcessPoolExecutor(max_workers=workers)
+                self._workers_pool_verificacion = workers
+            return self._pool_verificacion
 
-            # 3. Verificar el resto de los bloques
-            if len(self.cadena.cadena) <= 1:
-                print("Integridad (Memoria): Cadena solo con bloque génesis, se considera íntegra.")
-                return True
+    def _cerrar_pool_verificacion(self):
+        with self._lock_pool_verificacion:
+            if self._pool_verificacion is not None:
+                self._pool_verificacion.shutdown()
+                self._pool_verificacion = None
+                self._workers_pool_verificacion = 0
+
+    def _buscar_hash_invalido_paralelo(self, bloques, inicio, workers):
+        """
+        Recalcula en paralelo (un proceso por worker) los hashes de los bloques desde 'inicio'
+        y devuelve la posición del primer bloque cuyo hash no coincide, o None si todos son correctos.
+        Los enlaces entre bloques se comprueban después de forma secuencial, ya que son baratos.
+        """
+        pendientes = bloques[inicio:]
+        # Varios lotes por worker para repartir mejor bloques de distinto tamaño
+        tam_lote = max(1, -(-len(pendientes) // (workers * 4)))
+        lotes = [pendientes[i:i + tam_lote] for i in range(0, len(pendientes), tam_lote)]
+        resultados = list(self._obtener_pool_verificacion(workers).map(_primer_hash_invalido, lotes))
+        for numero_lote, posicion_en_lote in enumerate(resultados):
+            if posicion_en_lote is not None:
+                return inicio + numero_lote * tam_lote + posicion_en_lote
+        return None
+
+    def verificar_integridad_cadena(self, completa=False, workers=None):
+        """
+        Verifica la integridad de la cadena en memoria, advirtiendo si el archivo externo ha cambiado.
 
-            for i in range(1, len(self.cadena.cadena)):
-                bloque_actual = self.cadena.cadena[i]
-                bloque_anterior = self.cadena.cadena[i - 1]
+        Por defecto solo se recalculan los bloques añadidos desde la última verificación correcta.
+        Con completa=True (auditoría completa) se recalcula el hash de todos los bloques.
+        Con workers > 1 el recálculo de hashes se reparte entre varios procesos.
+        """
+        modo = "completo" if completa else "incremental"
+        with self._lock:
+            verificados_antes = self.indice_verificado if self._punto_control_valido() else 0
+        with Metricas.medir("votacion_verificacion_segundos", modo=modo):
+            valida = self._verificar_integridad_cadena(completa, workers)
+        Metricas.incrementar("votacion_verificaciones_total", modo=modo, resultado="valida" if valida else "invalida")
+        with self._lock:
+            if valida and self.INSTANTANEA_CADA_BLOQUES and (self.indice_verificado or 0) - verificados_antes >= self.INSTANTANEA_CADA_BLOQUES:
+                # Una verificación larga: se guarda su punto de control para no repetirla tras un reinicio
+                self.guardar_instantanea()
+        return valida
 
-                if bloque_actual.index != i:
-                     print(f"Error de integridad (Memoria): Índice incorrecto en la posición {i}. Esperado {i}, encontrado {bloque_actual.index}.")
+    def _verificar_integridad_cadena(self, completa, workers):
+        """
+        El punto de control se lee y se actualiza con el bloqueo del sistema; el recálculo de
+        los hashes se hace fuera de él, sobre la lista de bloques tomada al empezar.
+        """
+        try:
+            with self._lock:
+                self.primer_bloque_invalido = None
+                # --- INICIO COMPROBACIÓN DE MODIFICACIÓN EXTERNA ---
+                try:
+                    timestamp_actual_archivo = self.marca_archivo()
+                    if timestamp_actual_archivo != self.ultimo_timestamp_archivo:
+                        self._invalidar_punto_control()
+                        logger.warning("El archivo %s ha sido modificado externamente desde la última carga o guardado "
+                                       "(timestamp conocido: %s, actual: %s). La verificación de integridad se realizará "
+                                       "sobre los datos en MEMORIA, que podrían no reflejar el contenido actual del archivo; "
+                                       "considere reiniciar la aplicación para recargarlo.",
+                                       self.almacen.ruta_datos, self.ultimo_timestamp_archivo, timestamp_actual_archivo)
+                except FileNotFoundError:
+                     self._invalidar_punto_control()
+                     logger.warning("No se encontró el archivo %s para comprobar su modificación.", self.almacen.ruta_datos)
+                except Exception as e:
+                     logger.warning("No se pudo comprobar la fecha de modificación del archivo: %s", e)
+                # --- FIN COMPROBACIÓN DE MODIFICACIÓN EXTERNA ---
+
+                # Ahora procede la verificación sobre los datos en memoria (self.cadena.cadena)
+                # 1. Verificar si la cadena está vacía
+                if not self.cadena.cadena:
+                     logger.error("Error de integridad (Memoria): La cadena está completamente vacía.")
+                     self._invalidar_punto_control()
                      return False
-                if bloque_actual.hash_anterior != bloque_anterior.hash_actual:
-                    print(f"Error de integridad (Memoria): Hash anterior del bloque {bloque_actual.index} no coincide.")
-                    return False
-                if bloque_actual.hash_actual != bloque_actual.calcular_hash():
-                    print(f"Error de integridad (Memoria): Hash actual del bloque {bloque_actual.index} es inválido.")
+
+                # 2. Verificar el Bloque Génesis
+                primer_bloque = self.cadena.cadena[0]
+                if primer_bloque.index != 0:
+                    logger.error("Error de integridad (Memoria): El primer bloque no es el Génesis (índice %s en lugar de 0).", primer_bloque.index)
+                    self.primer_bloque_invalido = 0
+                    self._invalidar_punto_control()
                     return False
+                if primer_bloque.hash_anterior != "0":
+                     logger.error("Error de integridad (Memoria): El hash anterior del bloque Génesis no es '0'.")
+                     # return False # Descomentar si se considera crítico
+
+                # 3. Verificar el resto de los bloques
+                if len(self.cadena.cadena) <= 1:
+                    logger.info("Integridad (Memoria): Cadena solo con bloque génesis, se considera íntegra.")
+                    return True
+
+                bloques = list(self.cadena.cadena)
+                inicio = 1
+                if not completa and self._punto_control_valido():
+                    inicio = self.indice_verificado + 1
+                    logger.info("Integridad (Memoria): Bloques 0-%s ya verificados, comprobando %s bloques nuevos.", self.indice_verificado, len(bloques) - inicio)
 
-            print("Verificación de integridad (Memoria) completada: La cadena en memoria es válida.")
+            invalido = self._buscar_bloque_invalido(bloques, inicio, workers)
+
+            with self._lock:
+                if invalido is not None:
+                    self.primer_bloque_invalido = invalido
+                    # Solo el prefijo anterior al bloque inválido sigue verificado: la próxima
+                    # verificación incremental volverá a comprobar (y rechazar) ese bloque
+                    self._actualizar_punto_control(bloques, invalido - 1)
+                    return False
+                self._actualizar_punto_control(bloques, len(bloques) - 1)
+            logger.info("Verificación de integridad (Memoria) completada: La cadena en memoria es válida.")
             return True
         except Exception as e:
-            print(f"Error durante la verificación de integridad: {str(e)}")
+            logger.error("Error durante la verificación de integridad: %s", e)
+            with self._lock:
+                self._invalidar_punto_control()
             return False
 
+    def _buscar_bloque_invalido(self, bloques, inicio, workers):
+        """Posición del primer bloque desde 'inicio' con índice, enlace o hash incorrecto, o None."""
+        paralelo = workers is not None and workers > 1 and len(bloques) - inicio > 1
+        if paralelo:
+            try:
+                posicion_hash_invalido = self._buscar_hash_invalido_paralelo(bloques, inicio, workers)
+                logger.info("Integridad (Memoria): Hashes de %s bloques recalculados con %s procesos.", len(bloques) - inicio, workers)
+            except Exception as e:
+                logger.warning("No se pudo realizar la verificación en paralelo (%s). Se verificará secuencialmente.", e)
+                self._cerrar_pool_verificacion()  # Un pool roto (p.ej. un proceso terminado) se vuelve a crear en la próxima
+                paralelo = False
+
+        for i in range(inicio, len(bloques)):
+            bloque_actual = bloques[i]
+            bloque_anterior = bloques[i - 1]
+
+            if bloque_actual.index != i:
+                 logger.error("Error de integridad (Memoria): Índice incorrecto en la posición %s. Esperado %s, encontrado %s.", i, i, bloque_actual.index)
+                 return i
+            if bloque_actual.hash_anterior != bloque_anterior.hash_actual:
+                logger.error("Error de integridad (Memoria): Hash anterior del bloque %s no coincide.", bloque_actual.index)
+                return i
+            if paralelo:
+                hash_invalido = i == posicion_hash_invalido
+            else:
+                hash_invalido = bloque_actual.hash_actual != bloque_actual.calcular_hash()
+            if hash_invalido:
+                logger.error("Error de integridad (Memoria): Hash actual del bloque %s es inválido.", bloque_actual.index)
+                return i
+        return None
+
+    def _actualizar_punto_control(self, bloques, indice):
+        """
+        Marca como verificados los bloques 0..indice de 'bloques' si siguen siendo los de la cadena
+        (otro hilo puede haberla sustituido durante la verificación); si no, olvida el punto de control.
+        """
+        if 0 <= indice < len(self.cadena.cadena) and self.cadena.cadena[indice] is bloques[indice]:
+            self.indice_verificado = indice
+            self.hash_verificado = bloques[indice].hash_actual
+        else:
+            self._invalidar_punto_control()
+
     def mostrar_estructura_cadena(self):
-        """Muestra la estructura de la cadena."""
+        """Muestra en el log la estructura de la cadena."""
         try:
-            print("\n=== ESTRUCTURA DE LA CADENA DE BLOQUES ===")
+            logger.info("=== ESTRUCTURA DE LA CADENA DE BLOQUES ===")
             if len(self.cadena.cadena) == 0:
-                print("La cadena está vacía.")
+                logger.info("La cadena está vacía.")
                 return True
             if len(self.cadena.cadena) == 1:
-                print("La cadena solo contiene el bloque Génesis.")
+                logger.info("La cadena solo contiene el bloque Génesis.")
 
             for i, bloque in enumerate(self.cadena.cadena):
-                print(f"\n----- BLOQUE #{i} -----")
-                print(f"Índice: {bloque.index}")
-                print(f"Tema de votación: {bloque.tema_votacion}")
                 try:
                     timestamp_legible = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(bloque.timestamp))
                 except ValueError:
                     timestamp_legible = f"Timestamp inválido ({bloque.timestamp})"
-                print(f"Timestamp: {timestamp_legible}")
-                print(f"Hash: {bloque.hash_actual}")
-                print(f"Hash anterior: {bloque.hash_anterior}")
-                print(f"Número de votos: {len(bloque.votos)}")
+                logger.info("----- BLOQUE #%s ----- Índice: %s | Tema de votación: %s | Timestamp: %s | Hash: %s | "
+                            "Hash anterior: %s | Número de votos: %s", i, bloque.index, bloque.tema_votacion,
+                            timestamp_legible, bloque.hash_actual, bloque.hash_anterior, len(bloque.votos))
 
                 if len(bloque.votos) > 0:
-                    print("  Resumen de votos en este bloque:")
                     votos_por_candidato = {}
                     for voto in bloque.votos:
                         id_candidato = voto.get("id_candidato")
@@ -411,21 +1196,82 @@ class SistemaVotacion:
                         votos_por_candidato[nombre] = votos_por_candidato.get(nombre, 0) + 1
 
                     for candidato, num_votos in votos_por_candidato.items():
-                        print(f"    - {candidato}: {num_votos} votos")
-
-            print("\n=========================================")
+                        logger.info("    - %s: %s votos", candidato, num_votos)
             return True
         except Exception as e:
-            print(f"Error al mostrar estructura de la cadena: {str(e)}")
+            logger.error("Error al mostrar estructura de la cadena: %s", e)
             return False
 
-    def obtener_estado_votacion_activa(self):
-        """Devuelve información sobre la votación activa."""
-        if not self.tema_activo:
+    def obtener_comprobantes(self, id_votante_hash, tema=None):
+        """
+        Devuelve los comprobantes de inclusión (voto + prueba de Merkle) de un votante,
+        opcionalmente filtrados por tema. Se localizan mediante el índice de comprobantes,
+        sin recorrer la cadena.
+        """
+        comprobantes = []
+        for index_bloque, posicion in self._indice_comprobantes().get(id_votante_hash, []):
+            bloque = self.cadena.cadena[index_bloque]
+            if tema is not None and bloque.tema_votacion != tema:
+                continue
+            comprobante = bloque.prueba_inclusion(posicion)
+            if bloque.version == Bloque.Bloque.VERSION_LEGADO:
+                # El hash v1 no se basa en la raíz de Merkle: la prueba no se puede enlazar con hash_actual
+                comprobante["prueba"] = None
+            comprobantes.append(comprobante)
+        return comprobantes
+
+    def obtener_estado_votacion_activa(self, tema=None):
+        """
+        Devuelve información sobre la votación activa del tema indicado (por defecto, la
+        iniciada más recientemente) y la lista de todos los temas con votación activa.
+        """
+        sesion = self.sesiones.get(tema if tema is not None else self.tema_activo)
+        if sesion is None:
             return None
-        return {
-            "tema_activo": self.tema_activo,
-            "candidatos": self.candidatos_votacion_activa,
-            "numero_votos_recibidos": len(self.votos_sesion_actual),
-            "numero_votantes_participantes": len(self.votantes_sesion_actual)
-        }
\ No newline at end of file
+        with sesion.lock:
+            estado = sesion.estado()
+        estado["sesiones_activas"] = list(self.sesiones)
+        return estado
+
+    def obtener_resumen_temas(self):
+        """
+        Devuelve, para cada tema con votos en la cadena o votación activa, sus estadísticas:
+        bloques, número de votos confirmados, rango de tiempo de los votos y candidatos.
+        Se responde desde el índice de temas, sin recorrer los votos de los bloques.
+        """
+        with self._lock:
+            resumen_temas = []
+            for tema, resumen in self.cadena.indice_temas.items():
+                resumen_temas.append({
+                    "tema": tema,
+                    "bloques": list(resumen["bloques"]),
+                    "numero_bloques": len(resumen["bloques"]),
+                    "numero_votos": resumen["numero_votos"],
+                    "primer_voto": resumen["primer_voto"],
+                    "ultimo_voto": resumen["ultimo_voto"],
+                    "candidatos": {id_c: self.candidatos_globales.get(id_c, f"ID Desconocido {id_c}")
+                                   for id_c in sorted(resumen["candidatos"], key=str)},
+                    "votacion_activa": tema in self.sesiones,
+                })
+            for tema in list(self.sesiones):
+                if tema not in self.cadena.indice_temas:
+                    resumen_temas.append({
+                        "tema": tema, "bloques": [], "numero_bloques": 0, "numero_votos": 0,
+                        "primer_voto": None, "ultimo_voto": None, "candidatos": {}, "votacion_activa": True,
+                    })
+            return resumen_temas
+
+    def obtener_sesiones_activas(self):
+        """Devuelve el estado de todas las votaciones activas, en orden de inicio."""
+        estados = []
+        for sesion in list(self.sesiones.values()):
+            with sesion.lock:
+                estados.append(sesion.estado())
+        return estados
+
+    def voto_pendiente(self, id_votante_hash, tema=None):
+        """Devuelve el tema de la votación activa en la que el votante tiene un voto pendiente, o None."""
+        for sesion in list(self.sesiones.values()):
+            if (tema is None or sesion.tema == tema) and id_votante_hash in sesion.votantes:
+                return sesion.tema
+        return None
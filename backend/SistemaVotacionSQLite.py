@@ -0,0 +1,403 @@
+import collections
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import AlmacenSQLite
+import Bloque
+import Cadena
+import Metricas
+import RegistroCandidatos
+import SesionVotacion
+import SistemaVotacion
+
+logger = logging.getLogger(__name__)
+
+
+class SistemaVotacionSQLite(SistemaVotacion.SistemaVotacion):
+    """
+    Sistema de votación cuyo estado (cadena, candidatos globales y votaciones activas con sus
+    votos pendientes) está en una base de datos SQLite compartida (ver AlmacenSQLite), de modo
+    que varios procesos (p.ej. los workers de gunicorn) sirven la misma elección.
+
+    Cada operación de escritura es una transacción en la base de datos: la aceptación de los
+    votos, el alta de candidatos y el sellado de bloques se serializan entre todos los procesos
+    y los votos duplicados se rechazan aunque lleguen a procesos distintos. La memoria de cada
+    proceso (cadena, índices y sesiones, con la misma estructura que en SistemaVotacion) es una
+    copia que refrescar() pone al día con los cambios confirmados por cualquiera de ellos;
+    las consultas se responden desde ella. La base de datos hace de diario de las votaciones
+    activas, por lo que no se usan los diarios ni la cadena binaria.
+    """
+
+    ARCHIVO_SQLITE = "blockchain_votacion.sqlite"
+    INTERVALO_REFRESCO = 0.5  # Segundos entre refrescos periódicos (para los eventos SSE de los cambios de otros procesos)
+
+    def __init__(self, ruta=None, intervalo_refresco=None, **opciones):
+        self.ruta_sqlite = ruta or self.ARCHIVO_SQLITE
+        self.intervalo_refresco = intervalo_refresco if intervalo_refresco is not None else self.INTERVALO_REFRESCO
+        self._lock_refresco = threading.Lock()  # Se adquiere antes que los de las sesiones y el global
+        self._version_almacen = None  # Versión de la base de datos ya incorporada a la memoria
+        self._ultimo_voto = 0  # ID del último voto ya incorporado
+        super().__init__(**opciones)
+        if self.intervalo_refresco > 0:
+            hilo = threading.Thread(target=self._refrescar_periodicamente, name="refresco-votacion", daemon=True)
+            hilo.start()
+
+    def _cargar_estado(self):
+        """Abre la base de datos (migrando a ella la cadena de versiones anteriores si es nueva) y la carga."""
+        # Con un fsync por voto en el diario, también un fsync del WAL de SQLite en cada transacción
+        sincronizacion = "FULL" if self.votos_por_sincronizacion == 1 else "NORMAL"
+        self.almacen_binario = self.almacen  # Solo para migrar una cadena binaria existente
+        self.almacen = AlmacenSQLite.AlmacenSQLite(self.ruta_sqlite, sincronizacion)
+        if self.almacen.inicializar(self._datos_iniciales):
+            logger.info("Base de datos %s creada.", self.ruta_sqlite)
+        self.id_instancia = self.almacen.identificador()
+        self.cadena = Cadena.Cadena()
+        self.cadena.cadena = []
+        self.refrescar()
+        if os.path.isdir(self.DIRECTORIO_DIARIOS) and any(nombre.endswith(".diario") for nombre in os.listdir(self.DIRECTORIO_DIARIOS)):
+            logger.warning("Los diarios de %s no se migran a %s: finalice esas votaciones sin la base de datos compartida.",
+                           self.DIRECTORIO_DIARIOS, self.ruta_sqlite)
+
+    def _datos_iniciales(self):
+        """Bloques y candidatos de la cadena de versiones anteriores (binaria, log o JSON), o un génesis nuevo."""
+        if self.almacen_binario.existe():
+            datos = self.almacen_binario.cargar()
+        elif self.almacen_log.existe():
+            datos = self.almacen_log.cargar()
+        elif os.path.exists(self.ARCHIVO_DATOS):
+            with open(self.ARCHIVO_DATOS, "r", encoding="utf-8") as archivo:
+                datos = json.load(archivo)
+        else:
+            datos = {}
+        registro = RegistroCandidatos.RegistroCandidatos(self.ARCHIVO_CANDIDATOS)
+        registro.cargar()
+        registro.incorporar(datos.get("candidatos_globales", {}), datos.get("ultimo_id_candidato_global", -1))
+        bloques = [bloque if isinstance(bloque, Bloque.Bloque) else self._deserializar_bloque(bloque) for bloque in datos.get("bloques", [])]
+        if bloques:
+            logger.info("Migrando a la base de datos %s bloques y %s candidatos de la cadena existente.", len(bloques), len(registro.candidatos))
+        return bloques or [Bloque.Bloque.crear_bloque_genesis()], registro.candidatos, registro.ultimo_id
+
+    # --- Sincronización de la memoria del proceso con la base de datos ---
+
+    def refrescar(self):
+        """
+        Incorpora a la memoria de este proceso los cambios confirmados en la base de datos desde
+        el último refresco (por cualquier proceso): candidatos, bloques nuevos (validados como los
+        de la replicación), votos pendientes y votaciones iniciadas o finalizadas. Si no hay
+        cambios solo cuesta una consulta. Las operaciones de escritura lo llaman al terminar; la
+        API lo llama antes de cada petición.
+        """
+        with self._lock_refresco:
+            punta = self.cadena.peek()
+            sesiones = {sesion.id_sesion: sesion for sesion in list(self.sesiones.values())}
+            cambios = self.almacen.cambios(self._version_almacen, (punta.index, punta.hash_actual) if punta else None,
+                                           self._ultimo_voto, self.ultimo_id_candidato_global, sesiones)
+            if cambios is None:
+                return
+            temas = set()
+            if cambios["completo"]:
+                with self._lock:
+                    self.registro_candidatos.vaciar()
+                    self.sesiones = {}
+                    self.cadena.cadena = [bloque for bloque, _ in cambios["bloques"]]
+                    self.fragmentos.vaciar()
+                    self._reconstruir_indices()
+                sesiones = {}
+                temas.add(None)
+            with self._lock:
+                self.registro_candidatos.incorporar(cambios["candidatos"], cambios["ultimo_id_candidato"])
+
+            for id_sesion, sesion in sesiones.items():
+                votos = cambios["votos"].get(id_sesion)
+                candidatos = cambios["candidatos_sesion"].get(id_sesion, {})
+                if votos or len(candidatos) != len(sesion.candidatos):
+                    with sesion.lock:
+                        sesion.candidatos.update(candidatos)
+                        sesion.registrar_votos(votos or [])
+                    temas.add(sesion.tema)
+
+            if not cambios["completo"]:
+                for bloque, id_sesion in cambios["bloques"]:
+                    sesion = sesiones.get(id_sesion)
+                    # Mismo orden de bloqueo que al sellar: los votos pasan de pendientes a la cadena a la vez
+                    with sesion.lock if sesion is not None else contextlib.nullcontext():
+                        with self._lock:
+                            if not self.cadena.incorporar_bloque(bloque):
+                                logger.error("El bloque %s de la base de datos no es válido; no se incorpora.", bloque.index)
+                                break
+                            self._indexar_bloque(bloque)
+                            if sesion is not None:
+                                sesion.retirar_sellados(len(bloque.votos))
+                    temas.add(bloque.tema_votacion)
+
+            for id_sesion, sesion in sesiones.items():
+                if id_sesion not in cambios["sesiones"]:
+                    with sesion.lock:
+                        with self._lock:
+                            del self.sesiones[sesion.tema]
+                    temas.add(None)
+            for id_sesion, (pendientes, sellados) in cambios["nuevas"].items():
+                tema, timestamp_inicio = cambios["sesiones"][id_sesion]
+                sesion = SesionVotacion.SesionVotacion(tema, None, timestamp_inicio, id_sesion)
+                sesion.candidatos.update(cambios["candidatos_sesion"][id_sesion])
+                sesion.registrar_votos(pendientes)
+                sesion.votos_sellados = sellados
+                with self._lock:
+                    self.sesiones[tema] = sesion
+                temas.add(None)
+
+            self._version_almacen = cambios["version"]
+            self._ultimo_voto = cambios["ultimo_voto"]
+            self._bloques_guardados = len(self.cadena.cadena)
+            self.ultimo_timestamp_archivo = cambios["version"]
+        for tema in temas:
+            self._notificar_cambio(tema)
+
+    def _refrescar_periodicamente(self):
+        while True:
+            time.sleep(self.intervalo_refresco)
+            try:
+                self.refrescar()
+            except Exception as e:
+                logger.error("Error al refrescar el estado desde %s: %s", self.ruta_sqlite, e)
+
+    def marca_archivo(self):
+        # En modo WAL el archivo de la base de datos solo cambia en los checkpoints: se usa su contador de versión
+        return self.almacen.version()
+
+    # --- Persistencia: todo se escribe en la base de datos al confirmar cada operación ---
+
+    def guardar_datos(self):
+        return True
+
+    def _guardar_candidatos(self):
+        return True
+
+    def guardar_instantanea(self):
+        return False  # Al arrancar se lee la base de datos; no hay instantánea
+
+    def _sincronizar_diarios(self):
+        pass
+
+    # --- Operaciones de escritura ---
+
+    def iniciar_votacion(self, tema):
+        """Inicia una nueva sesión de votación para un tema específico."""
+        if not tema:
+            logger.error("Se requiere un tema para iniciar la votación.")
+            return False
+        if self.almacen.iniciar_sesion(tema, time.time()) is None:
+            logger.error("Ya hay una votación activa para el tema '%s'. Finalícela primero.", tema)
+            return False
+        self.refrescar()
+        logger.info("Votación iniciada para el tema: '%s' (%s votaciones activas)", tema, len(self.sesiones))
+        return True
+
+    def registrar_candidato_global(self, nombre):
+        """Registra un candidato globalmente si no existe."""
+        if not nombre:
+            return None
+        id_candidato, _ = self.almacen.registrar_candidato(nombre)
+        self.refrescar()
+        logger.info("Candidato '%s' registrado globalmente con ID %s.", nombre, id_candidato)
+        return id_candidato
+
+    def agregar_candidato_a_votacion(self, nombre_candidato, tema=None):
+        """Agrega un candidato a la votación activa del tema indicado."""
+        sesion = self._obtener_sesion(tema)
+        if sesion is None:
+            logger.error("No hay ninguna votación activa para agregar candidatos.")
+            return False
+        if not nombre_candidato:
+            logger.error("Se requiere un nombre para el candidato.")
+            return False
+        resultado = self.almacen.agregar_candidato_sesion(sesion.id_sesion, nombre_candidato)
+        if resultado is None:
+            logger.error("La votación '%s' ya ha finalizado.", sesion.tema)
+            return False
+        id_candidato, nombre_candidato, nuevo = resultado
+        self.refrescar()
+        if nuevo:
+            logger.info("Candidato '%s' (ID: %s) añadido a la votación activa '%s'.", nombre_candidato, id_candidato, sesion.tema)
+        else:
+            logger.info("Candidato '%s' (ID: %s) ya está añadido a la votación activa '%s'.", nombre_candidato, id_candidato, sesion.tema)
+        return id_candidato
+
+    def emitir_voto_sesion(self, id_votante_externo, id_candidato, tema=None):
+        """
+        Emite un voto para la votación activa del tema indicado. La comprobación del candidato y
+        de los votos anteriores del votante y la aceptación son una única transacción.
+        """
+        inicio = time.perf_counter()
+        sesion = self._obtener_sesion(tema)
+        if sesion is None:
+            logger.info("No hay ninguna votación activa para emitir votos.")
+            return self._voto_rechazado(inicio, "sin_votacion")
+        if not id_votante_externo:
+            logger.info("Se requiere la identificación del votante.")
+            return self._voto_rechazado(inicio, "sin_votante")
+        id_votante_hash = hashlib.sha256(str(id_votante_externo).encode()).hexdigest()
+        # Los votos de bloques guardados como JSON (formatos antiguos) no están en la tabla de votos
+        if id_votante_hash in self._votantes_confirmados(sesion.tema):
+            logger.info("El votante con ID (hash) %s... ya ha votado anteriormente para el tema '%s'.", id_votante_hash[:8], sesion.tema)
+            return self._voto_rechazado(inicio, "ya_voto_cadena")
+
+        motivos = self.almacen.emitir_votos(sesion.id_sesion, [(id_votante_hash, id_candidato, time.time())])
+        if motivos is None:
+            logger.info("La votación '%s' ya ha finalizado.", sesion.tema)
+            return self._voto_rechazado(inicio, "votacion_finalizada")
+        if motivos[0] is not None:
+            logger.info("Voto del votante %s... para '%s' rechazado: %s.", id_votante_hash[:8], sesion.tema, motivos[0])
+            return self._voto_rechazado(inicio, motivos[0])
+
+        self.refrescar()
+        self._sellar_si_completo(sesion)
+        logger.debug("Voto para '%s' por votante %s... registrado (pendiente de finalizar votación).", sesion.tema, id_votante_hash[:8])
+        Metricas.incrementar("votacion_votos_aceptados_total")
+        Metricas.observar("votacion_voto_segundos", time.perf_counter() - inicio, resultado="aceptado")
+        return True
+
+    def emitir_votos_lote(self, votos, tema=None):
+        """
+        Emite un lote de votos [(id_votante_externo, id_candidato), ...] en la votación activa del
+        tema, en una sola transacción. Devuelve el motivo de rechazo de cada voto (None si se
+        aceptó), o None si no hay ninguna votación activa para el tema.
+        """
+        inicio = time.perf_counter()
+        pares = [(hashlib.sha256(str(id_votante_externo).encode()).hexdigest() if id_votante_externo else None,
+                  str(id_candidato) if id_candidato is not None else None)
+                 for id_votante_externo, id_candidato in votos]
+        resultados = [None] * len(pares)
+
+        sesion = self._obtener_sesion(tema)
+        if sesion is None:
+            logger.info("No hay ninguna votación activa para emitir votos.")
+            return None
+
+        votantes_confirmados = self._votantes_confirmados(sesion.tema)
+        vistos = set()
+        posiciones = []
+        ahora = time.time()
+        for posicion, (id_votante_hash, _) in enumerate(pares):
+            if not id_votante_hash:
+                resultados[posicion] = "sin_votante"
+            elif id_votante_hash in votantes_confirmados:
+                resultados[posicion] = "ya_voto_cadena"
+            elif id_votante_hash in vistos:
+                resultados[posicion] = "duplicado_lote"
+            else:
+                vistos.add(id_votante_hash)
+                posiciones.append(posicion)
+        motivos = self.almacen.emitir_votos(sesion.id_sesion, [pares[posicion] + (ahora,) for posicion in posiciones])
+        if motivos is None:
+            logger.info("La votación '%s' ya ha finalizado.", sesion.tema)
+            return None
+        for posicion, motivo in zip(posiciones, motivos):
+            resultados[posicion] = motivo
+        aceptados = motivos.count(None)
+        if aceptados:
+            self.refrescar()
+            self._sellar_si_completo(sesion)
+
+        rechazos = collections.Counter(motivo for motivo in resultados if motivo is not None)
+        for motivo, numero in rechazos.items():
+            Metricas.incrementar("votacion_votos_rechazados_total", numero, motivo=motivo)
+        Metricas.incrementar("votacion_votos_aceptados_total", aceptados)
+        Metricas.observar("votacion_lote_segundos", time.perf_counter() - inicio)
+        logger.info("Lote de %s votos para '%s': %s aceptados y %s rechazados.",
+                    len(pares), sesion.tema, aceptados, len(pares) - aceptados)
+        return resultados
+
+    def _sellar_votos_pendientes(self, sesion, numero=None, motivo="tamano"):
+        """
+        Sella en un bloque los 'numero' primeros votos pendientes de la sesión (todos por defecto)
+        sin finalizarla. Devuelve False si la sesión ya ha finalizado.
+        """
+        resultado = self.almacen.sellar(sesion.id_sesion, numero)
+        if resultado is None:
+            return False
+        bloque, _ = resultado
+        self.refrescar()
+        if bloque is not None:
+            Metricas.incrementar("votacion_sellados_total", motivo=motivo)
+            logger.info("Votación '%s': %s votos sellados en el bloque %s (%s sellados en total, %s pendientes).",
+                        sesion.tema, len(bloque.votos), bloque.index, sesion.votos_sellados, len(sesion.votos))
+        return True
+
+    def _sellar_periodicamente(self):
+        """Sella los votos pendientes de las sesiones cuyo último sellado es anterior a intervalo_sellado."""
+        while True:
+            time.sleep(min(self.intervalo_sellado, 1))
+            ahora = time.time()
+            for sesion in list(self.sesiones.values()):
+                if not sesion.votos or ahora - sesion.ultimo_sellado < self.intervalo_sellado:
+                    continue
+                try:
+                    self._sellar_votos_pendientes(sesion, motivo="tiempo")
+                except Exception as e:
+                    logger.error("Error en el sellado periódico de '%s': %s", sesion.tema, e)
+
+    def finalizar_votacion(self, tema=None):
+        """Finaliza la votación activa del tema indicado, sella sus votos pendientes y la cierra."""
+        sesion = self._obtener_sesion(tema)
+        if sesion is None:
+            logger.error("No hay ninguna votación activa para finalizar.")
+            return False
+        resultado = self.almacen.sellar(sesion.id_sesion, finalizar=True)
+        if resultado is None:
+            logger.error("La votación '%s' ya ha finalizado.", sesion.tema)
+            return False
+        bloque, con_votos = resultado
+        self.refrescar()
+        if not con_votos:
+            logger.warning("No hay votos registrados para la votación '%s'. No se creará un bloque.", sesion.tema)
+            return False
+        if bloque is not None:
+            logger.info("Bloque %s para '%s' añadido a la blockchain.", bloque.index, sesion.tema)
+        return True
+
+    # --- Replicación entre nodos (ver Replicador) ---
+
+    def incorporar_candidatos(self, candidatos, ultimo_id=-1):
+        """Añade a la base de datos los candidatos globales de otro nodo que aún no estaban."""
+        nuevos = self.almacen.incorporar_candidatos(candidatos, ultimo_id)
+        self.refrescar()
+        return nuevos
+
+    def incorporar_bloques(self, bloques):
+        """
+        Añade a la base de datos bloques sellados en otro nodo, validando cada uno con las reglas
+        de Cadena.validar_bloque. Se detiene en el primer bloque que no encadena o cuyo hash no
+        coincide. Devuelve el número de bloques aceptados.
+        """
+        self.refrescar()
+        punta = self.cadena.peek()
+        genesis = None
+        validos = []
+        for bloque in bloques:
+            if bloque.index == 0 and punta.index == 0 and bloque.hash_anterior == "0":
+                genesis = bloque  # Génesis distinto y aún sin bloques propios: se adopta
+            elif (bloque.index != punta.index + 1 or bloque.hash_anterior != punta.hash_actual
+                  or bloque.calcular_hash() != bloque.hash_actual):
+                logger.error("Bloque %s recibido rechazado: no encadena con la punta local o su hash no es válido.", bloque.index)
+                break
+            else:
+                validos.append(bloque)
+            punta = bloque
+        if genesis is not None:
+            self.almacen.compactar([genesis] + validos)
+            aceptados = 1 + len(validos)
+        else:
+            aceptados = self.almacen.anexar(validos)
+        if aceptados:
+            Metricas.incrementar("votacion_replicacion_bloques_total", aceptados)
+        self.refrescar()
+        return aceptados
+
+    def verificar_integridad_cadena(self, completa=False, workers=None):
+        self.refrescar()
+        return super().verificar_integridad_cadena(completa, workers)
@@ -0,0 +1,182 @@
+import collections
+import json
+import math
+import struct
+import sys
+from array import array
+import Merkle
+
+TAM_HASH_VOTANTE = 32  # Bytes del SHA-256 binario de la identificación del votante
+
+_empaquetar_timestamp = struct.Struct(">d").pack
+_empaquetar_longitud = struct.Struct(">I").pack
+_PREFIJO_VOTANTE = _empaquetar_longitud(2 * TAM_HASH_VOTANTE)  # Longitud del hash en hexadecimal
+
+
+class VotosColumnares:
+    """
+    Votos confirmados de un bloque almacenados por columnas: los hashes de los votantes como
+    digests binarios en un buffer contiguo, los IDs de candidato en un array de enteros, los
+    timestamps en un array('d') y el tema una sola vez. Ocupa unos 44 bytes por voto frente a
+    varios cientos de un diccionario con cuatro cadenas.
+
+    Se comporta como una lista de solo lectura de diccionarios: cada voto se construye al
+    acceder a él con el mismo contenido, tipos y orden de claves que el original, por lo que
+    la serialización, str() (hash v1) y la raíz de Merkle no cambian.
+    """
+
+    __slots__ = ("tema", "timestamps", "votantes", "candidatos")
+
+    def __init__(self, tema, timestamps, votantes, candidatos):
+        self.tema = tema
+        self.timestamps = timestamps  # array('d') (o vista equivalente sobre un archivo mapeado)
+        self.votantes = votantes  # bytearray de TAM_HASH_VOTANTE bytes por voto
+        self.candidatos = candidatos  # array('I') con los IDs de candidato
+
+    @classmethod
+    def desde_votos(cls, votos, tema):
+        """
+        Devuelve la representación columnar de los votos o None si alguno no tiene el formato
+        habitual (claves en orden, timestamp float, hash SHA-256 en hexadecimal, ID de candidato
+        numérico y el tema del bloque), en cuyo caso hay que conservar los diccionarios.
+        """
+        timestamps = array("d")
+        votantes = bytearray()
+        candidatos = array("I")
+        for voto in votos:
+            if type(voto) is not dict or tuple(voto) != Merkle.CAMPOS_VOTO or voto["tema_votacion"] != tema or type(voto["timestamp"]) is not float:
+                return None
+            id_votante_hash = voto["id_votante_hash"]
+            id_candidato = voto["id_candidato"]
+            if (type(id_votante_hash) is not str or len(id_votante_hash) != 2 * TAM_HASH_VOTANTE
+                    or type(id_candidato) is not str or not id_candidato.isdecimal() or not id_candidato.isascii()):
+                return None
+            try:
+                digest = bytes.fromhex(id_votante_hash)
+                id_numerico = int(id_candidato)
+            except (ValueError, OverflowError):
+                return None
+            if digest.hex() != id_votante_hash or str(id_numerico) != id_candidato or id_numerico >= 2 ** 32:
+                return None  # No se reconstruiría exactamente igual (mayúsculas, ceros a la izquierda...)
+            timestamps.append(voto["timestamp"])
+            votantes += digest
+            candidatos.append(id_numerico)
+        return cls(sys.intern(tema), timestamps, votantes, candidatos)
+
+    def __reduce__(self):
+        # Las columnas pueden ser vistas sobre el archivo de la cadena: al serializar se copian
+        return (VotosColumnares, (self.tema, array("d", self.timestamps), bytes(self.votantes), array("I", self.candidatos)))
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def _voto(self, i):
+        inicio = i * TAM_HASH_VOTANTE
+        return {
+            "timestamp": self.timestamps[i],
+            "id_votante_hash": self.votantes[inicio:inicio + TAM_HASH_VOTANTE].hex(),
+            "id_candidato": str(self.candidatos[i]),
+            "tema_votacion": self.tema
+        }
+
+    def __getitem__(self, posicion):
+        if isinstance(posicion, slice):
+            return [self._voto(i) for i in range(*posicion.indices(len(self)))]
+        if posicion < 0:
+            posicion += len(self)
+        if not 0 <= posicion < len(self):
+            raise IndexError("índice de voto fuera de rango")
+        return self._voto(posicion)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._voto(i)
+
+    def __eq__(self, otro):
+        if isinstance(otro, (list, VotosColumnares)):
+            return len(self) == len(otro) and list(self) == list(otro)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def hashes_votantes(self):
+        """Itera los hashes de los votantes en hexadecimal, sin construir los votos."""
+        votantes = memoryview(self.votantes)
+        for inicio in range(0, len(votantes), TAM_HASH_VOTANTE):
+            yield votantes[inicio:inicio + TAM_HASH_VOTANTE].hex()
+
+    def recuento(self):
+        """{id_candidato: votos} contado directamente sobre el array de IDs."""
+        return {str(id_candidato): votos for id_candidato, votos in collections.Counter(self.candidatos).items()}
+
+    def codificaciones(self):
+        """Itera Merkle.codificar_voto() de cada voto, generado directamente desde las columnas."""
+        sufijos = {}  # Codificación de (candidato, tema), común a muchos votos
+        tema = Merkle.con_longitud(self.tema)
+        votantes = memoryview(self.votantes)
+        for i, (timestamp, id_candidato) in enumerate(zip(self.timestamps, self.candidatos)):
+            sufijo = sufijos.get(id_candidato)
+            if sufijo is None:
+                sufijo = sufijos[id_candidato] = Merkle.con_longitud(str(id_candidato)) + tema
+            inicio = i * TAM_HASH_VOTANTE
+            yield b"".join((
+                b"V",
+                _empaquetar_timestamp(timestamp),
+                _PREFIJO_VOTANTE,
+                votantes[inicio:inicio + TAM_HASH_VOTANTE].hex().encode("ascii"),
+                sufijo,
+            ))
+
+    def a_json(self):
+        """
+        Lista de votos en JSON compacto (como json.dumps(list(votos), separators=(",", ":"),
+        ensure_ascii=False), en UTF-8), generada desde las columnas sin construir cada voto.
+        """
+        if not all(map(math.isfinite, self.timestamps)):
+            return json.dumps(list(self), separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        sufijos = {}  # Final de cada voto para (candidato, tema), común a muchos votos
+        tema = json.dumps(self.tema, ensure_ascii=False)
+        votantes = bytes(self.votantes).hex()
+        partes = []
+        for i, (timestamp, id_candidato) in enumerate(zip(self.timestamps, self.candidatos)):
+            sufijo = sufijos.get(id_candidato)
+            if sufijo is None:
+                sufijo = sufijos[id_candidato] = f'","id_candidato":"{id_candidato}","tema_votacion":{tema}}}'
+            inicio = i * 2 * TAM_HASH_VOTANTE
+            partes.append(f'{{"timestamp":{timestamp!r},"id_votante_hash":"{votantes[inicio:inicio + 2 * TAM_HASH_VOTANTE]}{sufijo}')
+        return ("[" + ",".join(partes) + "]").encode("utf-8")
+
+
+def compactar(votos, tema):
+    """Devuelve los votos en formato columnar si es posible; si no (o si no hay votos), tal cual."""
+    if not votos or isinstance(votos, VotosColumnares):
+        return votos
+    return VotosColumnares.desde_votos(votos, tema) or votos
+
+
+def hashes_votantes(votos):
+    """Hashes de los votantes de una lista de votos, columnar o de diccionarios."""
+    if isinstance(votos, VotosColumnares):
+        return votos.hashes_votantes()
+    return (voto.get("id_votante_hash") for voto in votos)
+
+
+def recuento_candidatos(votos):
+    """{id_candidato: votos} de una lista de votos, columnar o de diccionarios."""
+    if isinstance(votos, VotosColumnares):
+        return votos.recuento()
+    return dict(collections.Counter(voto.get("id_candidato") for voto in votos))
+
+
+def rango_timestamps(votos, por_defecto):
+    """(mínimo, máximo) de los timestamps de los votos ('por_defecto' si falta alguno o no hay votos)."""
+    if isinstance(votos, VotosColumnares):
+        timestamps = votos.timestamps
+    else:
+        timestamps = [voto.get("timestamp", por_defecto) for voto in votos]
+    if not timestamps:
+        return por_defecto, por_defecto
+    return min(timestamps), max(timestamps)
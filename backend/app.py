@@ -1,7 +1,23 @@
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, g, request, jsonify, render_template, stream_with_context
 from flask_cors import CORS
 import SistemaVotacion
+import SistemaVotacionSQLite
+import CacheRespuestas
+import Metricas
+import PublicadorEventos
+import Replicador
+import argparse
+import functools
+import hashlib
+import json
+import logging
 import os
+import time
+
+# Nivel de los mensajes del sistema (DEBUG, INFO, WARNING, ERROR), configurable con la variable NIVEL_LOG
+logging.basicConfig(level=os.environ.get("NIVEL_LOG", "INFO").upper(),
+                    format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger(__name__)
 
 # Determinar la ruta absoluta al directorio del frontend
 frontend_folder = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'frontend'))
@@ -10,26 +26,184 @@ static_folder = os.path.join(frontend_folder, 'static')
 
 # Verificar si las carpetas existen
 if not os.path.isdir(template_folder):
-    print(f"Error: La carpeta de plantillas no existe en {template_folder}")
+    logger.error("La carpeta de plantillas no existe en %s", template_folder)
     # Podrías decidir salir o continuar sin plantillas
 if not os.path.isdir(static_folder):
-    print(f"Error: La carpeta de archivos estáticos no existe en {static_folder}")
+    logger.error("La carpeta de archivos estáticos no existe en %s", static_folder)
     # Podrías decidir salir o continuar sin archivos estáticos
 
 app = Flask(__name__, template_folder=template_folder, static_folder=static_folder)
 CORS(app) # Habilitar CORS para todas las rutas
 
-# Crear una instancia única del sistema de votación
-sistema_votacion = SistemaVotacion.SistemaVotacion()
+MAXIMO_VOTOS_LOTE = 100000  # Votos admitidos en una sola petición a /votacion/votar/lote
+TIPOS_NDJSON = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+# Caché de respuestas de consulta ya serializadas (ver respuesta_cacheable)
+MAXIMO_RESPUESTAS_CACHE = 256
+MAXIMO_BYTES_CACHE = 64 * 1024 * 1024
+
+def leer_argumentos(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor de la API de votación.")
+    parser.add_argument("--puerto", type=int, default=5001)
+    parser.add_argument("--directorio", help="Directorio de datos del nodo (por defecto, el directorio actual)")
+    parser.add_argument("--primario", help="URL de un nodo primario: este nodo es una réplica de solo lectura de su cadena")
+    parser.add_argument("--intervalo-replicacion", type=float, default=1.0, help="Segundos entre sincronizaciones con el primario")
+    # Con gunicorn no se leen argumentos: la base de datos se indica con la variable VOTACION_SQLITE
+    parser.add_argument("--sqlite", default=os.environ.get("VOTACION_SQLITE"),
+                        help="Base de datos SQLite compartida por varios procesos (p.ej. los workers de gunicorn)")
+    return parser.parse_args(argv)
+
+# Al importar el módulo (p.ej. desde el benchmark) no se leen los argumentos del proceso
+argumentos = leer_argumentos(None if __name__ == '__main__' else [])
+if argumentos.directorio:
+    # SistemaVotacion guarda sus archivos en el directorio actual: un directorio por nodo
+    os.makedirs(argumentos.directorio, exist_ok=True)
+    os.chdir(argumentos.directorio)
+
+# Crear una instancia única del sistema de votación (por proceso; con SQLite todos comparten el estado)
+if argumentos.sqlite:
+    sistema_votacion = SistemaVotacionSQLite.SistemaVotacionSQLite(argumentos.sqlite)
+else:
+    sistema_votacion = SistemaVotacion.SistemaVotacion()
+
+# En una réplica, la cadena se copia del primario y las rutas de escritura se rechazan
+replicador = None
+if argumentos.primario:
+    replicador = Replicador.Replicador(sistema_votacion, argumentos.primario, argumentos.intervalo_replicacion)
+
+# Publicador de eventos SSE: el sistema le avisa de los cambios y él recalcula cada vista
+# una sola vez para todos sus suscriptores, como mucho cada INTERVALO_EVENTOS segundos
+INTERVALO_EVENTOS = 0.5
+publicador_eventos = PublicadorEventos.PublicadorEventos(INTERVALO_EVENTOS)
+publicador_eventos.registrar_canal("resultados", lambda tema: calcular_resultados(tema))
+publicador_eventos.registrar_canal("activa", lambda tema: sistema_votacion.obtener_estado_votacion_activa(tema))
+sistema_votacion.observadores.append(publicador_eventos.notificar)
+
+# Indicadores calculados al exportar las métricas (siempre sobre la instancia actual)
+Metricas.registrar_indicador("votacion_sesiones_activas", lambda: len(sistema_votacion.sesiones),
+                             "Votaciones activas en este momento.")
+Metricas.registrar_indicador("votacion_votos_pendientes", lambda: sum(len(sesion.votos) for sesion in list(sistema_votacion.sesiones.values())),
+                             "Votos aceptados aún no sellados en un bloque.")
+Metricas.registrar_indicador("votacion_bloques", lambda: len(sistema_votacion.cadena.cadena),
+                             "Bloques de la cadena, incluido el génesis.")
+if replicador is not None:
+    Metricas.registrar_indicador("votacion_replicacion_retraso_bloques", lambda: replicador.estado()["retraso_bloques"] or 0,
+                                 "Bloques del primario que aún no se han copiado en esta réplica.")
+
+@app.before_request
+def iniciar_medicion_peticion():
+    g.inicio_peticion = time.perf_counter()
+
+@app.before_request
+def refrescar_estado_compartido():
+    """Con la base de datos compartida, incorpora los cambios de los demás procesos antes de responder."""
+    if argumentos.sqlite:
+        sistema_votacion.refrescar()
+
+@app.before_request
+def rechazar_escrituras_en_replica():
+    """Una réplica solo sirve consultas; los votos y las votaciones se gestionan en el primario."""
+    if replicador is not None and request.method not in ('GET', 'HEAD', 'OPTIONS'):
+        return jsonify({"error": "Este nodo es una réplica de solo lectura; envíe la petición al nodo primario",
+                        "primario": replicador.url_primario}), 403
+
+@app.after_request
+def registrar_medicion_peticion(respuesta):
+    """Observa la duración de cada petición, agrupada por la regla de la ruta (no por la URL concreta)."""
+    inicio = g.pop('inicio_peticion', None)
+    if inicio is not None:
+        ruta = request.url_rule.rule if request.url_rule is not None else "sin_ruta"
+        Metricas.observar("http_peticion_segundos", time.perf_counter() - inicio,
+                          ruta=ruta, metodo=request.method, estado=respuesta.status_code)
+    return respuesta
+
+# --- Caché de respuestas de consulta ---
+
+cache_respuestas = CacheRespuestas.CacheRespuestas(MAXIMO_RESPUESTAS_CACHE, MAXIMO_BYTES_CACHE)
+
+def respuesta_cacheable(version):
+    """
+    Decorador de rutas de consulta. version() devuelve aquello de lo que depende la respuesta
+    (p.ej. la punta de la cadena), o None si no se debe cachear. Con ello, la instancia del
+    sistema, la ruta y la consulta se calcula un ETag fuerte: si coincide con If-None-Match
+    se responde 304 sin ejecutar la ruta y, si no, se reutiliza el cuerpo ya serializado
+    mientras la versión no cambie (caché LRU acotada, ver CacheRespuestas).
+    """
+    def decorador(vista):
+        @functools.wraps(vista)
+        def envoltura(*args, **kwargs):
+            estado = version() if request.method in ('GET', 'HEAD') else None
+            if estado is None:
+                return vista(*args, **kwargs)
+            ruta = request.url_rule.rule
+            consulta = tuple(sorted(request.args.items(multi=True)))
+            etag = hashlib.sha256(repr((sistema_votacion.id_instancia, request.path, consulta, estado)).encode("utf-8")).hexdigest()[:32]
+            if request.if_none_match.contains_weak(etag):
+                Metricas.incrementar("http_cache_total", ruta=ruta, resultado="no_modificado")
+                respuesta = Response(status=304)
+            else:
+                entrada = cache_respuestas.obtener((request.path, consulta), etag)
+                if entrada is not None:
+                    Metricas.incrementar("http_cache_total", ruta=ruta, resultado="acierto")
+                    _, cuerpo, codigo, tipo = entrada
+                    respuesta = Response(cuerpo, codigo, mimetype=tipo)
+                else:
+                    Metricas.incrementar("http_cache_total", ruta=ruta, resultado="fallo")
+                    respuesta = app.make_response(vista(*args, **kwargs))
+                    if respuesta.status_code != 200:
+                        return respuesta
+                    if not respuesta.is_streamed:  # De las respuestas en streaming solo se usa el ETag
+                        cache_respuestas.guardar((request.path, consulta), etag, respuesta.get_data(), respuesta.status_code, respuesta.mimetype)
+            respuesta.set_etag(etag)
+            respuesta.headers["Cache-Control"] = "no-cache"  # El navegador puede guardarla, pero revalidando con el ETag
+            return respuesta
+        return envoltura
+    return decorador
+
+def version_cadena():
+    return sistema_votacion.cadena.peek().hash_actual
+
+def version_resultados():
+    # Los resultados incluyen los votos pendientes de las votaciones activas y los nombres de los candidatos
+    return (version_cadena(), sistema_votacion.version_pendientes, sistema_votacion.registro_candidatos.version)
+
+def version_candidatos():
+    return sistema_votacion.registro_candidatos.version
+
+def version_verificacion():
+    # La auditoría completa siempre se ejecuta; la incremental depende también de si el archivo ha cambiado
+    if request.args.get('modo') == 'completo':
+        return None
+    try:
+        return (version_cadena(), sistema_votacion.marca_archivo())
+    except OSError:
+        return None
 
 # --- Rutas para la Gestión de la Votación Activa ---
 
+def resolver_tema_sesion(data):
+    """
+    Obtiene el tema de la votación activa sobre la que actúa la petición: el campo 'tema'
+    del JSON o el parámetro ?tema=. Si no se indica y solo hay una votación activa, se usa ésa.
+    Devuelve (tema, None) o (None, respuesta_de_error).
+    """
+    tema = (data or {}).get('tema') or request.args.get('tema')
+    if tema:
+        if tema not in sistema_votacion.sesiones:
+            return None, (jsonify({"error": f"No hay ninguna votación activa para el tema '{tema}'"}), 404)
+        return tema, None
+    temas_activos = list(sistema_votacion.sesiones)
+    if not temas_activos:
+        return None, (jsonify({"error": "No hay ninguna votación activa"}), 400)
+    if len(temas_activos) > 1:
+        return None, (jsonify({"error": "Hay varias votaciones activas; indique el campo 'tema'", "sesiones_activas": temas_activos}), 400)
+    return temas_activos[0], None
+
 @app.route('/votacion/iniciar', methods=['POST'])
 def iniciar_votacion_api():
     """Inicia una nueva sesión de votación con un tema, verificando la integridad primero."""
     # Verificar la integridad de la cadena antes de iniciar una nueva votación
     if not sistema_votacion.verificar_integridad_cadena():
-        print("Error de integridad detectado. Cancelando inicio de votación.")
+        logger.error("Error de integridad detectado. Cancelando inicio de votación.")
         return jsonify({"error": "Error de integridad de la blockchain detectado. No se puede iniciar una nueva votación."}), 500 # Internal Server Error
 
     # Si la cadena es válida, proceder a iniciar la votación
@@ -41,26 +215,28 @@ def iniciar_votacion_api():
     if sistema_votacion.iniciar_votacion(tema):
         return jsonify({"mensaje": f"Votación iniciada para el tema: '{tema}'"}), 200
     else:
-        return jsonify({"error": "No se pudo iniciar la votación (verifique si ya hay una activa)"}), 409 # Conflict
+        return jsonify({"error": f"No se pudo iniciar la votación (verifique si ya hay una activa para el tema '{tema}')"}), 409 # Conflict
 
 @app.route('/votacion/candidato', methods=['POST'])
 def agregar_candidato_api():
-    """Agrega un candidato a la votación activa."""
-    if not sistema_votacion.tema_activo:
-         return jsonify({"error": "No hay ninguna votación activa"}), 400
-
+    """Agrega un candidato a una votación activa (campo 'tema' si hay varias)."""
     data = request.get_json()
+    tema, error = resolver_tema_sesion(data)
+    if error:
+        return error
+
     nombre_candidato = data.get('nombre')
     if not nombre_candidato:
         return jsonify({"error": "Se requiere el campo 'nombre' del candidato"}), 400
 
-    id_candidato = sistema_votacion.agregar_candidato_a_votacion(nombre_candidato)
-    if id_candidato is not None:
+    id_candidato = sistema_votacion.agregar_candidato_a_votacion(nombre_candidato, tema)
+    if id_candidato:
          # Devolvemos el ID y nombre para referencia en el frontend
         return jsonify({
-            "mensaje": f"Candidato '{nombre_candidato}' añadido/confirmado en la votación '{sistema_votacion.tema_activo}'",
+            "mensaje": f"Candidato '{nombre_candidato}' añadido/confirmado en la votación '{tema}'",
             "id_candidato": id_candidato,
-            "nombre_candidato": nombre_candidato
+            "nombre_candidato": nombre_candidato,
+            "tema": tema
             }), 200 # O 201 si siempre es nuevo, pero puede reutilizar global
     else:
         # El método interno ya imprime errores
@@ -68,47 +244,127 @@ def agregar_candidato_api():
 
 @app.route('/votacion/votar', methods=['POST'])
 def votar_en_sesion_api():
-    """Emite un voto en la sesión de votación activa."""
-    if not sistema_votacion.tema_activo:
-        return jsonify({"error": "No hay ninguna votación activa para votar"}), 400
-
+    """Emite un voto en una votación activa (campo 'tema' si hay varias)."""
     data = request.get_json()
+    tema, error = resolver_tema_sesion(data)
+    if error:
+        return error
+
     id_votante = data.get('id_votante') # Identificador externo del votante (e.g., DNI, email, etc.)
     id_candidato = data.get('id_candidato')
 
     if not id_votante or not id_candidato:
         return jsonify({"error": "Se requieren los campos 'id_votante' y 'id_candidato'"}), 400
 
-    if sistema_votacion.emitir_voto_sesion(id_votante, str(id_candidato)): # Asegurar que id_candidato sea string
-        return jsonify({"mensaje": f"Voto para el tema '{sistema_votacion.tema_activo}' registrado correctamente (pendiente de finalizar)"}), 200
+    if sistema_votacion.emitir_voto_sesion(id_votante, str(id_candidato), tema): # Asegurar que id_candidato sea string
+        return jsonify({"mensaje": f"Voto para el tema '{tema}' registrado correctamente (pendiente de finalizar)"}), 200
     else:
         # El método interno imprime la causa (votante ya votó, candidato inválido, etc.)
         return jsonify({"error": "No se pudo registrar el voto (verifique los datos o si ya votó)"}), 400 # Bad request o Conflict 409
 
+@app.route('/votacion/votar/lote', methods=['POST'])
+def votar_lote_api():
+    """
+    Emite un lote de votos en una votación activa. Acepta JSON ({"tema": ..., "votos": [{"id_votante": ...,
+    "id_candidato": ...}, ...]} o directamente la lista) o NDJSON (un voto por línea, con
+    Content-Type application/x-ndjson o ?formato=ndjson y el tema en ?tema=).
+    Devuelve el resultado de cada voto en el mismo orden.
+    """
+    ndjson = request.mimetype in TIPOS_NDJSON or request.args.get('formato') == 'ndjson'
+    if ndjson:
+        data = None
+        votos = []
+        for linea in request.get_data(as_text=True).splitlines():
+            if linea.strip():
+                try:
+                    votos.append(json.loads(linea))
+                except ValueError:
+                    votos.append(None)  # Se informa como formato inválido en su posición
+    else:
+        data = request.get_json(silent=True)
+        votos = data.get('votos') if isinstance(data, dict) else data
+        if not isinstance(votos, list):
+            return jsonify({"error": "Se requiere una lista de votos (campo 'votos') en JSON o NDJSON"}), 400
+    if not votos:
+        return jsonify({"error": "El lote no contiene votos"}), 400
+    if len(votos) > MAXIMO_VOTOS_LOTE:
+        return jsonify({"error": f"El lote supera el máximo de {MAXIMO_VOTOS_LOTE} votos"}), 413
+    tema, error = resolver_tema_sesion(data if isinstance(data, dict) else None)
+    if error:
+        return error
+
+    validos = [isinstance(voto, dict) for voto in votos]
+    pares = [(voto.get('id_votante'), voto.get('id_candidato')) if valido else (None, None)
+             for voto, valido in zip(votos, validos)]
+    motivos = sistema_votacion.emitir_votos_lote(pares, tema)
+    if motivos is None:
+        return jsonify({"error": f"No hay ninguna votación activa para el tema '{tema}'"}), 404
+
+    resultados = []
+    for valido, motivo in zip(validos, motivos):
+        if not valido:
+            motivo = "formato_invalido"
+        resultados.append({"aceptado": True} if motivo is None else {"aceptado": False, "motivo": motivo})
+    aceptados = sum(1 for resultado in resultados if resultado["aceptado"])
+    return jsonify({
+        "tema": tema,
+        "aceptados": aceptados,
+        "rechazados": len(resultados) - aceptados,
+        "resultados": resultados
+        }), 200
+
 @app.route('/votacion/finalizar', methods=['POST'])
 def finalizar_votacion_api():
-    """Finaliza la votación activa, crea el bloque y lo añade a la cadena."""
-    if not sistema_votacion.tema_activo:
-        return jsonify({"error": "No hay ninguna votación activa para finalizar"}), 400
+    """Finaliza una votación activa (campo 'tema' si hay varias), crea su bloque y lo añade a la cadena."""
+    tema, error = resolver_tema_sesion(request.get_json(silent=True))
+    if error:
+        return error
 
-    if sistema_votacion.finalizar_votacion():
-        return jsonify({"mensaje": f"Votación finalizada y bloque añadido a la blockchain."}), 200
+    if sistema_votacion.finalizar_votacion(tema):
+        return jsonify({"mensaje": f"Votación '{tema}' finalizada y bloque añadido a la blockchain."}), 200
     else:
         # El método interno imprime la causa (sin votos, error al añadir bloque)
         return jsonify({"error": "No se pudo finalizar la votación o añadir el bloque"}), 500
 
+@app.route('/votacion/activa/stream', methods=['GET'])
+def votacion_activa_stream_api():
+    """Estado de la votación activa en tiempo real (SSE, ?tema= opcional); el estado es null si finaliza."""
+    return respuesta_eventos("activa", request.args.get('tema'))
+
 @app.route('/votacion/activa', methods=['GET'])
 def obtener_votacion_activa_api():
-    """Devuelve el estado de la votación activa, si existe."""
-    estado = sistema_votacion.obtener_estado_votacion_activa()
+    """Devuelve el estado de la votación activa (?tema= o, por defecto, la iniciada más recientemente)."""
+    estado = sistema_votacion.obtener_estado_votacion_activa(request.args.get('tema'))
     if estado:
         return jsonify(estado), 200
     else:
         return jsonify({"mensaje": "No hay ninguna votación activa en este momento"}), 404 # Not Found
 
+@app.route('/votacion/sesiones', methods=['GET'])
+def obtener_sesiones_activas_api():
+    """Devuelve el estado de todas las votaciones activas."""
+    return jsonify({"sesiones": sistema_votacion.obtener_sesiones_activas()}), 200
+
+@app.route('/votacion/comprobante/<id_votante_hash>', methods=['GET'])
+def obtener_comprobante_api(id_votante_hash):
+    """
+    Devuelve el voto de un votante junto con una prueba de inclusión de Merkle que permite
+    comprobarlo contra el hash_actual del bloque sin descargar la cadena (?tema= para filtrar).
+    """
+    tema = request.args.get('tema')
+    comprobantes = sistema_votacion.obtener_comprobantes(id_votante_hash, tema)
+    if comprobantes:
+        return jsonify({"comprobantes": comprobantes}), 200
+
+    tema_pendiente = sistema_votacion.voto_pendiente(id_votante_hash, tema)
+    if tema_pendiente:
+        return jsonify({"mensaje": f"El voto está registrado en la votación activa '{tema_pendiente}' pero aún no se ha sellado en un bloque"}), 202 # Accepted
+    return jsonify({"error": "No se encontró ningún voto confirmado para ese votante"}), 404
+
 # --- Rutas Anteriores (Modificadas o Mantenidas) ---
 
 @app.route('/candidatos', methods=['GET', 'POST'])
+@respuesta_cacheable(version_candidatos)
 def gestionar_candidatos_globales_api():
     """Gestiona candidatos globales (lista o registra uno nuevo)."""
     if request.method == 'GET':
@@ -134,10 +390,8 @@ def gestionar_candidatos_globales_api():
 
 # --- Rutas de Consulta (Mantenidas/Adaptadas) ---
 
-@app.route('/resultados', methods=['GET'])
-def obtener_resultados_api():
-    """Devuelve los resultados de la votación (global o por tema)."""
-    tema = request.args.get('tema') # Permite filtrar por ?tema=NombreDelTema
+def calcular_resultados(tema=None):
+    """Resultados con nombres de candidato (global o por tema), tal como los devuelve /resultados."""
     resultados_contados = sistema_votacion.contar_votos(tema_especifico=tema)
 
     # Convertir IDs de candidato a nombres para la respuesta JSON
@@ -146,32 +400,144 @@ def obtener_resultados_api():
         for id_c, votos in resultados_contados.items()
     }
 
-    # Indicar si hay una votación activa y si sus votos están incluidos
-    estado_activo = sistema_votacion.obtener_estado_votacion_activa()
+    # Indicar qué votaciones activas tienen votos pendientes incluidos en el recuento
     info_adicional = {}
-    if estado_activo and (tema is None or estado_activo["tema_activo"] == tema):
-         info_adicional["votacion_activa"] = {
-              "tema": estado_activo["tema_activo"],
-              "votos_pendientes_incluidos": estado_activo["numero_votos_recibidos"]
-         }
-
+    votaciones_activas = [
+        {"tema": estado["tema_activo"],
+         "votos_pendientes_incluidos": estado["numero_votos_recibidos"] - estado["numero_votos_sellados"]}
+        for estado in sistema_votacion.obtener_sesiones_activas()
+        if tema is None or estado["tema_activo"] == tema
+    ]
+    if votaciones_activas:
+         info_adicional["votaciones_activas"] = votaciones_activas
 
-    return jsonify({
+    return {
         "resultados": resultados_con_nombres,
         "info": info_adicional
-        }), 200
+        }
+
+@app.route('/resultados', methods=['GET'])
+@respuesta_cacheable(version_resultados)
+def obtener_resultados_api():
+    """Devuelve los resultados de la votación (global o por tema)."""
+    tema = request.args.get('tema') # Permite filtrar por ?tema=NombreDelTema
+    return jsonify(calcular_resultados(tema)), 200
+
+def respuesta_eventos(canal, tema):
+    """Respuesta Server-Sent Events con los cambios de una vista del publicador."""
+    return Response(publicador_eventos.suscribir(canal, tema), mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route('/resultados/stream', methods=['GET'])
+def resultados_stream_api():
+    """
+    Resultados en tiempo real (SSE, ?tema= opcional): un evento 'estado' con los resultados
+    completos al conectarse y eventos 'cambios' con los recuentos que cambian, como mucho uno
+    cada INTERVALO_EVENTOS segundos.
+    """
+    return respuesta_eventos("resultados", request.args.get('tema'))
 
 @app.route('/cadena', methods=['GET'])
+@respuesta_cacheable(version_cadena)
 def obtener_cadena_api():
-    """Devuelve la estructura completa de la blockchain."""
-    cadena_serializada = [sistema_votacion._serializar_bloque(b) for b in sistema_votacion.cadena.cadena]
-    return jsonify(cadena_serializada), 200
+    """
+    Devuelve la blockchain.
+    - Sin parámetros: la lista completa de bloques (formato original).
+    - ?desde=N&limite=M: una página de bloques junto con el total y la siguiente posición.
+    - ?cabeceras=1: omite los votos de cada bloque (solo se incluye su número).
+    - ?formato=ndjson: envía los bloques en streaming, uno por línea.
+    - ?tema=T: solo los bloques de ese tema ('desde' y 'total' se refieren a ellos).
+    """
+    try:
+        desde = int(request.args.get('desde', 0))
+        limite = request.args.get('limite')
+        limite = int(limite) if limite is not None else None
+    except ValueError:
+        return jsonify({"error": "Los parámetros 'desde' y 'limite' deben ser números enteros"}), 400
+    if desde < 0 or (limite is not None and limite < 1):
+        return jsonify({"error": "'desde' debe ser >= 0 y 'limite' >= 1"}), 400
+    incluir_votos = request.args.get('cabeceras', '0').lower() not in ('1', 'true', 'si', 'sí')
+    formato = request.args.get('formato', 'json')
+    tema = request.args.get('tema')
+
+    # Cada bloque se serializa una sola vez: las respuestas se forman concatenando su JSON ya codificado
+    bloques = sistema_votacion.iterar_bloques_json(desde, limite, incluir_votos, tema)
+    if formato == 'ndjson':
+        def generar():
+            for bloque in bloques:
+                yield bloque + b"\n"
+        return Response(stream_with_context(generar()), mimetype='application/x-ndjson'), 200
+    if formato != 'json':
+        return jsonify({"error": "El parámetro 'formato' debe ser 'json' o 'ndjson'"}), 400
+
+    if 'desde' not in request.args and limite is None:
+        return Response(b"[" + b",".join(bloques) + b"]", mimetype='application/json'), 200
+
+    total = len(sistema_votacion.indices_bloques(tema))
+    pagina = list(bloques)
+    siguiente = desde + len(pagina)
+    resto = json.dumps({"desde": desde, "total": total, "siguiente": siguiente if siguiente < total else None})
+    return Response(b'{"bloques":[' + b",".join(pagina) + b"]," + resto[1:].encode("utf-8"), mimetype='application/json'), 200
+
+@app.route('/temas', methods=['GET'])
+def obtener_temas_api():
+    """Devuelve todos los temas con sus estadísticas (bloques, votos, rango de tiempo y candidatos)."""
+    return jsonify({"temas": sistema_votacion.obtener_resumen_temas()}), 200
 
 @app.route('/verificar', methods=['GET'])
+@respuesta_cacheable(version_verificacion)
 def verificar_integridad_api():
-    """Verifica la integridad de la blockchain."""
-    es_valida = sistema_votacion.verificar_integridad_cadena()
-    return jsonify({"integridad_valida": es_valida}), 200
+    """
+    Verifica la integridad de la blockchain.
+    ?modo=completo realiza una auditoría completa y ?workers=N la reparte entre N procesos.
+    """
+    modo = request.args.get('modo', 'incremental')
+    if modo not in ('incremental', 'completo'):
+        return jsonify({"error": "El parámetro 'modo' debe ser 'incremental' o 'completo'"}), 400
+    try:
+        workers = int(request.args.get('workers', 1))
+    except ValueError:
+        return jsonify({"error": "El parámetro 'workers' debe ser un número entero"}), 400
+    if workers < 1:
+        return jsonify({"error": "El parámetro 'workers' debe ser al menos 1"}), 400
+    workers = min(workers, os.cpu_count() or 1)
+
+    es_valida = sistema_votacion.verificar_integridad_cadena(completa=(modo == 'completo'), workers=workers)
+    return jsonify({
+        "integridad_valida": es_valida,
+        "modo": modo,
+        "workers": workers,
+        "primer_bloque_invalido": sistema_votacion.primer_bloque_invalido
+        }), 200
+
+@app.route('/replicacion/estado', methods=['GET'])
+def estado_replicacion_api():
+    """
+    Punta de la cadena de este nodo (index y hash_actual) para la sincronización entre nodos.
+    Con ?index=N&hash_actual=H (la punta de otro nodo) indica en 'punta_comun' si ese bloque
+    forma parte de esta cadena, es decir, si al otro nodo solo le faltan los bloques siguientes.
+    """
+    punta = sistema_votacion.cadena.peek()
+    estado = {
+        "rol": "replica" if replicador is not None else "primario",
+        "index": punta.index,
+        "hash_actual": punta.hash_actual,
+        "ultimo_id_candidato": sistema_votacion.ultimo_id_candidato_global
+    }
+    if 'index' in request.args:
+        try:
+            index = int(request.args['index'])
+        except ValueError:
+            return jsonify({"error": "El parámetro 'index' debe ser un número entero"}), 400
+        estado["punta_comun"] = sistema_votacion.contiene_bloque(index, request.args.get('hash_actual'))
+    if replicador is not None:
+        estado["replicacion"] = replicador.estado()
+    return jsonify(estado), 200
+
+@app.route('/metricas', methods=['GET'])
+def obtener_metricas_api():
+    """Métricas internas (contadores, histogramas de latencia e indicadores) en formato de texto de Prometheus."""
+    return Response(Metricas.exportar_prometheus(), mimetype="text/plain; version=0.0.4")
 
 # --- Ruta para la Interfaz Web (Sin cambios necesarios aquí) ---
 @app.route('/')
@@ -186,4 +552,8 @@ def index():
 if __name__ == '__main__':
     # Asegúrate de que la IP y el puerto sean accesibles si es necesario
     # Usar 0.0.0.0 para permitir conexiones externas (útil en contenedores o VMs)
-    app.run(host='0.0.0.0', port=5001, debug=True) # Puerto 5001 como en el original
\ No newline at end of file
+    if replicador is not None:
+        replicador.iniciar()
+    # Con varios nodos (réplica o directorio propio) sin recargador: volvería a ejecutar el módulo en otro proceso
+    app.run(host='0.0.0.0', port=argumentos.puerto, debug=True,
+            use_reloader=not (argumentos.primario or argumentos.directorio)) # Puerto 5001 por defecto, como en el original
\ No newline at end of file
@@ -0,0 +1,438 @@
+"""
+Benchmark de carga de la API de votación.
+
+Ejecuta la aplicación Flask mediante su cliente de pruebas (sin red) con votantes y
+candidatos sintéticos, en un directorio temporal, y mide para cada tamaño de cadena:
+- arranque: tiempo de SistemaVotacion() (cargar_datos + índices) con la cadena ya guardada.
+- votar: throughput y latencias p50/p99 de POST /votacion/votar.
+- finalizar: coste de POST /votacion/finalizar y de guardar_datos según el tamaño del bloque.
+- resultados / cadena / verificar: latencias de GET /resultados, GET /cadena y GET /verificar
+  (incremental y completo). Las consultas cacheables se miden por separado repitiendo la URL
+  (respuesta servida desde la caché de app.py) y variándola en cada petición (respuesta calculada).
+- replicación (opcional, --replicacion N): arranca un primario con N bloques y una réplica
+  (dos procesos app.py en puertos locales) y mide los bloques por segundo que copia la réplica
+  y la latencia de propagación de un bloque nuevo.
+- procesos (opcional, --procesos N): arranca 1, 2, ... N procesos app.py sobre la misma base
+  de datos SQLite (como los workers de gunicorn), reparte los votos entre ellos y mide los
+  votos por segundo del conjunto; comprueba que todos devuelven los mismos resultados.
+
+Los resultados se escriben en JSON para comparar entre commits:
+
+    python benchmark.py --salida resultados_benchmark.json
+    python benchmark.py --bloques 0,50,200 --votos-por-bloque 500 --peticiones 2000 --hilos 8
+    python benchmark.py --replicacion 1000
+    python benchmark.py --procesos 4
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import platform
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+DIRECTORIO_BACKEND = os.path.dirname(os.path.abspath(__file__))
+
+
+def _silencio():
+    """Oculta los mensajes del sistema de votación mientras se mide."""
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    if not ordenados:
+        return None
+    posicion = min(len(ordenados) - 1, max(0, round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[posicion]
+
+
+def _resumen_latencias(latencias):
+    """Estadísticas en milisegundos de una lista de latencias en segundos."""
+    return {
+        "n": len(latencias),
+        "media_ms": statistics.fmean(latencias) * 1000 if latencias else None,
+        "p50_ms": _percentil(latencias, 50) * 1000 if latencias else None,
+        "p99_ms": _percentil(latencias, 99) * 1000 if latencias else None,
+        "max_ms": max(latencias) * 1000 if latencias else None,
+    }
+
+
+def _commit_actual():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=DIRECTORIO_BACKEND, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _votos_sinteticos(numero_votos, tema, candidatos, semilla):
+    ahora = time.time()
+    return [{
+        "timestamp": ahora + i * 1e-6,
+        "id_votante_hash": hashlib.sha256(f"{semilla}-{i}".encode()).hexdigest(),
+        "id_candidato": candidatos[i % len(candidatos)],
+        "tema_votacion": tema
+    } for i in range(numero_votos)]
+
+
+def _construir_cadena(sistema, numero_bloques, votos_por_bloque, temas):
+    """Añade bloques sintéticos a la cadena sin pasar por la API (solo se mide después)."""
+    candidatos = [sistema.registrar_candidato_global(f"Candidato {i}") for i in range(8)]
+    for numero in range(len(sistema.cadena.cadena) - 1, numero_bloques):
+        tema = f"Tema {numero % temas}"
+        sistema.cadena.agregar_bloque(_votos_sinteticos(votos_por_bloque, tema, candidatos, f"historico-{numero}"), tema)
+        sistema._indexar_bloque(sistema.cadena.peek())
+    sistema.guardar_datos()
+
+
+def _medir_arranque(repeticiones, **opciones):
+    import SistemaVotacion
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        with _silencio():
+            SistemaVotacion.SistemaVotacion(**opciones)
+        tiempos.append(time.perf_counter() - inicio)
+    return {"media_s": statistics.fmean(tiempos), "min_s": min(tiempos), "repeticiones": repeticiones}
+
+
+def _medir_votar(app, tema, peticiones, hilos):
+    """Envía 'peticiones' votos repartidos entre 'hilos' clientes. Devuelve throughput y latencias."""
+    cliente = app.test_client()
+    with _silencio():
+        cliente.post('/votacion/iniciar', json={"tema": tema})
+        candidatos = [cliente.post('/votacion/candidato', json={"nombre": f"Candidato {i}", "tema": tema}).get_json()["id_candidato"]
+                      for i in range(4)]
+    latencias = []
+    errores = []
+    bloqueo = threading.Lock()
+
+    def trabajador(numero_hilo):
+        cliente_hilo = app.test_client()
+        propias, fallos = [], 0
+        for i in range(numero_hilo, peticiones, hilos):
+            inicio = time.perf_counter()
+            respuesta = cliente_hilo.post('/votacion/votar', json={
+                "id_votante": f"{tema}-votante-{i}", "id_candidato": candidatos[i % len(candidatos)], "tema": tema})
+            propias.append(time.perf_counter() - inicio)
+            if respuesta.status_code != 200:
+                fallos += 1
+        with bloqueo:
+            latencias.extend(propias)
+            errores.append(fallos)
+
+    trabajadores = [threading.Thread(target=trabajador, args=(n,)) for n in range(hilos)]
+    inicio = time.perf_counter()
+    with _silencio():
+        for hilo in trabajadores:
+            hilo.start()
+        for hilo in trabajadores:
+            hilo.join()
+    duracion = time.perf_counter() - inicio
+    resultado = _resumen_latencias(latencias)
+    resultado.update({"hilos": hilos, "errores": sum(errores), "duracion_s": duracion,
+                      "votos_por_segundo": peticiones / duracion if duracion else None})
+    return resultado
+
+
+def _medir_finalizar(app, sistema, tema):
+    """Coste de finalizar la votación abierta por _medir_votar y de guardar un bloque de ese tamaño."""
+    cliente = app.test_client()
+    numero_votos = len(sistema.sesiones[tema].votos)
+    inicio = time.perf_counter()
+    with _silencio():
+        respuesta = cliente.post('/votacion/finalizar', json={"tema": tema})
+    finalizar = time.perf_counter() - inicio
+    # guardar_datos aislado: un bloque sintético del mismo tamaño
+    candidatos = list(sistema.candidatos_globales) or ["0"]
+    with _silencio():
+        sistema.cadena.agregar_bloque(_votos_sinteticos(numero_votos, tema, candidatos, f"guardar-{tema}"), tema)
+        sistema._indexar_bloque(sistema.cadena.peek())
+        inicio = time.perf_counter()
+        sistema.guardar_datos()
+        guardar = time.perf_counter() - inicio
+    return {"votos_bloque": numero_votos, "estado": respuesta.status_code,
+            "finalizar_ms": finalizar * 1000, "guardar_datos_ms": guardar * 1000}
+
+
+def _medir_consulta(app, ruta, repeticiones, cache=True):
+    """
+    Latencias de GET 'ruta', siempre sin If-None-Match (nunca se responde 304). Con cache=True se
+    repite la misma URL, por lo que desde la segunda petición la respuesta sale de la caché de
+    app.py; con cache=False cada petición añade un parámetro distinto, que cambia la clave de la
+    caché y obliga a calcular la respuesta.
+    """
+    cliente = app.test_client()
+    separador = "&" if "?" in ruta else "?"
+    latencias = []
+    with _silencio():
+        for numero in range(repeticiones):
+            url = ruta if cache else f"{ruta}{separador}sin_cache={numero}"
+            inicio = time.perf_counter()
+            respuesta = cliente.get(url)
+            latencias.append(time.perf_counter() - inicio)
+    resultado = _resumen_latencias(latencias)
+    resultado["estado"] = respuesta.status_code
+    return resultado
+
+
+def _medir_consulta_cacheable(app, ruta, repeticiones):
+    """Latencias de una consulta cacheable servida desde la caché y calculada en cada petición."""
+    return {"cacheada": _medir_consulta(app, ruta, repeticiones),
+            "sin_cache": _medir_consulta(app, ruta, repeticiones, cache=False)}
+
+
+def _puerto_libre():
+    with socket.socket() as conexion:
+        conexion.bind(("127.0.0.1", 0))
+        return conexion.getsockname()[1]
+
+
+def _arrancar_nodo(directorio, *opciones):
+    """Lanza app.py como un nodo independiente y espera a que responda. Devuelve (url, proceso)."""
+    puerto = _puerto_libre()
+    proceso = subprocess.Popen([sys.executable, os.path.join(DIRECTORIO_BACKEND, "app.py"), "--puerto", str(puerto),
+                                "--directorio", directorio, *opciones],
+                               env=dict(os.environ, NIVEL_LOG="WARNING"), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{puerto}"
+    for _ in range(300):
+        try:
+            urllib.request.urlopen(url + "/replicacion/estado", timeout=1).close()
+            return url, proceso
+        except OSError:
+            time.sleep(0.05)
+    proceso.kill()
+    raise RuntimeError(f"El nodo de {directorio} no arrancó")
+
+
+def _estado_replicacion(url):
+    with urllib.request.urlopen(url + "/replicacion/estado", timeout=10) as respuesta:
+        return json.load(respuesta)
+
+
+def _esperar_index(url, index, limite_s=600):
+    fin = time.perf_counter() + limite_s
+    while time.perf_counter() < fin:
+        if _estado_replicacion(url)["index"] >= index:
+            return True
+        time.sleep(0.005)
+    return False
+
+
+def _publicar(url, ruta, datos):
+    peticion = urllib.request.Request(url + ruta, json.dumps(datos).encode(), {"Content-Type": "application/json"})
+    with urllib.request.urlopen(peticion, timeout=30) as respuesta:
+        return json.load(respuesta)
+
+
+def _medir_replicacion(numero_bloques, votos_por_bloque, temas):
+    """
+    Primario con 'numero_bloques' bloques sintéticos y una réplica vacía, cada uno en su proceso:
+    mide la puesta al día de la réplica (bloques/s, según la propia réplica y de extremo a extremo)
+    y la latencia con la que un bloque nuevo del primario llega a la réplica.
+    """
+    directorio_original = os.getcwd()
+    directorio = tempfile.mkdtemp(prefix="benchmark_replicacion_")
+    procesos = []
+    try:
+        os.makedirs(os.path.join(directorio, "primario"))
+        os.chdir(os.path.join(directorio, "primario"))
+        sys.path.insert(0, DIRECTORIO_BACKEND)
+        with _silencio():
+            import SistemaVotacion
+            _construir_cadena(SistemaVotacion.SistemaVotacion(), numero_bloques, votos_por_bloque, temas)
+        os.chdir(directorio_original)
+
+        primario, proceso = _arrancar_nodo(os.path.join(directorio, "primario"))
+        procesos.append(proceso)
+        inicio = time.perf_counter()
+        replica, proceso = _arrancar_nodo(os.path.join(directorio, "replica"), "--primario", primario, "--intervalo-replicacion", "0.05")
+        procesos.append(proceso)
+        if not _esperar_index(replica, numero_bloques):
+            raise RuntimeError("La réplica no alcanzó al primario")
+        extremo_a_extremo = time.perf_counter() - inicio  # Incluye el arranque del proceso de la réplica
+        ronda = None
+        while ronda is None:  # La réplica anota la ronda justo después de añadir el último bloque
+            ronda = _estado_replicacion(replica)["replicacion"]["ultima_sincronizacion"]
+
+        # Propagación: votación de un voto en el primario hasta que su bloque está en la réplica
+        latencias = []
+        for numero in range(5):
+            tema = f"Propagacion {numero}"
+            _publicar(primario, "/votacion/iniciar", {"tema": tema})
+            id_candidato = _publicar(primario, "/votacion/candidato", {"nombre": "Candidato 0", "tema": tema})["id_candidato"]
+            _publicar(primario, "/votacion/votar", {"id_votante": "propagacion", "id_candidato": id_candidato, "tema": tema})
+            inicio = time.perf_counter()
+            _publicar(primario, "/votacion/finalizar", {"tema": tema})
+            _esperar_index(replica, numero_bloques + numero + 1, limite_s=30)
+            latencias.append(time.perf_counter() - inicio)
+
+        resultado = {
+            "bloques": numero_bloques,
+            "votos_por_bloque": votos_por_bloque,
+            "ronda_replica": ronda,
+            "extremo_a_extremo_s": extremo_a_extremo,
+            "bloques_por_segundo_extremo_a_extremo": numero_bloques / extremo_a_extremo,
+            "propagacion": _resumen_latencias(latencias),
+        }
+        print(f"Replicación de {numero_bloques} bloques: {ronda['bloques_por_segundo']:.0f} bloques/s en la réplica, "
+              f"{resultado['bloques_por_segundo_extremo_a_extremo']:.0f} bloques/s con el arranque, "
+              f"propagación p50 {resultado['propagacion']['p50_ms']:.0f} ms")
+        return resultado
+    finally:
+        for proceso in procesos:
+            proceso.terminate()
+            proceso.wait()
+        os.chdir(directorio_original)
+        shutil.rmtree(directorio, ignore_errors=True)
+
+
+def _medir_procesos(numero_procesos, peticiones, hilos):
+    """
+    Para 1, 2, ... numero_procesos procesos app.py que comparten una base de datos SQLite,
+    envía 'peticiones' votos repartidos entre ellos desde 'hilos' clientes y mide el
+    throughput total. Al final todos los procesos deben ver los mismos resultados.
+    """
+    directorio = tempfile.mkdtemp(prefix="benchmark_procesos_")
+    resultados = []
+    try:
+        for procesos in range(1, numero_procesos + 1):
+            base_datos = os.path.join(directorio, f"votacion_{procesos}.sqlite")
+            nodos = []
+            try:
+                for _ in range(procesos):
+                    nodos.append(_arrancar_nodo(directorio, "--sqlite", base_datos))
+                urls = [url for url, _ in nodos]
+                tema = f"Procesos {procesos}"
+                _publicar(urls[0], "/votacion/iniciar", {"tema": tema})
+                id_candidato = _publicar(urls[0], "/votacion/candidato", {"nombre": "Candidato 0", "tema": tema})["id_candidato"]
+                siguiente = iter(range(peticiones))
+                bloqueo = threading.Lock()
+                latencias = []
+
+                def trabajador():
+                    while True:
+                        with bloqueo:
+                            numero = next(siguiente, None)
+                        if numero is None:
+                            return
+                        inicio = time.perf_counter()
+                        _publicar(urls[numero % len(urls)], "/votacion/votar",
+                                  {"id_votante": f"votante-{numero}", "id_candidato": id_candidato, "tema": tema})
+                        latencia = time.perf_counter() - inicio
+                        with bloqueo:
+                            latencias.append(latencia)
+
+                inicio = time.perf_counter()
+                clientes = [threading.Thread(target=trabajador) for _ in range(hilos)]
+                for cliente in clientes:
+                    cliente.start()
+                for cliente in clientes:
+                    cliente.join()
+                segundos = time.perf_counter() - inicio
+                vistas = [json.load(urllib.request.urlopen(f"{url}/resultados?tema={urllib.parse.quote(tema)}", timeout=30))["resultados"]
+                          for url in urls]
+                if any(vista != {"Candidato 0": peticiones} for vista in vistas):
+                    raise RuntimeError(f"Los procesos no ven los mismos resultados: {vistas}")
+            finally:
+                for _, proceso in nodos:
+                    proceso.terminate()
+                    proceso.wait()
+            resultado = {"procesos": procesos, "votos_por_segundo": peticiones / segundos, **_resumen_latencias(latencias)}
+            resultados.append(resultado)
+            print(f"{procesos} procesos con SQLite: {resultado['votos_por_segundo']:.0f} votos/s, p99 {resultado['p99_ms']:.2f} ms")
+        return {"nucleos": os.cpu_count(), "peticiones": peticiones, "hilos": hilos, "resultados": resultados}
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+
+def ejecutar(tamanos, votos_por_bloque, peticiones, hilos, repeticiones, temas, votos_por_sincronizacion):
+    directorio_original = os.getcwd()
+    directorio = tempfile.mkdtemp(prefix="benchmark_votacion_")
+    os.chdir(directorio)  # SistemaVotacion y app guardan sus archivos en el directorio actual
+    sys.path.insert(0, DIRECTORIO_BACKEND)
+    os.environ.setdefault("NIVEL_LOG", "WARNING")  # Sin los mensajes informativos de cada operación
+    try:
+        with _silencio():
+            import app as aplicacion
+            import SistemaVotacion
+        opciones = {"votos_por_sincronizacion": votos_por_sincronizacion}
+        resultados = []
+        for numero_bloques in tamanos:
+            with _silencio():
+                sistema = SistemaVotacion.SistemaVotacion(**opciones)
+                _construir_cadena(sistema, numero_bloques, votos_por_bloque, temas)
+            resultado = {
+                "bloques": len(sistema.cadena.cadena) - 1,
+                "votos_cadena": sum(len(bloque.votos) for bloque in sistema.cadena.cadena),
+                "arranque": _medir_arranque(repeticiones, **opciones),
+            }
+            with _silencio():
+                sistema = SistemaVotacion.SistemaVotacion(**opciones)
+            aplicacion.sistema_votacion = sistema  # Las rutas usan la instancia global del módulo
+            tema = f"Benchmark {numero_bloques}"
+            resultado["votar"] = _medir_votar(aplicacion.app, tema, peticiones, hilos)
+            resultado["resultados"] = _medir_consulta_cacheable(aplicacion.app, '/resultados', repeticiones)
+            resultado["finalizar"] = _medir_finalizar(aplicacion.app, sistema, tema)
+            resultado["cadena"] = _medir_consulta_cacheable(aplicacion.app, '/cadena', repeticiones)
+            resultado["verificar_incremental"] = _medir_consulta_cacheable(aplicacion.app, '/verificar', repeticiones)
+            resultado["verificar_completo"] = _medir_consulta(aplicacion.app, '/verificar?modo=completo', max(1, repeticiones // 5))
+            resultados.append(resultado)
+            print(f"Cadena de {resultado['bloques']} bloques: {resultado['votar']['votos_por_segundo']:.0f} votos/s, "
+                  f"p99 votar {resultado['votar']['p99_ms']:.2f} ms, arranque {resultado['arranque']['media_s'] * 1000:.1f} ms, "
+                  f"p50 /cadena {resultado['cadena']['sin_cache']['p50_ms']:.2f} ms "
+                  f"({resultado['cadena']['cacheada']['p50_ms']:.2f} ms desde la caché)")
+        return resultados
+    finally:
+        os.chdir(directorio_original)
+        shutil.rmtree(directorio, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de carga de la API de votación.")
+    parser.add_argument("--salida", default="resultados_benchmark.json", help="Archivo JSON de resultados")
+    parser.add_argument("--bloques", default="0,20,100", help="Tamaños de cadena (número de bloques) separados por comas")
+    parser.add_argument("--votos-por-bloque", type=int, default=200)
+    parser.add_argument("--peticiones", type=int, default=500, help="Votos enviados por tamaño de cadena")
+    parser.add_argument("--hilos", type=int, default=4, help="Clientes concurrentes enviando votos")
+    parser.add_argument("--repeticiones", type=int, default=20, help="Repeticiones de las consultas y del arranque")
+    parser.add_argument("--temas", type=int, default=10, help="Temas distintos en la cadena sintética")
+    parser.add_argument("--votos-por-sincronizacion", type=int, default=1, help="Política de fsync del diario (ver DiarioVotos)")
+    parser.add_argument("--replicacion", type=int, default=0, help="Bloques del primario en la medición de replicación (0: no se mide)")
+    parser.add_argument("--procesos", type=int, default=0, help="Máximo de procesos sobre una base de datos SQLite compartida (0: no se mide)")
+    args = parser.parse_args()
+
+    tamanos = sorted(int(valor) for valor in args.bloques.split(","))
+    inicio = time.time()
+    resultados = ejecutar(tamanos, args.votos_por_bloque, args.peticiones, args.hilos,
+                          args.repeticiones, args.temas, args.votos_por_sincronizacion)
+    informe = {
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(inicio)),
+        "commit": _commit_actual(),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "parametros": vars(args),
+        "resultados": resultados,
+    }
+    if args.replicacion:
+        informe["replicacion"] = _medir_replicacion(args.replicacion, args.votos_por_bloque, args.temas)
+    if args.procesos:
+        informe["procesos"] = _medir_procesos(args.procesos, args.peticiones, args.hilos)
+    with open(args.salida, "w", encoding="utf-8") as archivo:
+        json.dump(informe, archivo, indent=2, ensure_ascii=False)
+    print(f"Resultados guardados en {os.path.abspath(args.salida)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+# Los módulos del backend se importan por su nombre (import SistemaVotacion), como en app.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import SistemaVotacion
+
+
+@pytest.fixture
+def directorio(tmp_path, monkeypatch):
+    """Directorio de datos vacío: el sistema guarda sus archivos en el directorio actual."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def sistema(directorio):
+    return SistemaVotacion.SistemaVotacion()
+
+
+@pytest.fixture
+def servidor(directorio):
+    """Módulo app recargado sobre un directorio vacío (app.py crea el sistema al importarse)."""
+    if "app" in sys.modules:
+        return importlib.reload(sys.modules["app"])
+    return importlib.import_module("app")
+
+
+@pytest.fixture
+def cliente(servidor):
+    return servidor.app.test_client()
+
+
+def votar(sistema, tema, votantes, candidatos=("A", "B")):
+    """Inicia una votación de 'tema', emite un voto por votante y la deja abierta."""
+    assert sistema.iniciar_votacion(tema)
+    ids = [sistema.agregar_candidato_a_votacion(nombre, tema) for nombre in candidatos]
+    for numero, votante in enumerate(votantes):
+        assert sistema.emitir_voto_sesion(votante, ids[numero % len(ids)], tema) is True
+    return ids
@@ -0,0 +1,159 @@
+import os
+import shutil
+
+import AlmacenBinario
+import Bloque
+import SistemaVotacion
+
+from conftest import votar
+
+
+def crear_bloques(numero):
+    bloques = [Bloque.Bloque.crear_bloque_genesis()]
+    for n in range(1, numero):
+        votos = [{"timestamp": 1700000000.0 + i, "id_votante_hash": f"{n:032x}{i:032x}",
+                  "id_candidato": str(i % 2), "tema_votacion": f"Tema {n % 2}"} for i in range(5)]
+        bloques.append(Bloque.Bloque.crear_nuevo_bloque(bloques[-1], votos, f"Tema {n % 2}"))
+    return bloques
+
+
+def hashes(bloques):
+    return [bloque.hash_actual for bloque in bloques]
+
+
+def cargar(directorio):
+    return AlmacenBinario.AlmacenBinario(str(directorio / "cadena")).cargar()
+
+
+def test_cola_sin_indexar_se_recupera_con_su_crc(directorio):
+    bloques = crear_bloques(6)
+    almacen = AlmacenBinario.AlmacenBinario(str(directorio / "cadena"))
+    almacen.anexar(bloques[:4], [])
+    shutil.copy(almacen.ruta, directorio / "indice_anterior")
+    almacen.anexar(bloques[4:], [])
+    # Corte después de escribir el .dat y antes de anexar al índice
+    shutil.copy(directorio / "indice_anterior", almacen.ruta)
+
+    datos = cargar(directorio)
+
+    assert hashes(datos["bloques"]) == hashes(bloques)
+    assert [list(bloque.votos) for bloque in datos["bloques"]] == [list(bloque.votos) for bloque in bloques]
+    assert not datos["requiere_compactar"]
+    tam_indice = AlmacenBinario.CABECERA_ARCHIVO.size + 8 * AlmacenBinario.ENTRADA.size  # 6 bloques y 2 temas
+    assert os.path.getsize(almacen.ruta) == tam_indice  # El índice se ha completado
+
+
+def test_cola_sin_indexar_corrupta_se_descarta(directorio):
+    bloques = crear_bloques(6)
+    almacen = AlmacenBinario.AlmacenBinario(str(directorio / "cadena"))
+    almacen.anexar(bloques[:4], [])
+    shutil.copy(almacen.ruta, directorio / "indice_anterior")
+    almacen.anexar(bloques[4:], [])
+    shutil.copy(directorio / "indice_anterior", almacen.ruta)
+    with open(almacen.ruta_datos, "r+b") as archivo:
+        archivo.seek(-20, os.SEEK_END)  # Un byte de los votos del último bloque
+        byte = archivo.read(1)
+        archivo.seek(-20, os.SEEK_END)
+        archivo.write(bytes([byte[0] ^ 0xFF]))
+
+    datos = cargar(directorio)
+
+    assert hashes(datos["bloques"]) == hashes(bloques[:5])
+    assert datos["requiere_compactar"]
+
+
+def test_dat_truncado_conserva_el_prefijo_valido(directorio):
+    bloques = crear_bloques(6)
+    almacen = AlmacenBinario.AlmacenBinario(str(directorio / "cadena"))
+    almacen.anexar(bloques, [])
+    with open(almacen.ruta_datos, "r+b") as archivo:
+        archivo.truncate(os.path.getsize(almacen.ruta_datos) - 10)  # Dentro de los votos del último bloque
+
+    datos = cargar(directorio)
+
+    assert hashes(datos["bloques"]) == hashes(bloques[:5])
+    assert datos["requiere_compactar"]
+
+
+def test_indice_de_otra_generacion_se_reconstruye(directorio):
+    bloques = crear_bloques(6)
+    almacen = AlmacenBinario.AlmacenBinario(str(directorio / "cadena"))
+    almacen.compactar(bloques, {}, -1)
+    shutil.copy(almacen.ruta, directorio / "indice_anterior")
+    almacen.compactar(bloques[:3], {"0": "A"}, 0)
+    # Corte después de sustituir el .dat y antes de reescribir el índice
+    shutil.copy(directorio / "indice_anterior", almacen.ruta)
+
+    datos = cargar(directorio)
+
+    assert hashes(datos["bloques"]) == hashes(bloques[:3])
+    assert datos["candidatos_globales"] == {"0": "A"}
+    assert hashes(cargar(directorio)["bloques"]) == hashes(bloques[:3])
+
+
+def test_sistema_recupera_la_cadena_tras_truncar_el_dat(sistema):
+    for n in range(4):
+        votar(sistema, f"Tema {n}", ["ana", "luis"])
+        assert sistema.finalizar_votacion(f"Tema {n}")
+    cadena = hashes(sistema.cadena.cadena)
+    with open(sistema.almacen.ruta_datos, "r+b") as archivo:
+        archivo.truncate(os.path.getsize(sistema.almacen.ruta_datos) - 10)
+
+    recuperado = SistemaVotacion.SistemaVotacion()
+
+    assert hashes(recuperado.cadena.cadena) == cadena[:-1]
+    assert recuperado.verificar_integridad_cadena(completa=True)
+    # La cadena se ha reescrito sin la cola: los bloques nuevos se anexan tras el último válido
+    votar(recuperado, "Tema nuevo", ["ana"])
+    assert recuperado.finalizar_votacion("Tema nuevo")
+    assert len(SistemaVotacion.SistemaVotacion().cadena.cadena) == len(cadena)
+
+
+def test_dat_modificado_en_su_sitio_invalida_la_verificacion_incremental(sistema):
+    for n in range(3):
+        votar(sistema, f"Tema {n}", ["ana", "luis"])
+        assert sistema.finalizar_votacion(f"Tema {n}")
+    recargado = SistemaVotacion.SistemaVotacion()  # Votos leídos del .dat mapeado
+    assert recargado.verificar_integridad_cadena(completa=True)
+    digest = bytes.fromhex(recargado.cadena.cadena[1].votos[0]["id_votante_hash"])
+    ruta = recargado.almacen.ruta_datos
+    estado = os.stat(ruta)
+    with open(ruta, "r+b") as archivo:
+        contenido = archivo.read()
+        archivo.seek(contenido.index(digest))
+        archivo.write(bytes([digest[0] ^ 0xFF]))
+    # Mismo tamaño; la fecha se adelanta por si la resolución del sistema de archivos no la cambia
+    os.utime(ruta, ns=(estado.st_atime_ns, estado.st_mtime_ns + 1_000_000_000))
+
+    assert not recargado.verificar_integridad_cadena()
+    assert recargado.primer_bloque_invalido == 1
+
+
+def test_dat_vacio_se_trata_como_cadena_vacia(directorio):
+    open("blockchain_votacion.dat", "wb").close()
+
+    sistema = SistemaVotacion.SistemaVotacion()
+
+    assert len(sistema.cadena.cadena) == 1
+    votar(sistema, "Tema", ["ana"])
+    assert sistema.finalizar_votacion("Tema")
+    assert hashes(SistemaVotacion.SistemaVotacion().cadena.cadena) == hashes(sistema.cadena.cadena)
+
+
+def test_no_se_guarda_sobre_una_cadena_que_no_se_pudo_cargar(sistema, monkeypatch):
+    votar(sistema, "Tema", ["ana"])
+    assert sistema.finalizar_votacion("Tema")
+    with open(sistema.almacen.ruta_datos, "rb") as archivo:
+        contenido = archivo.read()
+
+    def fallar(self):
+        raise RuntimeError("fallo al indexar")
+    # El .dat se lee bien pero la carga falla después, con el almacén ya posicionado al final
+    monkeypatch.setattr(SistemaVotacion.SistemaVotacion, "_restaurar_indices", fallar)
+    fallido = SistemaVotacion.SistemaVotacion()
+    votar(fallido, "Otro tema", ["luis"])
+    fallido.finalizar_votacion("Otro tema")
+
+    assert not fallido.guardar_datos()
+    with open(fallido.almacen.ruta_datos, "rb") as archivo:
+        assert archivo.read() == contenido
@@ -0,0 +1,68 @@
+import CacheRespuestas
+import Metricas
+
+from conftest import votar
+
+
+def aciertos(resultado, ruta="/resultados"):
+    return Metricas.registro.valor("http_cache_total", ruta=ruta, resultado=resultado)
+
+
+def test_etag_y_304_hasta_el_siguiente_voto(servidor, cliente):
+    sistema = servidor.sistema_votacion
+    id_a, id_b = votar(sistema, "Consulta", ["ana"])
+
+    primera = cliente.get("/resultados?tema=Consulta")
+    etag = primera.headers["ETag"]
+    assert primera.headers["Cache-Control"] == "no-cache"
+    no_modificada = cliente.get("/resultados?tema=Consulta", headers={"If-None-Match": etag})
+    assert no_modificada.status_code == 304
+    assert no_modificada.get_data() == b""
+    antes = aciertos("acierto")
+    assert cliente.get("/resultados?tema=Consulta").get_data() == primera.get_data()
+    assert aciertos("acierto") == antes + 1
+
+    # Un voto pendiente cambia los resultados: el ETag anterior deja de valer
+    assert sistema.emitir_voto_sesion("luis", id_b, "Consulta") is True
+    nueva = cliente.get("/resultados?tema=Consulta", headers={"If-None-Match": etag})
+    assert nueva.status_code == 200
+    assert nueva.headers["ETag"] != etag
+    assert nueva.get_json()["resultados"] != primera.get_json()["resultados"]
+
+    # Otra consulta tiene su propio ETag
+    assert cliente.get("/resultados").headers["ETag"] != nueva.headers["ETag"]
+
+
+def test_cadena_cambia_de_etag_con_un_bloque_nuevo(servidor, cliente):
+    sistema = servidor.sistema_votacion
+    etag = cliente.get("/cadena").headers["ETag"]
+    assert cliente.get("/cadena", headers={"If-None-Match": etag}).status_code == 304
+
+    votar(sistema, "Consulta", ["ana"])
+    assert cliente.get("/cadena", headers={"If-None-Match": etag}).status_code == 304  # Los votos pendientes no están en /cadena
+    assert sistema.finalizar_votacion("Consulta")
+    respuesta = cliente.get("/cadena", headers={"If-None-Match": etag})
+    assert respuesta.status_code == 200
+    assert len(respuesta.get_json()) == 2
+
+
+def test_candidatos_y_errores_no_se_cachean(servidor, cliente):
+    etag = cliente.get("/candidatos").headers["ETag"]
+    servidor.sistema_votacion.registrar_candidato_global("Nuevo")
+    assert cliente.get("/candidatos", headers={"If-None-Match": etag}).status_code == 200
+    error = cliente.get("/cadena?desde=-1")
+    assert error.status_code == 400
+    assert "ETag" not in error.headers
+
+
+def test_lru_acotada_en_entradas_y_bytes():
+    cache = CacheRespuestas.CacheRespuestas(maximo_entradas=2, maximo_bytes=40)
+    cache.guardar("a", "1", b"x" * 5, 200, "application/json")
+    cache.guardar("b", "1", b"x" * 5, 200, "application/json")
+    assert cache.obtener("a", "1") is not None  # "a" pasa a ser la más reciente
+    cache.guardar("c", "1", b"x" * 5, 200, "application/json")
+    assert cache.obtener("b", "1") is None
+    assert cache.obtener("a", "2") is None  # Otro ETag: la entrada está obsoleta
+    cache.guardar("d", "1", b"x" * 11, 200, "application/json")  # Mayor que una cuarta parte del límite
+    assert cache.obtener("d", "1") is None
+    assert cache.obtener("c", "1") is not None
@@ -0,0 +1,46 @@
+import json
+
+from conftest import votar
+
+
+def crear_bloques(sistema, numero):
+    for i in range(numero):
+        votar(sistema, f"Tema {i}", [f"votante {i}"])
+        assert sistema.finalizar_votacion()
+
+
+def test_sin_parametros_devuelve_la_lista_completa(servidor, cliente):
+    crear_bloques(servidor.sistema_votacion, 3)
+    respuesta = cliente.get("/cadena")
+    assert respuesta.status_code == 200
+    assert [bloque["index"] for bloque in respuesta.get_json()] == [0, 1, 2, 3]
+
+
+def test_paginas(servidor, cliente):
+    crear_bloques(servidor.sistema_votacion, 4)
+    pagina = cliente.get("/cadena?desde=1&limite=2").get_json()
+    assert [bloque["index"] for bloque in pagina["bloques"]] == [1, 2]
+    assert (pagina["desde"], pagina["total"], pagina["siguiente"]) == (1, 5, 3)
+    ultima = cliente.get(f"/cadena?desde={pagina['siguiente']}&limite=10").get_json()
+    assert [bloque["index"] for bloque in ultima["bloques"]] == [3, 4]
+    assert ultima["siguiente"] is None
+    assert cliente.get("/cadena?desde=-1").status_code == 400
+    assert cliente.get("/cadena?limite=x").status_code == 400
+
+
+def test_cabeceras_omiten_los_votos(servidor, cliente):
+    crear_bloques(servidor.sistema_votacion, 1)
+    completo, = cliente.get("/cadena?desde=1").get_json()["bloques"]
+    cabecera, = cliente.get("/cadena?desde=1&cabeceras=1").get_json()["bloques"]
+    assert "votos" not in cabecera
+    assert cabecera["numero_votos"] == len(completo["votos"]) == 1
+    assert cabecera["hash_actual"] == completo["hash_actual"]
+
+
+def test_ndjson_un_bloque_por_linea(servidor, cliente):
+    crear_bloques(servidor.sistema_votacion, 2)
+    respuesta = cliente.get("/cadena?formato=ndjson&desde=1")
+    assert respuesta.mimetype == "application/x-ndjson"
+    lineas = respuesta.get_data(as_text=True).splitlines()
+    assert [json.loads(linea) for linea in lineas] == cliente.get("/cadena").get_json()[1:]
+    assert cliente.get("/cadena?formato=xml").status_code == 400
@@ -0,0 +1,52 @@
+import os
+
+import AlmacenLog
+import RegistroCandidatos
+import SistemaVotacion
+
+
+def test_nombres_normalizados(sistema):
+    id_ana = sistema.registrar_candidato_global("Ana  García")
+    assert sistema.registrar_candidato_global(" ana garcía ") == id_ana
+    assert sistema.registrar_candidato_global("ANA GARCÍA") == id_ana
+    id_luis = sistema.registrar_candidato_global("Luis")
+    assert id_luis != id_ana
+    assert sistema.candidatos_globales == {id_ana: "Ana  García", id_luis: "Luis"}
+
+
+def test_registro_propio_se_recarga_sin_la_cadena(sistema):
+    ids = [sistema.registrar_candidato_global(nombre) for nombre in ("A", "B", "C")]
+    tamano_cadena = os.path.getsize(sistema.almacen.ruta_datos)
+    assert sistema.registrar_candidato_global("D") == "3"
+    assert os.path.getsize(sistema.almacen.ruta_datos) == tamano_cadena  # Dar de alta no toca la cadena
+
+    recargado = SistemaVotacion.SistemaVotacion()
+    assert recargado.candidatos_globales == {**dict(zip(ids, "ABC")), "3": "D"}
+    assert recargado.registrar_candidato_global("e") == "4"
+
+
+def test_registro_truncado_conserva_los_candidatos_completos(directorio):
+    registro = RegistroCandidatos.RegistroCandidatos(str(directorio / "candidatos.log"))
+    registro.anexar([registro.nuevo("A"), registro.nuevo("B")])
+    with open(registro.ruta, "r+b") as archivo:
+        archivo.truncate(os.path.getsize(registro.ruta) - 2)
+
+    registro.cargar()
+    assert registro.candidatos == {"0": "A"}
+    registro.anexar([registro.nuevo("C")])  # El ID del candidato perdido no se reutiliza
+    registro.cargar()
+    assert registro.candidatos == {"0": "A", "2": "C"}
+    assert registro.buscar(" c ") == "2"
+
+
+def test_compactar_sincroniza_el_directorio(directorio, monkeypatch):
+    registro = RegistroCandidatos.RegistroCandidatos(str(directorio / "candidatos.log"))
+    registro.anexar([registro.nuevo("A"), registro.nuevo("B")])
+    sincronizados = []
+    monkeypatch.setattr(AlmacenLog, "sincronizar_directorio", sincronizados.append)
+
+    registro.compactar()
+
+    assert sincronizados == [registro.ruta]
+    registro.cargar()
+    assert registro.candidatos == {"0": "A", "1": "B"}
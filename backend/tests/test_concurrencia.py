@@ -0,0 +1,55 @@
+import os
+import threading
+
+import AlmacenLog
+
+from conftest import votar
+
+
+def en_hilos(numero, funcion):
+    barrera = threading.Barrier(numero)
+    resultados = [None] * numero
+
+    def ejecutar(i):
+        barrera.wait()
+        resultados[i] = funcion(i)
+
+    hilos = [threading.Thread(target=ejecutar, args=(i,)) for i in range(numero)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return resultados
+
+
+def test_mismo_votante_desde_varios_hilos_se_acepta_una_vez(sistema):
+    id_a, _ = votar(sistema, "Consulta", [])
+    resultados = en_hilos(16, lambda i: sistema.emitir_voto_sesion("ana", id_a, "Consulta"))
+    assert resultados.count(True) == 1
+    assert len(sistema.sesiones["Consulta"].votos) == 1
+
+
+def test_votos_concurrentes_quedan_en_el_diario_en_orden(sistema):
+    id_a, id_b = votar(sistema, "Consulta", [])
+    resultados = en_hilos(16, lambda i: all(
+        sistema.emitir_voto_sesion(f"votante {i}-{j}", (id_a, id_b)[j % 2], "Consulta") is True for j in range(20)))
+    assert all(resultados)
+    sesion = sistema.sesiones["Consulta"]
+    assert len(sesion.votos) == 320
+    registros, _, _ = AlmacenLog.leer_registros(sesion.diario.ruta)
+    assert [registro["voto"] for registro in registros if registro["tipo"] == "voto"] == sesion.votos
+
+    assert sistema.finalizar_votacion("Consulta")
+    assert len(sistema.cadena.peek().votos) == 320
+    assert not os.path.exists(sesion.diario.ruta)
+
+
+def test_votaciones_de_temas_distintos_en_paralelo(sistema):
+    temas = [f"Tema {i}" for i in range(4)]
+    ids = {tema: votar(sistema, tema, [])[0] for tema in temas}
+    resultados = en_hilos(16, lambda i: all(
+        sistema.emitir_voto_sesion(f"votante {i}-{j}", ids[temas[i % 4]], temas[i % 4]) is True for j in range(10)))
+    assert all(resultados)
+    for tema in temas:
+        assert len(sistema.sesiones[tema].votos) == 40
+        assert sistema.contar_votos(tema) == {ids[tema]: 40}
@@ -0,0 +1,160 @@
+import os
+
+import DiarioVotos
+import SistemaVotacion
+
+from conftest import votar
+
+
+def reiniciar(**opciones):
+    """Simula un reinicio tras un corte: un sistema nuevo sobre los mismos archivos."""
+    return SistemaVotacion.SistemaVotacion(**opciones)
+
+
+def test_registro_final_truncado_se_descarta(directorio):
+    diario = DiarioVotos.DiarioVotos(str(directorio / "prueba.diario"))
+    for numero in range(3):
+        assert diario.esperar(diario.anotar({"tipo": "voto", "numero": numero}))
+    tamano = os.path.getsize(diario.ruta)
+    with open(diario.ruta, "r+b") as archivo:
+        archivo.truncate(tamano - 3)  # Corte a mitad de la escritura del último registro
+
+    registros = DiarioVotos.DiarioVotos(diario.ruta).reproducir()
+
+    assert [registro["numero"] for registro in registros] == [0, 1]
+    # El archivo se recorta para que los registros anotados después sigan siendo legibles
+    diario = DiarioVotos.DiarioVotos(diario.ruta)
+    assert diario.esperar(diario.anotar({"tipo": "voto", "numero": 3}))
+    assert [registro["numero"] for registro in diario.reproducir()] == [0, 1, 3]
+
+
+def test_votacion_activa_se_recupera_tras_un_corte(sistema):
+    ids = votar(sistema, "Consulta", ["ana", "luis", "eva"])
+
+    votar(sistema, "Otra", ["ana"])
+
+    recuperado = reiniciar()
+
+    assert list(recuperado.sesiones) == ["Consulta", "Otra"]
+    sesion = recuperado.sesiones["Consulta"]
+    assert len(sesion.votos) == 3
+    assert set(sesion.candidatos) == set(ids)
+    assert recuperado.emitir_voto_sesion("ana", ids[0], "Consulta") is False
+    assert recuperado.emitir_voto_sesion("marta", ids[0], "Consulta") is True
+    assert recuperado.finalizar_votacion("Consulta")
+    assert sum(recuperado.contar_votos("Consulta").values()) == 4
+
+
+def test_voto_truncado_en_el_diario_de_la_votacion(sistema):
+    votar(sistema, "Consulta", ["ana", "luis", "eva"])
+    ruta = sistema.sesiones["Consulta"].diario.ruta
+    with open(ruta, "r+b") as archivo:
+        archivo.truncate(os.path.getsize(ruta) - 1)
+
+    assert len(reiniciar().sesiones["Consulta"].votos) == 2
+
+
+def test_votos_por_sincronizacion_agrupa_los_fsync(sistema, monkeypatch):
+    sincronizaciones = []
+    fsync = os.fsync
+    monkeypatch.setattr(os, "fsync", lambda fd: sincronizaciones.append(fd) or fsync(fd))
+    agrupado = reiniciar(votos_por_sincronizacion=10)
+    votar(agrupado, "Consulta", [])
+    sincronizaciones.clear()
+    sesion = agrupado.sesiones["Consulta"]
+    id_candidato = next(iter(sesion.candidatos))
+    for numero in range(25):
+        assert agrupado.emitir_voto_sesion(f"votante {numero}", id_candidato, "Consulta") is True
+    assert len(sincronizaciones) == 2
+    sesion.diario.sincronizar()
+    assert len(reiniciar().sesiones["Consulta"].votos) == 25
+
+
+def test_corte_tras_guardar_el_bloque_no_reabre_la_votacion(sistema, monkeypatch):
+    votar(sistema, "Consulta", ["ana", "luis"])
+    # Corte entre guardar el bloque y eliminar el diario
+    monkeypatch.setattr(sistema.sesiones["Consulta"].diario, "eliminar", lambda: None)
+    assert sistema.finalizar_votacion("Consulta")
+
+    recuperado = reiniciar()
+
+    assert recuperado.sesiones == {}
+    assert len(recuperado.cadena.cadena) == 2
+    assert sum(recuperado.contar_votos("Consulta").values()) == 2
+
+
+def test_reproducir_tras_sellar_no_duplica_votos(directorio):
+    sistema = SistemaVotacion.SistemaVotacion(votos_por_bloque=2)
+    ids = votar(sistema, "Consulta", ["ana", "luis", "eva"])
+    assert len(sistema.cadena.cadena) == 2  # Génesis y un bloque con los dos primeros votos
+
+    recuperado = reiniciar(votos_por_bloque=2)
+
+    sesion = recuperado.sesiones["Consulta"]
+    assert len(sesion.votos) == 1
+    assert sesion.votos_sellados == 2
+    assert sum(recuperado.contar_votos("Consulta").values()) == 3
+    assert recuperado.emitir_voto_sesion("ana", ids[0], "Consulta") is False
+    assert recuperado.finalizar_votacion("Consulta")
+    assert sum(recuperado.contar_votos("Consulta").values()) == 3
+
+
+def test_corte_entre_guardar_el_bloque_y_reescribir_el_diario(sistema, monkeypatch):
+    votar(sistema, "Consulta", ["ana", "luis", "eva"])
+    sesion = sistema.sesiones["Consulta"]
+    # El diario conserva todos los votos, también los ya sellados en el bloque guardado
+    monkeypatch.setattr(sistema, "_reescribir_diario", lambda sesion: None)
+    with sesion.lock:
+        assert sistema._sellar_votos_pendientes(sesion, 2)
+
+    recuperado = reiniciar()
+
+    sesion = recuperado.sesiones["Consulta"]
+    assert len(sesion.votos) == 1
+    assert sesion.votos_sellados == 2
+    assert sum(recuperado.contar_votos("Consulta").values()) == 3
+
+
+def test_sellado_por_tamano_limita_los_votos_pendientes(directorio):
+    sistema = SistemaVotacion.SistemaVotacion(votos_por_bloque=3)
+    votar(sistema, "Consulta", [f"votante {numero}" for numero in range(8)])
+
+    assert [len(bloque.votos) for bloque in sistema.cadena.cadena[1:]] == [3, 3]
+    assert len(sistema.sesiones["Consulta"].votos) == 2
+    assert sum(sistema.contar_votos("Consulta").values()) == 8
+    assert sistema.finalizar_votacion("Consulta")
+    assert [len(bloque.votos) for bloque in sistema.cadena.cadena[1:]] == [3, 3, 2]
+
+
+def test_corte_al_finalizar_sella_los_votos_pendientes(sistema):
+    votar(sistema, "Consulta", ["ana", "luis"])
+    diario = sistema.sesiones["Consulta"].diario
+    diario.esperar(diario.anotar({"tipo": "fin"}), forzar=True)  # Corte antes de añadir el bloque
+
+    recuperado = reiniciar()
+
+    assert recuperado.sesiones == {}
+    assert len(recuperado.cadena.cadena) == 2
+    assert sum(recuperado.contar_votos("Consulta").values()) == 2
+    assert not os.path.exists(diario.ruta)
+
+    # El diario ya no existe: un segundo reinicio no vuelve a sellar los votos
+    assert len(reiniciar().cadena.cadena) == 2
+
+
+def test_lote_sellado_en_parte_y_descartado_solo_descuenta_los_pendientes(directorio, monkeypatch):
+    sistema = SistemaVotacion.SistemaVotacion(votos_por_bloque=3)
+    votar(sistema, "Consulta", ["ana"])
+    sesion = sistema.sesiones["Consulta"]
+    # El lote completa un bloque (se sellan 3 votos) y falla al esperar al diario
+    monkeypatch.setattr(sesion.diario, "esperar", lambda ticket, forzar=False: False)
+
+    resultados = sistema.emitir_votos_lote([(f"votante {numero}", "0") for numero in range(4)], "Consulta")
+
+    assert resultados == [None, None, "error_diario", "error_diario"]
+    assert len(sistema.cadena.cadena[1].votos) == 3
+    assert sesion.votos == []
+    assert sesion.votantes == set()
+    assert sum(sesion.recuento.values()) == 0  # Sin votos pendientes: nada descontado de más
+    assert sesion.estado()["numero_votos_recibidos"] == 3
+    assert sum(sistema.contar_votos("Consulta").values()) == 3
@@ -0,0 +1,66 @@
+import json
+
+import PublicadorEventos
+
+from conftest import votar
+
+
+def leer_evento(eventos):
+    """Siguiente evento SSE del generador como (tipo, datos), saltando los latidos."""
+    while True:
+        texto = next(eventos)
+        if isinstance(texto, bytes):
+            texto = texto.decode("utf-8")
+        if not texto.startswith(":"):
+            break
+    tipo, datos = texto.rstrip("\n").split("\n")
+    return tipo[len("event: "):], json.loads(datos[len("data: "):])
+
+
+def test_diferencia():
+    anterior = {"a": 1, "b": {"x": 1, "y": 2}, "c": 3}
+    nuevo = {"a": 1, "b": {"x": 1, "y": 5, "z": 0}, "d": 4}
+    assert PublicadorEventos.diferencia(anterior, nuevo) == {"b": {"y": 5, "z": 0}, "d": 4, "c": None}
+
+
+def test_estado_inicial_y_despues_solo_cambios():
+    estado = {"votos": {"A": 1}}
+    calculos = []
+
+    def calcular(tema):
+        calculos.append(tema)
+        return {"votos": dict(estado["votos"])}
+
+    publicador = PublicadorEventos.PublicadorEventos(intervalo=0, intervalo_latido=5)
+    publicador.registrar_canal("resultados", calcular)
+    primero = publicador.suscribir("resultados", "Consulta")
+    segundo = publicador.suscribir("resultados", "Consulta")
+    assert leer_evento(primero) == ("estado", {"votos": {"A": 1}})
+    assert leer_evento(segundo) == ("estado", {"votos": {"A": 1}})
+    calculos.clear()
+
+    estado["votos"] = {"A": 1, "B": 2}
+    publicador.notificar("Consulta")
+
+    assert leer_evento(primero) == ("cambios", {"votos": {"B": 2}})
+    assert leer_evento(segundo) == ("cambios", {"votos": {"B": 2}})
+    assert calculos == ["Consulta"]  # Una sola vez para los dos suscriptores
+    primero.close()
+    segundo.close()
+
+
+def test_stream_de_la_votacion_activa(servidor, cliente):
+    id_a, _ = votar(servidor.sistema_votacion, "Consulta", ["ana"])
+    respuesta = cliente.get("/votacion/activa/stream?tema=Consulta", buffered=False)
+    assert respuesta.mimetype == "text/event-stream"
+    eventos = iter(respuesta.response)
+
+    tipo, estado = leer_evento(eventos)
+    assert (tipo, estado["numero_votos_recibidos"]) == ("estado", 1)
+
+    assert servidor.sistema_votacion.emitir_voto_sesion("luis", id_a, "Consulta") is True
+    assert leer_evento(eventos) == ("cambios", {"numero_votos_recibidos": 2, "numero_votantes_participantes": 2})
+
+    assert servidor.sistema_votacion.finalizar_votacion("Consulta")
+    assert leer_evento(eventos) == ("estado", None)
+    respuesta.close()
@@ -0,0 +1,74 @@
+import json
+
+import Bloque
+import FragmentosBloques
+
+from conftest import votar
+
+
+def crear_bloque(votos, tema="Consulta"):
+    return Bloque.Bloque.crear_nuevo_bloque(Bloque.Bloque.crear_bloque_genesis(), votos, tema)
+
+
+def votos_habituales(numero, tema="Consulta"):
+    return [{"timestamp": 1700000000.0 + i / 3, "id_votante_hash": f"{i:064x}", "id_candidato": str(i % 4),
+             "tema_votacion": tema} for i in range(numero)]
+
+
+def test_a_json_coincide_con_json_dumps():
+    votos_raros = [{"timestamp": 1700000000, "id_votante_hash": "ABC", "id_candidato": "x", "tema_votacion": "Consulta"}]
+    for bloque in (crear_bloque(votos_habituales(7)), crear_bloque(votos_habituales(3, 'Tema "ñ"\n'), 'Tema "ñ"\n'),
+                   crear_bloque(votos_raros), Bloque.Bloque.crear_bloque_genesis()):
+        for incluir_votos in (True, False):
+            esperado = json.dumps(bloque.a_diccionario(incluir_votos), separators=(",", ":"), ensure_ascii=False)
+            assert bloque.a_json(incluir_votos).decode("utf-8") == esperado
+
+
+def test_fragmento_se_genera_una_vez_y_no_confunde_bloques(monkeypatch):
+    fragmentos = FragmentosBloques.FragmentosBloques()
+    bloque = crear_bloque(votos_habituales(3))
+    generados = []
+    a_json = Bloque.Bloque.a_json
+    monkeypatch.setattr(Bloque.Bloque, "a_json", lambda self, incluir_votos=True: generados.append(self.index) or a_json(self, incluir_votos))
+
+    assert fragmentos.obtener(bloque) == fragmentos.obtener(bloque)
+    assert generados == [1]
+    assert fragmentos.obtener(bloque, incluir_votos=False) != fragmentos.obtener(bloque)
+    otro = crear_bloque(votos_habituales(2))  # Mismo index, distinto hash_actual
+    assert json.loads(fragmentos.obtener(otro))["hash_actual"] == otro.hash_actual
+
+
+def test_fragmentos_acotados_en_bytes():
+    bloques = [crear_bloque(votos_habituales(5)) for _ in range(5)]
+    tamano = max(len(bloque.a_json()) for bloque in bloques)  # El timestamp del bloque no siempre ocupa lo mismo
+    fragmentos = FragmentosBloques.FragmentosBloques(maximo_bytes=4 * tamano + 4)
+    for bloque in bloques:
+        fragmentos.obtener(bloque)
+    assert fragmentos._bytes <= fragmentos.maximo_bytes
+    assert len(fragmentos._fragmentos) == 4
+
+
+def test_cadena_desde_fragmentos(servidor, cliente):
+    sistema = servidor.sistema_votacion
+    for numero, tema in enumerate(("A", "B", "A")):
+        votar(sistema, tema, [f"ana {numero}", f"luis {numero}"])
+        assert sistema.finalizar_votacion(tema)
+
+    completa = cliente.get("/cadena").get_json()
+    assert completa == [bloque.a_diccionario() for bloque in sistema.cadena.cadena]
+    assert cliente.get("/cadena?desde=1&limite=2").get_json()["bloques"] == completa[1:3]
+    lineas = cliente.get("/cadena?formato=ndjson&tema=A&cabeceras=1").get_data(as_text=True).splitlines()
+    assert [json.loads(linea)["index"] for linea in lineas] == [1, 3]
+    assert all("votos" not in json.loads(linea) for linea in lineas)
+
+
+def test_fragmentos_se_vacian_al_recargar_la_cadena(sistema):
+    votar(sistema, "Consulta", ["ana", "luis"])
+    assert sistema.finalizar_votacion("Consulta")
+    assert len(list(sistema.iterar_bloques_json())) == 2
+    assert len(sistema.fragmentos._fragmentos) == 2
+
+    assert sistema.cargar_datos()
+
+    assert len(sistema.fragmentos._fragmentos) == 0
+    assert b"".join(sistema.iterar_bloques_json()) == b"".join(bloque.a_json() for bloque in sistema.cadena.cadena)
@@ -0,0 +1,76 @@
+import os
+
+import pytest
+
+import SistemaVotacion
+
+from conftest import votar
+
+
+@pytest.fixture
+def cada_tres_bloques(monkeypatch):
+    monkeypatch.setattr(SistemaVotacion.SistemaVotacion, "INSTANTANEA_CADA_BLOQUES", 3)
+
+
+def crear_bloques(sistema, numero):
+    for n in range(numero):
+        votar(sistema, f"Tema {n % 2}", [f"votante {n}-{i}" for i in range(3)])
+        assert sistema.finalizar_votacion(f"Tema {n % 2}")
+
+
+def indices(sistema):
+    return sistema.recuento_por_tema, sistema.recuento_global, sistema.cadena.indice_temas
+
+
+def test_restaura_y_solo_indexa_los_bloques_posteriores(sistema, cada_tres_bloques, monkeypatch):
+    crear_bloques(sistema, 5)
+    assert sistema._index_instantanea == 3
+    esperado = indices(sistema)
+
+    indexados = []
+    indexar = SistemaVotacion.SistemaVotacion._indexar_bloque
+    monkeypatch.setattr(SistemaVotacion.SistemaVotacion, "_indexar_bloque",
+                        lambda self, bloque: indexados.append(bloque.index) or indexar(self, bloque))
+    monkeypatch.setattr(SistemaVotacion.SistemaVotacion, "_reconstruir_indices", lambda self: pytest.fail("No debe recorrer la cadena"))
+
+    restaurado = SistemaVotacion.SistemaVotacion()
+
+    assert indexados == [4, 5]
+    assert indices(restaurado) == esperado
+    assert restaurado.contar_votos("Tema 0") == sistema.contar_votos("Tema 0")
+
+
+def test_instantanea_de_otra_cadena_se_descarta(sistema, cada_tres_bloques):
+    crear_bloques(sistema, 3)
+    with open(sistema.ARCHIVO_INSTANTANEA, "rb") as archivo:
+        instantanea = archivo.read()
+    os.remove(sistema.almacen.ruta)
+    os.remove(sistema.almacen.ruta_datos)
+    otra = SistemaVotacion.SistemaVotacion()  # Cadena nueva con otros bloques y la instantánea anterior
+    crear_bloques(otra, 2)
+    with open(sistema.ARCHIVO_INSTANTANEA, "wb") as archivo:
+        archivo.write(instantanea)
+
+    recargado = SistemaVotacion.SistemaVotacion()
+
+    assert indices(recargado) == indices(otra)
+    assert sum(recargado.contar_votos().values()) == 6
+
+
+def test_instantanea_corrupta_reconstruye_los_indices(sistema, cada_tres_bloques):
+    crear_bloques(sistema, 4)
+    with open(sistema.ARCHIVO_INSTANTANEA, "r+b") as archivo:
+        archivo.seek(-5, os.SEEK_END)
+        archivo.write(b"xxxxx")
+
+    assert indices(SistemaVotacion.SistemaVotacion()) == indices(sistema)
+
+
+def test_punto_de_control_solo_si_el_dat_no_cambia(sistema, cada_tres_bloques):
+    crear_bloques(sistema, 3)
+    assert sistema.verificar_integridad_cadena()
+    assert sistema.guardar_instantanea()
+
+    assert SistemaVotacion.SistemaVotacion().indice_verificado == 3
+    os.utime(sistema.almacen.ruta_datos, ns=(0, 0))
+    assert SistemaVotacion.SistemaVotacion().indice_verificado is None
@@ -0,0 +1,92 @@
+import hashlib
+
+import pytest
+
+import Bloque
+import Merkle
+import SistemaVotacion
+
+from conftest import votar
+
+
+def crear_votos(numero, tema="Consulta"):
+    return [{"timestamp": 1700000000.0 + i, "id_votante_hash": hashlib.sha256(str(i).encode()).hexdigest(),
+             "id_candidato": str(i % 3), "tema_votacion": tema} for i in range(numero)]
+
+
+def raiz_rfc6962(hojas):
+    """Raíz de referencia de RFC 6962: se divide por la mayor potencia de 2 menor que n."""
+    if len(hojas) == 1:
+        return hojas[0]
+    division = 1
+    while division * 2 < len(hojas):
+        division *= 2
+    return Merkle.hash_nodo(raiz_rfc6962(hojas[:division]), raiz_rfc6962(hojas[division:]))
+
+
+TAMANOS = [1, 2, 3, 5, 7, 13, Merkle.TAM_TRAMO - 1, Merkle.TAM_TRAMO, Merkle.TAM_TRAMO + 1,
+           2 * Merkle.TAM_TRAMO + 3, 3 * Merkle.TAM_TRAMO]
+
+
+@pytest.mark.parametrize("numero", TAMANOS)
+def test_raiz_en_tramos_coincide_con_el_arbol_completo(numero):
+    votos = crear_votos(numero)
+    raiz = Merkle.raiz_merkle(votos)
+    assert raiz == raiz_rfc6962([Merkle.hash_hoja(voto) for voto in votos])
+    assert raiz == Merkle.construir_niveles(votos)[-1][0]
+
+
+@pytest.mark.parametrize("numero", TAMANOS)
+def test_pruebas_de_inclusion_enlazan_con_hash_actual(numero):
+    bloque = Bloque.Bloque.crear_nuevo_bloque(Bloque.Bloque.crear_bloque_genesis(), crear_votos(numero), "Consulta")
+    posiciones = range(numero) if numero < 64 else [0, 1, numero // 2, Merkle.TAM_TRAMO - 1, Merkle.TAM_TRAMO, numero - 2, numero - 1]
+    for posicion in posiciones:
+        if posicion >= numero:
+            continue
+        comprobante = bloque.prueba_inclusion(posicion)
+        assert Merkle.hash_hoja(comprobante["voto"]).hex() == comprobante["hash_hoja"]
+        raiz = Merkle.raiz_desde_prueba(bytes.fromhex(comprobante["hash_hoja"]), comprobante["prueba"])
+        assert raiz.hex() == comprobante["raiz_merkle"]
+        assert bloque.hash_desde_raiz(raiz) == bloque.hash_actual
+
+
+def test_prueba_alterada_no_enlaza():
+    bloque = Bloque.Bloque.crear_nuevo_bloque(Bloque.Bloque.crear_bloque_genesis(), crear_votos(7), "Consulta")
+    comprobante = bloque.prueba_inclusion(6)
+    otra_hoja = Merkle.hash_hoja(crear_votos(8)[7])
+    assert bloque.hash_desde_raiz(Merkle.raiz_desde_prueba(otra_hoja, comprobante["prueba"])) != bloque.hash_actual
+
+
+def test_hash_v2_no_depende_del_orden_de_claves():
+    votos = crear_votos(3)
+    bloque = Bloque.Bloque.crear_nuevo_bloque(Bloque.Bloque.crear_bloque_genesis(), votos, "Consulta")
+    bloque.votos = [dict(reversed(list(voto.items()))) for voto in votos]
+    assert bloque.calcular_hash() == bloque.hash_actual
+
+
+def test_bloque_v1_en_la_misma_cadena(sistema):
+    genesis = sistema.cadena.peek()
+    legado = Bloque.Bloque(1, 1700000000.0, crear_votos(3, "Antigua"), genesis.hash_actual, "", "Antigua")
+    assert legado.version == Bloque.Bloque.VERSION_LEGADO
+    legado.hash_actual = legado.calcular_hash()
+    sistema.cadena.cadena.append(legado)
+    assert sistema.guardar_datos()
+    votar(sistema, "Nueva", ["ana", "luis", "eva"])
+    assert sistema.finalizar_votacion()
+    assert sistema.cadena.peek().version == Bloque.Bloque.VERSION_ACTUAL
+
+    recargado = SistemaVotacion.SistemaVotacion()
+    assert [bloque.version for bloque in recargado.cadena.cadena] == [1, 1, 2]
+    assert recargado.verificar_integridad_cadena(completa=True)
+
+    # El hash v1 no se basa en la raíz de Merkle: su comprobante no lleva prueba
+    comprobante_v1, = recargado.obtener_comprobantes(legado.votos[0]["id_votante_hash"])
+    assert comprobante_v1["prueba"] is None
+    comprobante_v2, = recargado.obtener_comprobantes(hashlib.sha256(b"ana").hexdigest())
+    bloque_v2 = recargado.cadena.peek()
+    raiz = Merkle.raiz_desde_prueba(bytes.fromhex(comprobante_v2["hash_hoja"]), comprobante_v2["prueba"])
+    assert bloque_v2.hash_desde_raiz(raiz) == bloque_v2.hash_actual
+
+    recargado.cadena.cadena[1].votos = crear_votos(4, "Antigua")[1:]  # Un bloque v1 alterado se sigue detectando
+    assert recargado.verificar_integridad_cadena(completa=True) is False
+    assert recargado.primer_bloque_invalido == 1
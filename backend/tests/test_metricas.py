@@ -0,0 +1,73 @@
+import logging
+import re
+
+import Metricas
+
+from conftest import votar
+
+# Línea de muestra del formato de texto de Prometheus: nombre{etiquetas} valor
+MUESTRA = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{[^}]*\})? (\S+)$')
+
+
+def leer_muestras(texto):
+    """Comprueba la sintaxis de la exposición y devuelve {(nombre, etiquetas): valor} y los tipos declarados."""
+    muestras, tipos = {}, {}
+    for linea in texto.splitlines():
+        if linea.startswith("# TYPE "):
+            _, _, nombre, tipo = linea.split(" ")
+            assert nombre not in tipos
+            tipos[nombre] = tipo
+        elif not linea.startswith("# HELP "):
+            coincidencia = MUESTRA.match(linea)
+            assert coincidencia, linea
+            nombre, etiquetas, valor = coincidencia.groups()
+            muestras[(nombre, etiquetas or "")] = float(valor)
+    return muestras, tipos
+
+
+def test_contadores_por_motivo(sistema):
+    aceptados = Metricas.registro.valor("votacion_votos_aceptados_total")
+    repetidos = Metricas.registro.valor("votacion_votos_rechazados_total", motivo="ya_voto_sesion")
+    id_a, _ = votar(sistema, "Consulta", ["ana", "luis"])
+    assert sistema.emitir_voto_sesion("ana", id_a, "Consulta") is False
+    assert Metricas.registro.valor("votacion_votos_aceptados_total") == aceptados + 2
+    assert Metricas.registro.valor("votacion_votos_rechazados_total", motivo="ya_voto_sesion") == repetidos + 1
+
+
+def test_exposicion_en_formato_prometheus(servidor, cliente):
+    votar(servidor.sistema_votacion, "Consulta", ["ana", "luis", "eva"])
+    assert servidor.sistema_votacion.finalizar_votacion("Consulta")
+    cliente.get("/resultados")
+
+    respuesta = cliente.get("/metricas")
+    assert respuesta.status_code == 200
+    assert respuesta.mimetype == "text/plain"
+    muestras, tipos = leer_muestras(respuesta.get_data(as_text=True))
+
+    assert tipos["votacion_votos_aceptados_total"] == "counter"
+    assert tipos["http_peticion_segundos"] == "histogram"
+    assert tipos["votacion_bloques"] == "gauge"
+    assert muestras[("votacion_bloques", "")] == 2
+    assert muestras[("votacion_sesiones_activas", "")] == 0
+    assert muestras[("votacion_votos_aceptados_total", "")] == Metricas.registro.valor("votacion_votos_aceptados_total")
+
+    # Buckets acumulados y no decrecientes; +Inf coincide con _count
+    etiquetas = '{estado="200",metodo="GET",ruta="/resultados"'
+    buckets = [valor for (nombre, etiq), valor in muestras.items()
+               if nombre == "http_peticion_segundos_bucket" and etiq.startswith(etiquetas)]
+    assert buckets == sorted(buckets)
+    assert muestras[("http_peticion_segundos_bucket", etiquetas + ',le="+Inf"}')] == buckets[-1]
+    assert muestras[("http_peticion_segundos_count", etiquetas + "}")] == buckets[-1] >= 1
+
+
+def test_resultados_y_estructura_se_muestran_en_el_log(sistema, caplog, capsys):
+    votar(sistema, "Consulta", ["ana", "luis", "eva"])
+    assert sistema.finalizar_votacion("Consulta")
+
+    with caplog.at_level(logging.INFO, logger="SistemaVotacion"):
+        assert sistema.mostrar_resultados("Consulta")
+        assert sistema.mostrar_estructura_cadena()
+
+    assert "A (ID: 0): 2 votos" in caplog.messages
+    assert "    - B: 1 votos" in caplog.messages
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,27 @@
+import SistemaVotacion
+
+from conftest import votar
+
+
+def test_recuentos_confirmados_y_pendientes(sistema):
+    a, b = votar(sistema, "Consulta", ["ana", "luis", "eva"])
+    assert sistema.contar_votos() == {a: 2, b: 1}  # Votos pendientes de la votación activa
+    assert sistema.finalizar_votacion()
+    votar(sistema, "Otra", ["ana", "luis"])
+
+    assert sistema.contar_votos("Consulta") == {a: 2, b: 1}
+    assert sistema.contar_votos("Otra") == {a: 1, b: 1}
+    assert sistema.contar_votos() == {a: 3, b: 2}
+    assert sistema.contar_votos("Sin votos") == {}
+
+
+def test_recuentos_se_reconstruyen_al_cargar(sistema):
+    a, b = votar(sistema, "Consulta", ["ana", "luis", "eva"])
+    assert sistema.finalizar_votacion()
+    votar(sistema, "Otra", ["ana"])
+    assert sistema.finalizar_votacion()
+
+    recargado = SistemaVotacion.SistemaVotacion()
+
+    assert recargado.contar_votos() == sistema.contar_votos() == {a: 3, b: 1}
+    assert recargado.contar_votos("Otra") == {a: 1}
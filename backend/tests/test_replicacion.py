@@ -0,0 +1,104 @@
+import contextlib
+import io
+import os
+import urllib.parse
+
+import pytest
+
+import Replicador
+import SistemaVotacion
+
+from conftest import votar
+
+
+@pytest.fixture
+def replica(servidor, directorio, monkeypatch):
+    """
+    Réplica en su propio directorio cuyas peticiones al primario (el módulo app del fixture
+    'servidor') se atienden con el cliente de pruebas de Flask en lugar de por HTTP.
+    """
+    cliente = servidor.app.test_client()
+    peticiones = []
+
+    def pedir(self, ruta, **parametros):
+        url = ruta + ("?" + urllib.parse.urlencode(parametros) if parametros else "")
+        peticiones.append(url)
+        respuesta = cliente.get(url)
+        assert respuesta.status_code == 200, respuesta.get_data(as_text=True)
+        return io.BytesIO(respuesta.get_data())
+
+    monkeypatch.setattr(Replicador.Replicador, "_pedir", pedir)
+    (directorio / "replica").mkdir()
+    with en_directorio(directorio / "replica"):  # Los archivos de la réplica, aparte de los del primario
+        sistema = SistemaVotacion.SistemaVotacion()
+    replicador = Replicador.Replicador(sistema, "http://primario")
+    replicador.peticiones = peticiones
+    return replicador
+
+
+@contextlib.contextmanager
+def en_directorio(ruta):
+    """El sistema guarda sus archivos en el directorio actual: cada nodo trabaja en el suyo."""
+    anterior = os.getcwd()
+    os.chdir(ruta)
+    try:
+        yield
+    finally:
+        os.chdir(anterior)
+
+
+def crear_bloques(sistema, temas):
+    for tema in temas:
+        votar(sistema, tema, ["ana", "luis"])
+        assert sistema.finalizar_votacion(tema)
+
+
+def hashes(sistema):
+    return [bloque.hash_actual for bloque in sistema.cadena.cadena]
+
+
+def test_replica_se_pone_al_dia_por_paginas(servidor, replica, monkeypatch):
+    primario = servidor.sistema_votacion
+    crear_bloques(primario, [f"Tema {n}" for n in range(5)])
+    monkeypatch.setattr(Replicador.Replicador, "BLOQUES_POR_PETICION", 2)
+
+    with en_directorio("replica"):
+        assert replica.sincronizar() == 5  # Mismo génesis: solo faltan los bloques siguientes
+    assert hashes(replica.sistema) == hashes(primario)
+    assert replica.sistema.candidatos_globales == primario.candidatos_globales
+    assert replica.sistema.contar_votos() == primario.contar_votos()
+    assert [url for url in replica.peticiones if url.startswith("/cadena")] == [
+        "/cadena?desde=1&limite=2&formato=ndjson", "/cadena?desde=3&limite=2&formato=ndjson",
+        "/cadena?desde=5&limite=2&formato=ndjson"]
+    assert replica.estado()["retraso_bloques"] == 0
+
+    # En la siguiente ronda solo se piden los bloques nuevos, a partir de la punta común
+    crear_bloques(primario, ["Tema 5"])
+    replica.peticiones.clear()
+    with en_directorio("replica"):
+        assert replica.sincronizar() == 1
+    assert [url for url in replica.peticiones if url.startswith("/cadena")] == ["/cadena?desde=6&limite=2&formato=ndjson"]
+    assert hashes(replica.sistema) == hashes(primario)
+    # Los bloques replicados se guardaron: la réplica los recupera al reiniciar
+    with en_directorio("replica"):
+        assert hashes(SistemaVotacion.SistemaVotacion()) == hashes(primario)
+
+
+def test_cadena_divergente_detiene_la_replicacion(servidor, replica):
+    crear_bloques(servidor.sistema_votacion, ["Tema 0"])
+    with en_directorio("replica"):
+        crear_bloques(replica.sistema, ["Propio"])
+        assert replica.sincronizar() == 0
+    assert replica.divergente
+    assert [bloque.tema_votacion for bloque in replica.sistema.cadena.cadena[1:]] == ["Propio"]
+
+
+def test_bloque_alterado_no_se_incorpora(servidor, replica):
+    primario = servidor.sistema_votacion
+    crear_bloques(primario, ["Tema 0", "Tema 1"])
+    primario.cadena.cadena[2].tema_votacion = "Alterado"  # Su hash ya no coincide
+
+    with en_directorio("replica"):
+        assert replica.sincronizar() == 1
+    assert replica.divergente
+    assert hashes(replica.sistema) == hashes(primario)[:2]
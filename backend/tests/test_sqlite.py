@@ -0,0 +1,56 @@
+import SistemaVotacionSQLite
+
+
+def instancia():
+    # Sin refresco periódico: cada instancia solo ve los cambios de las demás al llamar a refrescar()
+    return SistemaVotacionSQLite.SistemaVotacionSQLite("votacion.sqlite", intervalo_refresco=0)
+
+
+def test_voto_duplicado_desde_otra_instancia(directorio):
+    primera, segunda = instancia(), instancia()
+    assert primera.iniciar_votacion("Consulta")
+    id_a = primera.agregar_candidato_a_votacion("A", "Consulta")
+    id_b = primera.agregar_candidato_a_votacion("B", "Consulta")
+    segunda.refrescar()
+    assert primera.emitir_voto_sesion("ana", id_a, "Consulta") is True
+
+    # La memoria de la segunda aún no tiene el voto: lo rechaza el índice único de la base de datos
+    assert segunda.sesiones["Consulta"].votos == []
+    assert segunda.emitir_voto_sesion("ana", id_b, "Consulta") is False
+    assert segunda.emitir_votos_lote([("ana", id_b), ("luis", id_b)], "Consulta") == ["ya_voto_sesion", None]
+
+    primera.refrescar()
+    assert primera.contar_votos("Consulta") == segunda.contar_votos("Consulta") == {id_a: 1, id_b: 1}
+
+
+def test_instancia_nueva_ve_los_mismos_resultados(directorio):
+    primera, segunda = instancia(), instancia()
+    assert primera.iniciar_votacion("Consulta")
+    id_a = primera.agregar_candidato_a_votacion("A", "Consulta")
+    segunda.refrescar()
+    for numero in range(5):
+        assert (primera, segunda)[numero % 2].emitir_voto_sesion(f"votante-{numero}", id_a, "Consulta") is True
+    assert segunda.finalizar_votacion("Consulta")
+    assert primera.emitir_voto_sesion("tarde", id_a, "Consulta") is False  # Finalizada por la otra instancia
+
+    nueva = instancia()
+    primera.refrescar()
+    assert nueva.contar_votos("Consulta") == primera.contar_votos("Consulta") == segunda.contar_votos("Consulta") == {id_a: 5}
+    assert nueva.sesiones == primera.sesiones == {}
+    assert [bloque.hash_actual for bloque in nueva.cadena.cadena] == [bloque.hash_actual for bloque in primera.cadena.cadena]
+    assert nueva.verificar_integridad_cadena(completa=True)
+
+
+
+def test_marca_archivo_sigue_las_transacciones(directorio):
+    primera, segunda = instancia(), instancia()
+    assert primera.iniciar_votacion("Consulta")
+    id_a = primera.agregar_candidato_a_votacion("A", "Consulta")
+    marca = primera.marca_archivo()
+    assert primera.ultimo_timestamp_archivo == marca
+
+    segunda.refrescar()
+    assert segunda.emitir_voto_sesion("ana", id_a, "Consulta") is True
+    assert primera.marca_archivo() > marca  # Cambia con cada transacción confirmada, sin esperar al checkpoint del WAL
+    primera.refrescar()
+    assert primera.ultimo_timestamp_archivo == primera.marca_archivo()
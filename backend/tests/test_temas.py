@@ -0,0 +1,39 @@
+import SistemaVotacion
+
+from conftest import votar
+
+
+def test_indice_de_temas_se_mantiene_y_se_reconstruye(sistema):
+    for votantes in (["ana", "luis"], ["eva"]):
+        votar(sistema, "Consulta", votantes)
+        assert sistema.finalizar_votacion("Consulta")
+    votar(sistema, "Otra", ["ana"])
+    assert sistema.finalizar_votacion("Otra")
+
+    indice = sistema.cadena.indice_temas
+    assert indice["Consulta"]["bloques"] == [1, 2]
+    assert indice["Consulta"]["numero_votos"] == 3
+    assert [bloque.index for bloque in sistema.cadena.bloques_de_tema("Otra")] == [3]
+    assert sistema.cadena.bloques_de_tema("Sin votos") == []
+
+    recargado = SistemaVotacion.SistemaVotacion()
+    assert recargado.cadena.indice_temas == indice
+
+
+def test_temas_api(servidor, cliente):
+    sistema = servidor.sistema_votacion
+    id_a, id_b = votar(sistema, "Consulta", ["ana", "luis"])
+    assert sistema.finalizar_votacion("Consulta")
+    votar(sistema, "Abierta", ["eva"])
+
+    temas = {tema["tema"]: tema for tema in cliente.get("/temas").get_json()["temas"]}
+
+    consulta = temas["Consulta"]
+    bloque = sistema.cadena.cadena[1]
+    assert (consulta["bloques"], consulta["numero_bloques"], consulta["numero_votos"]) == ([1], 1, 2)
+    assert consulta["primer_voto"] == bloque.votos[0]["timestamp"]
+    assert consulta["ultimo_voto"] == bloque.votos[-1]["timestamp"]
+    assert consulta["candidatos"] == {id_a: "A", id_b: "B"}
+    assert consulta["votacion_activa"] is False
+    assert temas["Abierta"]["numero_votos"] == 0
+    assert temas["Abierta"]["votacion_activa"] is True
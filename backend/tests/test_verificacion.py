@@ -0,0 +1,84 @@
+import pytest
+
+import SistemaVotacion
+
+from conftest import votar
+
+
+def crear_bloques(sistema, numero):
+    for n in range(numero):
+        votar(sistema, f"Tema {n}", [f"votante-{n}-{i}" for i in range(3)])
+        assert sistema.finalizar_votacion()
+
+
+def test_verificacion_incremental_solo_comprueba_bloques_nuevos(sistema):
+    crear_bloques(sistema, 3)
+    assert sistema.verificar_integridad_cadena()
+    assert sistema.indice_verificado == 3
+    sistema.cadena.cadena[2].timestamp += 1  # Bloque ya verificado alterado en memoria
+    votar(sistema, "Nuevo", ["ana"])
+    assert sistema.finalizar_votacion()
+
+    assert sistema.verificar_integridad_cadena() is True
+    assert sistema.indice_verificado == 4
+    assert sistema.verificar_integridad_cadena(completa=True) is False
+
+
+@pytest.mark.parametrize("workers", [None, 2])
+def test_auditoria_fallida_no_deja_punto_de_control_posterior(sistema, workers):
+    crear_bloques(sistema, 20)
+    assert sistema.verificar_integridad_cadena()
+    assert sistema.indice_verificado == 20
+
+    sistema.cadena.cadena[17].timestamp += 1  # Bloque alterado en memoria: su hash ya no coincide
+
+    assert sistema.verificar_integridad_cadena() is True  # Ya estaba verificado: la incremental no lo recorre
+    assert sistema.verificar_integridad_cadena(completa=True, workers=workers) is False
+    assert sistema.primer_bloque_invalido == 17
+    assert sistema.indice_verificado == 16
+
+    # La siguiente verificación incremental vuelve a comprobar el bloque inválido
+    assert sistema.verificar_integridad_cadena() is False
+    assert sistema.primer_bloque_invalido == 17
+    assert sistema.indice_verificado == 16
+
+
+def test_bloque_nuevo_invalido_no_avanza_el_punto_de_control(sistema):
+    crear_bloques(sistema, 3)
+    assert sistema.verificar_integridad_cadena()
+    for n in range(2):
+        votar(sistema, f"Nuevo {n}", ["a", "b"])
+        assert sistema.finalizar_votacion()
+    sistema.cadena.cadena[4].hash_anterior = "0" * 64
+
+    assert sistema.verificar_integridad_cadena() is False
+    assert sistema.primer_bloque_invalido == 4
+    assert sistema.indice_verificado == 3
+    assert sistema.verificar_integridad_cadena() is False
+
+
+def test_cadena_sustituida_durante_la_verificacion_no_deja_punto_de_control(sistema, monkeypatch):
+    crear_bloques(sistema, 3)
+    buscar = sistema._buscar_bloque_invalido
+
+    def buscar_mientras_se_sustituye(bloques, inicio, workers):
+        # Otro hilo sustituye la cadena mientras se recalculan los hashes fuera del bloqueo
+        sistema.cadena.cadena = list(sistema.cadena.cadena[:2])
+        return buscar(bloques, inicio, workers)
+
+    monkeypatch.setattr(sistema, "_buscar_bloque_invalido", buscar_mientras_se_sustituye)
+    assert sistema.verificar_integridad_cadena() is True
+    assert sistema.indice_verificado is None
+
+
+def test_auditorias_en_paralelo_reutilizan_el_pool(sistema, monkeypatch):
+    monkeypatch.setattr(SistemaVotacion.os, "cpu_count", lambda: 2)
+    crear_bloques(sistema, 6)
+    assert sistema.verificar_integridad_cadena(completa=True, workers=2)
+    pool = sistema._pool_verificacion
+    assert pool is not None
+    assert sistema.verificar_integridad_cadena(completa=True, workers=2)
+    assert sistema.verificar_integridad_cadena(completa=True, workers=8)  # Limitado a os.cpu_count()
+    assert sistema._pool_verificacion is pool
+    sistema._cerrar_pool_verificacion()
+    assert sistema._pool_verificacion is None
@@ -0,0 +1,32 @@
+import SistemaVotacion
+
+from conftest import votar
+
+
+def test_votante_confirmado_no_vuelve_a_votar_en_el_mismo_tema(sistema):
+    ids = votar(sistema, "Consulta", ["ana", "luis"])
+    assert sistema.emitir_voto_sesion("ana", ids[1]) is False  # Ya votó en la sesión
+    assert sistema.finalizar_votacion()
+
+    assert sistema.iniciar_votacion("Consulta")
+    sistema.agregar_candidato_a_votacion("A")
+    assert sistema.emitir_voto_sesion("ana", ids[0]) is False  # Ya votó en un bloque de este tema
+    assert sistema.emitir_voto_sesion("eva", ids[0]) is True
+
+
+def test_votante_puede_votar_en_otro_tema(sistema):
+    votar(sistema, "Consulta", ["ana"])
+    assert sistema.finalizar_votacion()
+    votar(sistema, "Otra consulta", ["ana"])
+
+
+def test_indice_de_votantes_se_reconstruye_al_cargar(sistema):
+    ids = votar(sistema, "Consulta", ["ana", "luis"])
+    assert sistema.finalizar_votacion()
+
+    recargado = SistemaVotacion.SistemaVotacion()
+
+    assert recargado.iniciar_votacion("Consulta")
+    recargado.agregar_candidato_a_votacion("A")
+    assert recargado.emitir_voto_sesion("luis", ids[0]) is False
+    assert recargado.emitir_voto_sesion("eva", ids[0]) is True
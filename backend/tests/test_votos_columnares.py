@@ -0,0 +1,54 @@
+import hashlib
+import json
+
+import Bloque
+import Merkle
+import SistemaVotacion
+import VotosColumnares
+
+from conftest import votar
+
+
+def crear_votos(numero, tema="Consulta"):
+    return [{"timestamp": 1700000000.0 + i / 7, "id_votante_hash": hashlib.sha256(str(i).encode()).hexdigest(),
+             "id_candidato": str(i % 3), "tema_votacion": tema} for i in range(numero)]
+
+
+def test_columnas_reproducen_los_votos_originales():
+    votos = crear_votos(10)
+    columnar = VotosColumnares.VotosColumnares.desde_votos(votos, "Consulta")
+    assert columnar == votos
+    assert list(columnar) == votos
+    assert columnar[-1] == votos[-1] and columnar[2:5] == votos[2:5]
+    assert json.dumps(list(columnar)) == json.dumps(votos)
+    assert list(columnar.hashes_votantes()) == [voto["id_votante_hash"] for voto in votos]
+    assert columnar.recuento() == {"0": 4, "1": 3, "2": 3}
+    assert list(columnar.codificaciones()) == [Merkle.codificar_voto(voto) for voto in votos]
+
+
+def test_votos_con_otro_formato_se_conservan_como_diccionarios():
+    votos = crear_votos(3)
+    for cambio in ({"id_candidato": "007"}, {"id_votante_hash": votos[0]["id_votante_hash"].upper()},
+                   {"timestamp": 1700000000}, {"tema_votacion": "Otro"}, {"extra": 1}):
+        alterados = crear_votos(3)
+        alterados[1].update(cambio)
+        assert VotosColumnares.compactar(alterados, "Consulta") is alterados
+
+
+def test_hash_y_serializacion_no_cambian(sistema):
+    votos = crear_votos(5)
+    bloque = Bloque.Bloque.crear_nuevo_bloque(Bloque.Bloque.crear_bloque_genesis(), votos, "Consulta")
+    assert isinstance(bloque.votos, VotosColumnares.VotosColumnares)
+    assert bloque.calcular_raiz_merkle() == Merkle.raiz_merkle(votos)
+    bloque.votos = votos  # Los mismos votos como lista de diccionarios
+    assert bloque.calcular_hash() == bloque.hash_actual
+    legado = Bloque.Bloque(1, 1700000000.0, votos, "0", "", "Consulta")
+    assert legado.calcular_hash() == hashlib.sha256((
+        "1" + "1700000000.0" + str(votos) + "0" + "Consulta").encode()).hexdigest()
+
+    votar(sistema, "Consulta", ["ana", "luis", "eva"])
+    assert sistema.finalizar_votacion("Consulta")
+    recargado = SistemaVotacion.SistemaVotacion()
+    assert isinstance(recargado.cadena.peek().votos, VotosColumnares.VotosColumnares)
+    assert recargado.cadena.peek().votos == sistema.cadena.peek().votos
+    assert recargado.verificar_integridad_cadena(completa=True)
@@ -0,0 +1,54 @@
+import json
+
+import SistemaVotacion
+
+from conftest import votar
+
+
+def test_motivos_por_voto(servidor, cliente):
+    sistema = servidor.sistema_votacion
+    id_a, id_b = votar(sistema, "Consulta", ["ana"])
+    votar(sistema, "Anterior", ["luis"])
+    assert sistema.finalizar_votacion("Anterior")
+
+    respuesta = cliente.post("/votacion/votar/lote", json={"tema": "Consulta", "votos": [
+        {"id_votante": "eva", "id_candidato": id_a},
+        {"id_votante": "ana", "id_candidato": id_b},
+        {"id_votante": "marta", "id_candidato": "999"},
+        "no es un voto",
+        {"id_candidato": id_a},
+        {"id_votante": "eva", "id_candidato": id_b},
+        {"id_votante": "luis", "id_candidato": id_b},
+    ]})
+
+    assert respuesta.status_code == 200
+    cuerpo = respuesta.get_json()
+    assert [resultado.get("motivo") for resultado in cuerpo["resultados"]] == [
+        None, "ya_voto_sesion", "candidato_invalido", "formato_invalido", "sin_votante", "duplicado_lote", None]
+    assert (cuerpo["aceptados"], cuerpo["rechazados"]) == (2, 5)
+    assert sistema.contar_votos("Consulta") == {id_a: 2, id_b: 1}
+
+
+def test_lote_ndjson_con_linea_invalida(servidor, cliente):
+    id_a, _ = votar(servidor.sistema_votacion, "Consulta", [])
+    lineas = [json.dumps({"id_votante": "ana", "id_candidato": id_a}), "{no es json", json.dumps({"id_votante": "eva", "id_candidato": id_a})]
+
+    respuesta = cliente.post("/votacion/votar/lote?tema=Consulta", data="\n".join(lineas), content_type="application/x-ndjson")
+
+    assert [resultado["aceptado"] for resultado in respuesta.get_json()["resultados"]] == [True, False, True]
+    assert respuesta.get_json()["resultados"][1]["motivo"] == "formato_invalido"
+
+
+def test_lote_vacio_o_sin_votacion(servidor, cliente):
+    assert cliente.post("/votacion/votar/lote", json={"tema": "Consulta", "votos": []}).status_code == 400
+    assert cliente.post("/votacion/votar/lote", json={"tema": "Consulta", "votos": [{"id_votante": "ana", "id_candidato": "0"}]}).status_code == 404
+
+
+def test_lote_se_recupera_del_diario(sistema):
+    id_a, id_b = votar(sistema, "Consulta", [])
+    assert sistema.emitir_votos_lote([("ana", id_a), ("luis", id_b), ("ana", id_b)], "Consulta") == [None, None, "duplicado_lote"]
+
+    recuperado = SistemaVotacion.SistemaVotacion()
+
+    assert recuperado.contar_votos("Consulta") == {id_a: 1, id_b: 1}
+    assert recuperado.emitir_voto_sesion("luis", id_a, "Consulta") is False
@@ -105,6 +105,89 @@ function actualizarLista(listId, data, displayField = null, keyIsId = true) {
 }
 
 // --- Gestión del Estado de la Interfaz ---
+let temaSeleccionado = null; // Tema de la votación activa sobre la que actúa la interfaz (puede haber varias)
+
+function actualizarSelectorSesiones(temas) {
+    const select = document.getElementById('select-sesion-activa');
+    select.innerHTML = '';
+    temas.forEach(tema => {
+        const option = document.createElement('option');
+        option.value = tema;
+        option.textContent = tema;
+        option.selected = tema === temaSeleccionado;
+        select.appendChild(option);
+    });
+}
+
+function seleccionarSesion() {
+    temaSeleccionado = document.getElementById('select-sesion-activa').value || null;
+    obtenerEstadoVotacionActiva();
+}
+
+// --- Actualizaciones en Tiempo Real (Server-Sent Events) ---
+// El servidor envía un evento 'estado' con el estado completo al suscribirse y eventos 'cambios'
+// con solo lo que ha cambiado (una clave con valor null se ha eliminado).
+let fuenteEstadoVotacion = null;
+let fuenteResultados = null;
+
+function aplicarCambios(estado, cambios) {
+    const nuevo = { ...estado };
+    for (const [clave, valor] of Object.entries(cambios)) {
+        if (valor === null) {
+            delete nuevo[clave];
+        } else if (typeof valor === 'object' && !Array.isArray(valor) && typeof nuevo[clave] === 'object' && nuevo[clave] !== null) {
+            nuevo[clave] = { ...nuevo[clave] };
+            for (const [subclave, subvalor] of Object.entries(valor)) {
+                if (subvalor === null) {
+                    delete nuevo[clave][subclave];
+                } else {
+                    nuevo[clave][subclave] = subvalor;
+                }
+            }
+        } else {
+            nuevo[clave] = valor;
+        }
+    }
+    return nuevo;
+}
+
+function suscribirEventos(ruta, tema, alRecibir) {
+    const url = new URL(`${API_BASE_URL}${ruta}`, window.location.origin);
+    if (tema) {
+        url.searchParams.append('tema', tema);
+    }
+    const fuente = new EventSource(url.toString());
+    let estado = null;
+    fuente.addEventListener('estado', evento => {
+        estado = JSON.parse(evento.data);
+        alRecibir(estado);
+    });
+    fuente.addEventListener('cambios', evento => {
+        estado = aplicarCambios(estado || {}, JSON.parse(evento.data));
+        alRecibir(estado);
+    });
+    return fuente; // EventSource se reconecta solo si se corta la conexión
+}
+
+function suscribirEstadoVotacion() {
+    if (fuenteEstadoVotacion) {
+        fuenteEstadoVotacion.close();
+    }
+    const temaSuscrito = temaSeleccionado;
+    fuenteEstadoVotacion = suscribirEventos('/votacion/activa/stream', temaSuscrito, estado => {
+        if (!estado && temaSuscrito) {
+            // La votación seleccionada ha finalizado: se pasa a la iniciada más recientemente
+            temaSeleccionado = null;
+            suscribirEstadoVotacion();
+            return;
+        }
+        actualizarUIEstadoVotacion(estado);
+        if (estado && !temaSuscrito) {
+            suscribirEstadoVotacion(); // Seguir a partir de ahora a la votación concreta mostrada
+        }
+    });
+}
+
 function actualizarUIEstadoVotacion(estado) {
     const iniciarSection = document.getElementById('iniciar-votacion-section');
     const estadoSection = document.getElementById('estado-votacion-activa');
@@ -113,9 +196,13 @@ function actualizarUIEstadoVotacion(estado) {
     const finalizarSection = document.getElementById('finalizar-votacion-section');
     const temaActivoSpans = document.querySelectorAll('.tema-activo-ref'); // Para actualizar el tema en varios lugares
 
+    // La sección de inicio siempre está visible: se pueden celebrar varias votaciones a la vez
+    iniciarSection.style.display = 'block';
+
     if (estado && estado.tema_activo) {
-        // Hay una votación activa
-        iniciarSection.style.display = 'none';
+        // Hay al menos una votación activa; se muestra la seleccionada
+        temaSeleccionado = estado.tema_activo;
+        actualizarSelectorSesiones(estado.sesiones_activas || [estado.tema_activo]);
         estadoSection.style.display = 'block';
         agregarCandidatoSection.style.display = 'block';
         emitirVotoSection.style.display = 'block';
@@ -132,7 +219,7 @@ function actualizarUIEstadoVotacion(estado) {
 
     } else {
         // No hay votación activa
-        iniciarSection.style.display = 'block';
+        temaSeleccionado = null;
         estadoSection.style.display = 'none';
         agregarCandidatoSection.style.display = 'none';
         emitirVotoSection.style.display = 'none';
@@ -142,13 +229,24 @@ function actualizarUIEstadoVotacion(estado) {
 
 // --- Carga de Datos Inicial y Estado ---
 async function obtenerEstadoVotacionActiva() {
+    if (window.EventSource) {
+        suscribirEstadoVotacion(); // El estado se actualiza solo a partir de aquí
+        return null;
+    }
     try {
-        const estado = await fetchData(`${API_BASE_URL}/votacion/activa`);
+        const url = new URL(`${API_BASE_URL}/votacion/activa`, window.location.origin);
+        if (temaSeleccionado) {
+            url.searchParams.append('tema', temaSeleccionado);
+        }
+        const estado = await fetchData(url.toString());
         actualizarUIEstadoVotacion(estado);
         return estado; // Devuelve el estado por si se necesita
     } catch (error) {
-        // Si da 404 (Not Found), significa que no hay votación activa
-        if (error.message.includes('404')) {
+        // Si da 404 (Not Found), la votación seleccionada ya no está activa: se prueba con la más reciente
+        if (error.message.includes('404') && temaSeleccionado) {
+            temaSeleccionado = null;
+            return obtenerEstadoVotacionActiva();
+        } else if (error.message.includes('404')) {
             actualizarUIEstadoVotacion(null); // Asegura que la UI muestre el estado "sin votación"
         } else {
             mostrarMensaje('Error al obtener el estado de la votación activa.', 'error');
@@ -182,6 +280,7 @@ async function iniciarVotacion() {
         });
         mostrarMensaje(result.mensaje || `Votación para '${tema}' iniciada.`, 'success');
         document.getElementById('tema-votacion-input').value = ''; // Limpiar input
+        temaSeleccionado = tema; // Mostrar la votación recién iniciada
         await obtenerEstadoVotacionActiva(); // Actualizar UI
     } catch (error) {
         // El error ya se muestra en fetchData
@@ -198,11 +297,13 @@ async function agregarCandidatoAVotacion() {
         const result = await fetchData(`${API_BASE_URL}/votacion/candidato`, {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ nombre: nombre })
+            body: JSON.stringify({ nombre: nombre, tema: temaSeleccionado })
         });
         mostrarMensaje(result.mensaje || `Candidato '${nombre}' añadido/confirmado.`, 'success');
         document.getElementById('nombre-candidato-activo').value = ''; // Limpiar input
-        await obtenerEstadoVotacionActiva(); // Recargar estado para actualizar listas
+        if (!window.EventSource) {
+            await obtenerEstadoVotacionActiva(); // Recargar estado para actualizar listas
+        }
         await cargarCandidatosGlobales(); // Actualizar lista global por si era nuevo
     } catch (error) {
         // El error ya se muestra en fetchData
@@ -228,30 +329,37 @@ async function emitirVotoSesion() {
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({
                 id_votante: idVotante,
-                id_candidato: idCandidato
+                id_candidato: idCandidato,
+                tema: temaSeleccionado
             })
         });
         mostrarMensaje(result.mensaje || 'Voto emitido correctamente (pendiente de finalizar).', 'success');
         document.getElementById('id-votante-input').value = ''; // Limpiar input votante
         // No limpiamos el candidato seleccionado por si votan varias personas seguidas
-        await obtenerEstadoVotacionActiva(); // Actualizar contadores de votos/votantes
+        if (!window.EventSource) {
+            await obtenerEstadoVotacionActiva(); // Actualizar contadores de votos/votantes
+        }
     } catch (error) {
        // El error ya se muestra en fetchData
     }
 }
 
 async function finalizarVotacion() {
-    if (!confirm('¿Estás seguro de que quieres finalizar la votación actual y crear el bloque?')) {
+    if (!confirm(`¿Estás seguro de que quieres finalizar la votación '${temaSeleccionado}' y crear el bloque?`)) {
         return;
     }
     try {
         const result = await fetchData(`${API_BASE_URL}/votacion/finalizar`, {
-            method: 'POST'
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ tema: temaSeleccionado })
         });
         mostrarMensaje(result.mensaje || 'Votación finalizada y bloque creado.', 'success');
-        await obtenerEstadoVotacionActiva(); // La UI debería volver al estado inicial
         await obtenerCadena(); // Actualizar la visualización de la cadena
-        await obtenerResultados(); // Actualizar resultados
+        if (!window.EventSource) {
+            await obtenerEstadoVotacionActiva(); // La UI debería volver al estado inicial
+            await obtenerResultados(); // Actualizar resultados
+        }
     } catch (error) {
         // El error ya se muestra en fetchData
     }
@@ -259,66 +367,90 @@ async function finalizarVotacion() {
 
 // --- Funciones de Consulta (Adaptadas) ---
 
+function mostrarResultados(data, temaFiltro) {
+    const { resultados, info } = data;
+    const resultadosDiv = document.getElementById('resultados');
+    const infoDiv = document.getElementById('info-resultados-adicional');
+    resultadosDiv.innerHTML = ''; // Limpiar
+    infoDiv.innerHTML = ''; // Limpiar info adicional
+
+    if (Object.keys(resultados || {}).length > 0) {
+        const ul = document.createElement('ul');
+        // Ordenar resultados por votos (descendente)
+        const sortedResultados = Object.entries(resultados).sort(([,a],[,b]) => b-a);
+
+        for (const [nombreCandidato, votos] of sortedResultados) {
+            const li = document.createElement('li');
+            li.textContent = `${nombreCandidato}: ${votos} votos`;
+            ul.appendChild(li);
+        }
+        resultadosDiv.appendChild(ul);
+    } else {
+        resultadosDiv.textContent = 'No hay votos registrados para mostrar' + (temaFiltro ? ` para el tema '${temaFiltro}'.` : '.');
+    }
+
+    // Mostrar información adicional (votos pendientes incluidos)
+    if (info && info.votaciones_activas) {
+         const detalles = info.votaciones_activas.map(v => `${v.votos_pendientes_incluidos} de '${v.tema}'`).join(', ');
+         infoDiv.innerHTML = `<p><small><i>(Incluye votos pendientes de votaciones activas: ${detalles})</i></small></p>`;
+    }
+}
+
 async function obtenerResultados() {
     const temaFiltro = document.getElementById('tema-resultados-filtro').value;
+    if (window.EventSource) {
+        // Los resultados se actualizan solos mientras llegan votos o se finalizan votaciones
+        if (fuenteResultados) {
+            fuenteResultados.close();
+        }
+        fuenteResultados = suscribirEventos('/resultados/stream', temaFiltro, data => mostrarResultados(data, temaFiltro));
+        return;
+    }
+
     const url = new URL(`${API_BASE_URL}/resultados`, window.location.origin);
     if (temaFiltro) {
         url.searchParams.append('tema', temaFiltro);
     }
-
     try {
-        const data = await fetchData(url.toString());
-        const { resultados, info } = data;
-        const resultadosDiv = document.getElementById('resultados');
-        const infoDiv = document.getElementById('info-resultados-adicional');
-        resultadosDiv.innerHTML = ''; // Limpiar
-        infoDiv.innerHTML = ''; // Limpiar info adicional
-
-        if (Object.keys(resultados).length > 0) {
-            const ul = document.createElement('ul');
-            // Ordenar resultados por votos (descendente)
-            const sortedResultados = Object.entries(resultados).sort(([,a],[,b]) => b-a);
-
-            for (const [nombreCandidato, votos] of sortedResultados) {
-                const li = document.createElement('li');
-                li.textContent = `${nombreCandidato}: ${votos} votos`;
-                ul.appendChild(li);
-            }
-            resultadosDiv.appendChild(ul);
-        } else {
-            resultadosDiv.textContent = 'No hay votos registrados para mostrar' + (temaFiltro ? ` para el tema '${temaFiltro}'.` : '.');
-        }
-
-        // Mostrar información adicional (votos pendientes incluidos)
-        if (info && info.votacion_activa) {
-             infoDiv.innerHTML = `<p><small><i>(Incluye ${info.votacion_activa.votos_pendientes_incluidos} votos pendientes de la votación activa '${info.votacion_activa.tema}')</i></small></p>`;
-        }
-
+        mostrarResultados(await fetchData(url.toString()), temaFiltro);
     } catch (error) {
         document.getElementById('resultados').textContent = 'Error al cargar resultados.';
         document.getElementById('info-resultados-adicional').innerHTML = '';
     }
 }
 
+const TAM_PAGINA_CADENA = 50; // Bloques por petición al mostrar la cadena
+
 async function obtenerCadena() {
+    const cadenaPre = document.getElementById('cadena-bloques-pre');
     try {
-        const cadena = await fetchData(`${API_BASE_URL}/cadena`);
-        const cadenaPre = document.getElementById('cadena-bloques-pre');
-        if (cadena && cadena.length > 0) {
-            // Opcional: Mapear IDs de candidatos a nombres si la API no lo hace
-            // (Asumiendo que la API ya devuelve nombres o que tenemos la lista global)
-            cadenaPre.textContent = JSON.stringify(cadena, null, 2);
-        } else {
+        // Se pide la cadena por páginas para no obligar al servidor a serializarla entera de una vez
+        let desde = 0;
+        let primeraPagina = true;
+        while (desde !== null) {
+            const pagina = await fetchData(`${API_BASE_URL}/cadena?desde=${desde}&limite=${TAM_PAGINA_CADENA}`);
+            if (primeraPagina) {
+                cadenaPre.textContent = '';
+                primeraPagina = false;
+            }
+            for (const bloque of pagina.bloques) {
+                cadenaPre.textContent += JSON.stringify(bloque, null, 2) + '\n';
+            }
+            desde = pagina.siguiente;
+        }
+        if (!cadenaPre.textContent) {
             cadenaPre.textContent = 'La cadena está vacía o no se pudo cargar.';
         }
     } catch (error) {
-        document.getElementById('cadena-bloques-pre').textContent = 'Error al cargar la cadena.';
+        cadenaPre.textContent = 'Error al cargar la cadena.';
     }
 }
 
-async function verificarIntegridad() {
+async function verificarIntegridad(completa = false) {
     try {
-        const result = await fetchData(`${API_BASE_URL}/verificar`); // Endpoint cambiado
+        // Por defecto solo se comprueban los bloques nuevos; la auditoría completa recalcula toda la cadena
+        const url = `${API_BASE_URL}/verificar` + (completa ? '?modo=completo' : '');
+        const result = await fetchData(url);
         if (result.integridad_valida) {
             mostrarMensaje('La integridad de la cadena de bloques es VÁLIDA.', 'success');
         } else {